@@ -0,0 +1,1826 @@
+"""
+Shared benchmark harness pieces
+Imported by the go-chat and Elixir benchmark scripts so every harness
+measures, encodes and reports the same way
+
+The scripts live beside their servers (go-chat/, elixir-raw-websocket/)
+and are run from there, so each puts this directory, the repository root,
+on sys.path with one line just before importing from here.
+"""
+
+import asyncio
+import cProfile
+import functools
+import gc
+import ipaddress
+import json
+import math
+import multiprocessing
+import os
+import pstats
+import random
+import re
+import struct
+import time
+import tracemalloc
+from array import array
+from collections import Counter, deque
+from pathlib import Path
+from urllib.parse import urlparse
+
+import websockets
+from websockets.extensions.permessage_deflate import ClientPerMessageDeflateFactory, PerMessageDeflate
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# The harnesses hook websockets' legacy protocol objects (transport writes,
+# data_received, pause_writing, ws.closed), which the websockets 14 client lacks
+if int(websockets.__version__.split('.')[0]) >= 14:
+    raise ImportError(f"websockets {websockets.__version__} is not supported by the benchmark harnesses; "
+                      f"install websockets<14 (see requirements.txt)")
+
+
+# Latency probes ride inside the message content so they survive go-chat's
+# re-serialization: ~lat~<sender>~<monotonic ns>~
+LATENCY_MARKER = re.compile(r'~lat~(\d+)~(\d+)~')
+
+
+def latency_tag(sender, timestamp_ns):
+    """Build the latency probe embedded at the start of a message's content"""
+    return f"~lat~{sender}~{timestamp_ns}~"
+
+
+class LatencyHistogram:
+    """HDR-style log-linear histogram of latencies in microseconds.
+    
+    Values keep SUB_BUCKET_BITS significant bits (<1% relative error), so
+    memory stays constant no matter how many samples are recorded, and
+    histograms from different phases, shards or processes merge exactly.
+    """
+    SUB_BUCKET_BITS = 8
+    
+    def __init__(self):
+        self.counts = {}
+        self.total = 0
+        self.sum_us = 0
+        self.max_us = 0
+    
+    def record(self, micros):
+        value = max(0, int(micros))
+        shift = max(0, value.bit_length() - self.SUB_BUCKET_BITS)
+        index = (shift << self.SUB_BUCKET_BITS) | (value >> shift)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.total += 1
+        self.sum_us += value
+        if value > self.max_us:
+            self.max_us = value
+    
+    def merge(self, other):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.total += other.total
+        self.sum_us += other.sum_us
+        self.max_us = max(self.max_us, other.max_us)
+        return self
+    
+    def value_at_percentile(self, percentile):
+        """Highest value equivalent to the bucket holding the given percentile"""
+        if not self.total:
+            return 0
+        
+        threshold = max(1, percentile / 100 * self.total)
+        seen = 0
+        mask = (1 << self.SUB_BUCKET_BITS) - 1
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= threshold:
+                shift = index >> self.SUB_BUCKET_BITS
+                upper = (((index & mask) + 1) << shift) - 1
+                return min(upper, self.max_us)
+        return self.max_us
+    
+    def summary(self):
+        """Millisecond percentiles for results and reports"""
+        if not self.total:
+            return {}
+        
+        return {
+            'count': self.total,
+            'mean_ms': self.sum_us / self.total / 1000,
+            'p50_ms': self.value_at_percentile(50) / 1000,
+            'p90_ms': self.value_at_percentile(90) / 1000,
+            'p99_ms': self.value_at_percentile(99) / 1000,
+            'p99_9_ms': self.value_at_percentile(99.9) / 1000,
+            'max_ms': self.max_us / 1000,
+        }
+    
+    def to_dict(self):
+        return {
+            'counts': {str(index): count for index, count in self.counts.items()},
+            'total': self.total,
+            'sum_us': self.sum_us,
+            'max_us': self.max_us,
+        }
+    
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls()
+        histogram.counts = {int(index): count for index, count in data.get('counts', {}).items()}
+        histogram.total = data.get('total', 0)
+        histogram.sum_us = data.get('sum_us', 0)
+        histogram.max_us = data.get('max_us', 0)
+        return histogram
+
+
+class SendEngine:
+    """Long-lived writer per connection, fed by a dispatcher.
+    
+    submit() queues a message index on a connection's deque and wakes its
+    writer; the writer renders and sends its backlog back to back. There is
+    no task or coroutine per message, so send throughput depends on the
+    number of connections rather than on task creation and GC churn.
+    render(slot, index, scheduled) returns the payload for one send and
+    on_error(exc), when given, is called for each failed send.
+    """
+    
+    def __init__(self, connections, render, on_error=None):
+        self.connections = connections
+        self.render = render
+        self.on_error = on_error
+        self.queues = [deque() for _ in connections]
+        self.wakeups = [asyncio.Event() for _ in connections]
+        self.outstanding = 0
+        self.space_limit = 0
+        self.space = asyncio.Event()
+        self.idle = asyncio.Event()
+        self.idle.set()
+        self.sent = 0
+        self.sent_per_slot = array('L', [0]) * len(connections)
+        self.errors = 0
+        self.latency = LatencyHistogram()
+        self.writers = [asyncio.create_task(self._writer(slot)) for slot in range(len(connections))]
+    
+    def submit(self, slot, index, scheduled=None):
+        """Queue message `index` on connection `slot`; `scheduled` (loop time) enables latency"""
+        self.queues[slot].append((index, scheduled))
+        self.outstanding += 1
+        self.idle.clear()
+        self.wakeups[slot].set()
+    
+    async def wait_for_space(self, limit):
+        """Block the dispatcher until fewer than `limit` messages are queued"""
+        while self.outstanding >= limit:
+            self.space_limit = limit
+            self.space.clear()
+            await self.space.wait()
+    
+    async def wait_idle(self):
+        await self.idle.wait()
+    
+    async def _writer(self, slot):
+        loop = asyncio.get_running_loop()
+        ws = self.connections[slot]
+        queue = self.queues[slot]
+        wakeup = self.wakeups[slot]
+        render = self.render
+        
+        while True:
+            await wakeup.wait()
+            wakeup.clear()
+            while queue:
+                index, scheduled = queue.popleft()
+                try:
+                    await ws.send(render(slot, index, scheduled))
+                    self.sent += 1
+                    self.sent_per_slot[slot] += 1
+                    if scheduled is not None:
+                        self.latency.record((loop.time() - scheduled) * 1_000_000)
+                except Exception as e:
+                    # Cancellation must reach the writer so close() can finish
+                    self.errors += 1
+                    if self.on_error:
+                        self.on_error(e)
+                self.outstanding -= 1
+                if self.outstanding < self.space_limit:
+                    self.space.set()
+                if not self.outstanding:
+                    self.idle.set()
+    
+    async def close(self):
+        """Wait for queued sends, then stop the writers"""
+        await self.wait_idle()
+        for writer in self.writers:
+            writer.cancel()
+        await asyncio.gather(*self.writers, return_exceptions=True)
+
+
+class RampController:
+    """AIMD concurrency control for opening connections.
+    
+    Each round opens `window` connections at once. A healthy round (error
+    rate and p95 handshake latency within limits) grows the window
+    additively; a degraded one cuts it multiplicatively. The best
+    handshake rate seen on a healthy round is reported as the ceiling.
+    """
+    
+    def __init__(self, initial=50, minimum=10, maximum=2000, increase=50, decrease=0.5,
+                 latency_target_ms=250, max_error_rate=0.02, max_unhealthy_rounds=5):
+        self.window = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_target_ms = latency_target_ms
+        self.max_error_rate = max_error_rate
+        self.max_unhealthy_rounds = max_unhealthy_rounds
+        self.unhealthy_streak = 0
+        self.rounds = []
+        self.ceiling = {'rate': 0, 'window': 0, 'p95_ms': 0}
+    
+    @classmethod
+    def from_config(cls, ramp_config, shard_count=1):
+        """Build from a connection_test.ramp block; window sizes are split across shards"""
+        def share(key, default):
+            return max(1, -(-ramp_config.get(key, default) // shard_count))
+        
+        return cls(
+            initial=share('initial_concurrency', 50),
+            minimum=share('min_concurrency', 10),
+            maximum=share('max_concurrency', 2000),
+            increase=share('increase', 50),
+            decrease=ramp_config.get('decrease_factor', 0.5),
+            latency_target_ms=ramp_config.get('latency_target_ms', 250),
+            max_error_rate=ramp_config.get('max_error_rate', 0.02),
+            max_unhealthy_rounds=ramp_config.get('max_unhealthy_rounds', 5)
+        )
+    
+    def record_round(self, latencies, failed, elapsed):
+        """Feed one round's handshake times (seconds) and failures; returns whether it was healthy"""
+        attempts = len(latencies) + failed
+        error_rate = failed / attempts if attempts else 0
+        p95_ms = sorted(latencies)[int(0.95 * (len(latencies) - 1))] * 1000 if latencies else float('inf')
+        rate = len(latencies) / elapsed if elapsed > 0 else 0
+        healthy = error_rate <= self.max_error_rate and p95_ms <= self.latency_target_ms
+        
+        self.rounds.append({
+            'window': self.window,
+            'successful': len(latencies),
+            'failed': failed,
+            'p95_ms': p95_ms if latencies else None,
+            'rate': rate,
+            'healthy': healthy
+        })
+        
+        if healthy:
+            if rate > self.ceiling['rate']:
+                self.ceiling = {'rate': rate, 'window': self.window, 'p95_ms': p95_ms}
+            self.window = min(self.maximum, self.window + self.increase)
+            self.unhealthy_streak = 0
+        else:
+            self.window = max(self.minimum, int(self.window * self.decrease))
+            self.unhealthy_streak += 1
+        return healthy
+    
+    @property
+    def exhausted(self):
+        """True once the server has stayed degraded for max_unhealthy_rounds in a row"""
+        return self.unhealthy_streak >= self.max_unhealthy_rounds
+    
+    def summary(self):
+        return {
+            'mode': 'adaptive',
+            'handshake_ceiling': self.ceiling['rate'],
+            'ceiling_window': self.ceiling['window'],
+            'ceiling_p95_ms': self.ceiling['p95_ms'],
+            'final_window': self.window,
+            'rounds': len(self.rounds),
+            'unhealthy_rounds': sum(1 for r in self.rounds if not r['healthy']),
+            'history': self.rounds
+        }
+
+
+def ephemeral_port_range():
+    """Size of the kernel's ephemeral port range (ports per source address and target)"""
+    try:
+        with open('/proc/sys/net/ipv4/ip_local_port_range') as f:
+            low, high = map(int, f.read().split())
+        return high - low + 1
+    except (OSError, ValueError):
+        return 28232
+
+
+class SourceAddressPool:
+    """Round-robin local addresses for outgoing connections.
+    
+    The kernel hands out ephemeral ports per (source address, target), so a
+    single source tops out at the ephemeral range (~28k-64k sockets per
+    target). Spreading connects across loopback addresses (127.0.0.2,
+    127.0.0.3, ...) lifts that ceiling. Entries are single addresses or
+    inclusive ranges such as "127.0.0.2-127.0.0.9".
+    """
+    
+    def __init__(self, addresses, offset=0):
+        self.addresses = []
+        for entry in addresses:
+            first, _, last = entry.partition('-')
+            first = ipaddress.ip_address(first.strip())
+            last = ipaddress.ip_address(last.strip()) if last else first
+            self.addresses.extend(str(ipaddress.ip_address(n)) for n in range(int(first), int(last) + 1))
+        self.position = offset
+        self.failures = Counter()
+    
+    def next_address(self):
+        address = self.addresses[self.position % len(self.addresses)]
+        self.position += 1
+        return address
+    
+    def record_failure(self, address):
+        self.failures[address] += 1
+    
+    def usage(self, connections):
+        """Ports in use per source address, from the live connections' local addresses"""
+        port_range = ephemeral_port_range()
+        in_use = Counter()
+        for ws in connections:
+            try:
+                in_use[ws.local_address[0]] += 1
+            except Exception:
+                pass
+        return {
+            address: {
+                'ports_in_use': in_use[address],
+                'failed': self.failures[address],
+                'port_utilization': in_use[address] / port_range * 100
+            }
+            for address in self.addresses
+        }
+
+
+class PayloadTemplate:
+    """A message serialized once, with only its per-send fields left open.
+    
+    Values set to one of the placeholders below become str.format fields,
+    so each send is one format call instead of building a dict and running
+    json.dumps. PROBE may only appear inside a string value; SEQUENCE and
+    TIMESTAMP render as bare numbers when used as the whole value.
+    """
+    PROBE = "@@probe@@"
+    SEQUENCE = "@@sequence@@"
+    TIMESTAMP = "@@timestamp@@"
+    
+    def __init__(self, message):
+        text = json.dumps(message).replace('{', '{{').replace('}', '}}')
+        for marker, field in ((self.SEQUENCE, '{sequence}'), (self.TIMESTAMP, '{timestamp}')):
+            text = text.replace(f'"{marker}"', field).replace(marker, field)
+        self.text = text.replace(self.PROBE, '{probe}')
+        self.render = self.text.format
+
+
+# Binary frames: fixed header (magic, version, message type, sequence, unix
+# timestamp, content length) followed by the UTF-8 content, probe first
+BINARY_HEADER = struct.Struct('!2sBBQdI')
+BINARY_MAGIC = b'WB'
+# Message type codes on the wire, shared by every harness so frames decode the
+# same way whoever sent them. Append only: a code never changes meaning.
+BINARY_TYPES = ('unknown', 'configurable_test', 'endurance_test', 'payload_sweep',
+                'chat_message', 'benchmark_test', 'tsunami')
+
+
+def split_probe(content):
+    """Split a content string around PayloadTemplate.PROBE (probe goes first if absent)"""
+    head, marker, tail = content.partition(PayloadTemplate.PROBE)
+    return (head, tail) if marker else ('', head)
+
+
+class BinaryTemplate:
+    """PayloadTemplate counterpart sending binary frames with a BINARY_HEADER.
+    
+    Takes the same message dict: type, sequence and timestamp move into the
+    header and only the content travels as bytes.
+    """
+    
+    def __init__(self, message):
+        message_type = message.get('type', 'unknown')
+        self.type_code = BINARY_TYPES.index(message_type) if message_type in BINARY_TYPES else 0
+        head, tail = split_probe(message.get('content', ''))
+        self.head, self.tail = head.encode('utf-8'), tail.encode('utf-8')
+    
+    def render(self, probe='', sequence=0, timestamp=0.0):
+        body = self.head + probe.encode('utf-8') + self.tail
+        return BINARY_HEADER.pack(BINARY_MAGIC, 1, self.type_code, sequence, timestamp, len(body)) + body
+
+
+def pack_compact(value):
+    """MessagePack-encode a JSON-like value (dict, list, str, int, float, bool, None)"""
+    if value is None:
+        return b'\xc0'
+    if isinstance(value, bool):
+        return b'\xc3' if value else b'\xc2'
+    if isinstance(value, int):
+        if -32 <= value < 128:
+            return struct.pack('b', value)
+        return b'\xd3' + struct.pack('>q', value)
+    if isinstance(value, float):
+        return b'\xcb' + struct.pack('>d', value)
+    if isinstance(value, str):
+        data = value.encode('utf-8')
+        if len(data) < 32:
+            return bytes([0xa0 | len(data)]) + data
+        if len(data) < 256:
+            return b'\xd9' + bytes([len(data)]) + data
+        if len(data) < 65536:
+            return b'\xda' + struct.pack('>H', len(data)) + data
+        return b'\xdb' + struct.pack('>I', len(data)) + data
+    if isinstance(value, (list, tuple)):
+        head = bytes([0x90 | len(value)]) if len(value) < 16 else b'\xdc' + struct.pack('>H', len(value))
+        return head + b''.join(pack_compact(item) for item in value)
+    if isinstance(value, dict):
+        head = bytes([0x80 | len(value)]) if len(value) < 16 else b'\xde' + struct.pack('>H', len(value))
+        return head + b''.join(pack_compact(k) + pack_compact(v) for k, v in value.items())
+    raise TypeError(f"Cannot pack {type(value).__name__}")
+
+
+class CompactTemplate:
+    """PayloadTemplate counterpart sending MessagePack binary frames.
+    
+    The message is packed once; SEQUENCE and TIMESTAMP become fixed-width
+    uint64/float64 slots and the content string holding PROBE is re-packed
+    per send, so rendering is a join rather than a full encode.
+    """
+    CONTENT = "@@content@@"
+    
+    def __init__(self, message):
+        self.head = self.tail = ''
+        
+        def substitute(value):
+            if isinstance(value, dict):
+                return {k: substitute(v) for k, v in value.items()}
+            if isinstance(value, str) and PayloadTemplate.PROBE in value:
+                self.head, self.tail = split_probe(value)
+                return self.CONTENT
+            return value
+        
+        slots = {pack_compact(marker): field for marker, field in (
+            (PayloadTemplate.SEQUENCE, 'sequence'),
+            (PayloadTemplate.TIMESTAMP, 'timestamp'),
+            (self.CONTENT, 'content')
+        )}
+        pattern = re.compile(b'(' + b'|'.join(re.escape(slot) for slot in slots) + b')')
+        self.parts = [slots.get(part, part) for part in pattern.split(pack_compact(substitute(message))) if part]
+    
+    def render(self, probe='', sequence=0, timestamp=0.0):
+        fields = {
+            'sequence': b'\xcf' + struct.pack('>Q', sequence),
+            'timestamp': b'\xcb' + struct.pack('>d', timestamp),
+            'content': pack_compact(self.head + probe + self.tail)
+        }
+        return b''.join(fields[part] if isinstance(part, str) else part for part in self.parts)
+
+
+# payload.encoding in the config picks the frame format for every send phase
+PAYLOAD_ENCODINGS = {
+    'json': PayloadTemplate,
+    'binary': BinaryTemplate,
+    'compact': CompactTemplate,
+}
+
+
+def build_payload_pool(make_message, size, encoding='json'):
+    """Pre-serialize `size` message variants; make_message(k) returns the k-th dict"""
+    return [PAYLOAD_ENCODINGS[encoding](make_message(k)) for k in range(max(1, size))]
+
+
+def frame_text(frame):
+    """Text of a received frame to scan for latency probes, whatever its encoding"""
+    if frame[:2] == BINARY_MAGIC:
+        frame = frame[BINARY_HEADER.size:]
+    return frame.decode('utf-8', errors='ignore')
+
+
+def cpu_seconds(process):
+    """User + system CPU seconds used so far by a psutil.Process, or None if unavailable"""
+    if process is None:
+        return None
+    try:
+        times = process.cpu_times()
+    except psutil.Error:
+        return None
+    return times.user + times.system
+
+
+def compression_kwargs(setting):
+    """websockets.connect kwargs for the config's "compression" setting.
+    
+    None keeps the library default (permessage-deflate offered at zlib level
+    6, memLevel 5); {"enabled": false} stops offering it; {"enabled": true,
+    "level": 1-9, "memory_level": 1-9} offers it with those zlib settings.
+    The server decides whether it is actually negotiated.
+    """
+    if setting is None:
+        return {}
+    if not setting.get('enabled', True):
+        return {'compression': None}
+    return {
+        'compression': None,
+        'extensions': [ClientPerMessageDeflateFactory(compress_settings={
+            'level': setting.get('level', 6),
+            'memLevel': setting.get('memory_level', 5)
+        })]
+    }
+
+
+def compression_label(setting):
+    if setting is None:
+        return 'library default'
+    if not setting.get('enabled', True):
+        return 'off'
+    return f"deflate level {setting.get('level', 6)}"
+
+
+def deflate_negotiated(ws):
+    return any(isinstance(extension, PerMessageDeflate) for extension in ws.extensions)
+
+
+class WireCounter:
+    """Bytes written to and read from the sockets of attached connections.
+    
+    Counted at the transport, so after framing and permessage-deflate:
+    what actually crosses the wire, handshakes excluded.
+    """
+    
+    def __init__(self):
+        self.sent = 0
+        self.received = 0
+    
+    def attach(self, ws):
+        write, data_received = ws.transport.write, ws.data_received
+        
+        def counted_write(data):
+            self.sent += len(data)
+            write(data)
+        
+        def counted_data_received(data):
+            self.received += len(data)
+            data_received(data)
+        
+        ws.transport.write = counted_write
+        ws.data_received = counted_data_received
+
+
+class BackpressureMonitor:
+    """Per-connection write-buffer flow control and its telemetry.
+    
+    Lowers each transport's high-water mark so ws.send() drains whenever
+    more than `high_water` bytes sit in the client buffer, and hooks the
+    protocol's pause/resume callbacks to time how long writers were
+    blocked and capture the buffered bytes at each pause.
+    """
+    
+    def __init__(self, high_water=16384, low_water=None):
+        self.high_water = high_water
+        self.low_water = high_water // 4 if low_water is None else low_water
+        self.pauses = 0
+        self.blocked_seconds = 0.0
+        self.peak_buffered = 0
+        self.paused_at = {}
+    
+    def attach(self, ws):
+        transport = ws.transport
+        pause_writing, resume_writing = ws.pause_writing, ws.resume_writing
+        
+        def paused():
+            self.pauses += 1
+            self.peak_buffered = max(self.peak_buffered, transport.get_write_buffer_size())
+            self.paused_at[ws] = time.perf_counter()
+            pause_writing()
+        
+        def resumed():
+            started = self.paused_at.pop(ws, None)
+            if started is not None:
+                self.blocked_seconds += time.perf_counter() - started
+            resume_writing()
+        
+        ws.pause_writing = paused
+        ws.resume_writing = resumed
+        transport.set_write_buffer_limits(high=self.high_water, low=self.low_water)
+    
+    def blocked_time(self):
+        """Writer-seconds spent paused so far, including pauses still in progress"""
+        now = time.perf_counter()
+        return self.blocked_seconds + sum(now - started for started in self.paused_at.values())
+    
+    @staticmethod
+    def buffered(connections):
+        """(total, largest) bytes still queued in the connections' transports"""
+        sizes = [ws.transport.get_write_buffer_size() for ws in connections if ws.transport]
+        return sum(sizes), max(sizes, default=0)
+    
+    async def wait_flushed(self, connections, timeout=30.0):
+        """Seconds until every transport buffer is empty (capped at `timeout`)"""
+        started = time.perf_counter()
+        while self.buffered(connections)[0] and time.perf_counter() - started < timeout:
+            await asyncio.sleep(0.005)
+        return time.perf_counter() - started
+
+
+class RoundRobinScheduler:
+    """Rotating cursor over the live connections.
+    
+    The cursor carries over between batches, so every open connection gets
+    a turn before any gets a second one no matter how small the batch is;
+    closed connections are skipped.
+    """
+    
+    def __init__(self, connections):
+        self.connections = connections
+        self.cursor = 0
+    
+    def next_slot(self):
+        """Next live connection index, or None once every connection is closed"""
+        count = len(self.connections)
+        for _ in range(count):
+            slot = self.cursor
+            self.cursor = (slot + 1) % count
+            if not self.connections[slot].closed:
+                return slot
+        return None
+
+
+def fairness_summary(counts):
+    """Jain's fairness index over per-connection send counts (1.0 = perfectly even).
+    
+    Keeps the raw sums so shard summaries can be combined exactly.
+    """
+    total = sum(counts)
+    sum_squares = sum(count * count for count in counts)
+    return {
+        'connections': len(counts),
+        'active_connections': sum(1 for count in counts if count),
+        'total': total,
+        'sum_squares': sum_squares,
+        'min_sent': min(counts, default=0),
+        'max_sent': max(counts, default=0),
+        'jain_index': total * total / (len(counts) * sum_squares) if sum_squares else 0,
+    }
+
+
+def make_hold_sampler(spec):
+    """Return a callable drawing churn hold times (seconds) from a config spec.
+    
+    {"distribution": "fixed", "value": 1}, {"distribution": "uniform",
+    "min": 0.5, "max": 5}, {"distribution": "exponential", "mean": 2} or
+    {"distribution": "lognormal", "median": 2, "sigma": 1}.
+    """
+    distribution = spec.get('distribution', 'exponential')
+    if distribution == 'fixed':
+        value = spec.get('value', 1.0)
+        return lambda: value
+    if distribution == 'uniform':
+        low, high = spec.get('min', 0.5), spec.get('max', 5.0)
+        return lambda: random.uniform(low, high)
+    if distribution == 'exponential':
+        rate = 1.0 / spec.get('mean', 2.0)
+        return lambda: random.expovariate(rate)
+    if distribution == 'lognormal':
+        mu, sigma = math.log(spec.get('median', 2.0)), spec.get('sigma', 1.0)
+        return lambda: random.lognormvariate(mu, sigma)
+    raise ValueError(f"Unknown hold_time distribution: {distribution}")
+
+
+def drift_summary(samples, key):
+    """Start/end/peak and least-squares slope per minute of one server sample series"""
+    points = [(s['timestamp'], s[key]) for s in samples if s.get(key) is not None]
+    if len(points) < 2:
+        return {}
+    
+    mean_t = sum(t for t, _ in points) / len(points)
+    mean_v = sum(v for _, v in points) / len(points)
+    variance = sum((t - mean_t) ** 2 for t, _ in points)
+    slope = sum((t - mean_t) * (v - mean_v) for t, v in points) / variance if variance else 0
+    
+    return {
+        'start': points[0][1],
+        'end': points[-1][1],
+        'peak': max(v for _, v in points),
+        'delta': points[-1][1] - points[0][1],
+        'per_minute': slope * 60,
+    }
+
+
+def make_size_sampler(spec):
+    """Return a callable drawing payload sizes (bytes) from a distribution spec.
+    
+    {"type": "lognormal", "median": 120, "sigma": 1.0}, {"type": "uniform",
+    "min": 16, "max": 1024} or {"type": "fixed", "value": 256}; draws are
+    clamped to the optional "min"/"max".
+    """
+    kind = spec.get('type', 'lognormal')
+    low, high = spec.get('min', 1), spec.get('max', 1 << 20)
+    if kind == 'fixed':
+        draw = lambda: spec['value']
+    elif kind == 'uniform':
+        draw = lambda: random.uniform(low, high)
+    elif kind == 'lognormal':
+        mu, sigma = math.log(spec.get('median', 120)), spec.get('sigma', 1.0)
+        draw = lambda: random.lognormvariate(mu, sigma)
+    else:
+        raise ValueError(f"Unknown payload distribution: {kind}")
+    return lambda: int(min(high, max(low, draw())))
+
+
+def classify_sweep(steps):
+    """Label each fixed-size step by how throughput moved from the previous, smaller one.
+    
+    If msg/sec holds while the payload grows, per-message cost dominates
+    (CPU-bound); if MB/sec holds while msg/sec falls, the byte stream does
+    (bandwidth-bound).
+    """
+    previous = None
+    for step in steps:
+        if step.get('size') is None or not step.get('message_rate'):
+            continue
+        if previous:
+            message_ratio = step['message_rate'] / previous['message_rate']
+            byte_ratio = step['mb_per_sec'] / previous['mb_per_sec'] if previous['mb_per_sec'] else 0
+            if message_ratio >= 0.8:
+                step['regime'] = 'per-message bound'
+            elif byte_ratio >= 0.8:
+                step['regime'] = 'bandwidth bound'
+            else:
+                step['regime'] = 'mixed'
+        previous = step
+    return steps
+
+
+async def teardown_connections(connections, concurrency=1000, close_timeout=2.0):
+    """Close connections with bounded concurrency, aborting any that hang.
+    
+    Each graceful close (closing handshake) gets close_timeout seconds,
+    after which its transport is aborted, so one unresponsive peer cannot
+    stall the teardown of everything else.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    counts = {'graceful': 0, 'aborted': 0, 'already_closed': 0}
+    
+    async def close(ws):
+        if ws.closed:
+            counts['already_closed'] += 1
+            return
+        async with semaphore:
+            try:
+                await asyncio.wait_for(ws.close(), close_timeout)
+                counts['graceful'] += 1
+            except Exception:
+                if ws.transport:
+                    ws.transport.abort()
+                counts['aborted'] += 1
+    
+    started = time.perf_counter()
+    await asyncio.gather(*(close(ws) for ws in connections))
+    elapsed = time.perf_counter() - started
+    closed = counts['graceful'] + counts['aborted']
+    return {
+        'connections': len(connections),
+        **counts,
+        'concurrency': concurrency,
+        'teardown_seconds': elapsed,
+        'close_rate': closed / elapsed if elapsed > 0 else 0,
+    }
+
+
+async def watch_server_drain(fetch_count, stop, timeout=30.0, interval=0.05):
+    """Poll the server's connection count until it reaches zero after `stop` is set.
+    
+    fetch_count() is a blocking call returning the count (or None); it runs
+    in the default executor. Returns [(perf_counter time, count)] samples.
+    """
+    loop = asyncio.get_running_loop()
+    samples = []
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        count = await loop.run_in_executor(None, fetch_count)
+        if count is None:
+            if stop.is_set():
+                break
+        else:
+            samples.append((time.perf_counter(), count))
+            if count == 0 and stop.is_set():
+                break
+        await asyncio.sleep(interval)
+    return samples
+
+
+def drain_summary(before, samples, started):
+    """Server-observed disconnect rate and time for the connection count to fall from `before` to zero"""
+    if before is None or not samples:
+        return {}
+    after = samples[-1][1]
+    drained_at = next((t for t, count in samples if count == 0), None)
+    # The rate runs until the count stopped falling
+    last_change = next((t for t, count in reversed(samples) if count != after), started)
+    falling_until = next(t for t, count in samples if count == after and t > last_change)
+    return {
+        'server_connections_before': before,
+        'server_connections_after': after,
+        'server_drain_seconds': drained_at - started if drained_at is not None else None,
+        'server_disconnect_rate': (before - after) / (falling_until - started) if falling_until > started else 0,
+    }
+
+
+class StatsScraper:
+    """Background async sampler of the server's stats endpoint.
+    
+    Every `interval` seconds it issues a one-shot HTTP GET over asyncio
+    streams (no thread, no blocking client), stamps the sample with the
+    current phase and the client's cumulative sent/received counts, and
+    derives per-interval rates from the counters of consecutive samples.
+    client_counts() returns {'client_sent': n, 'client_received': n}, or is
+    None when the counts live in other processes.
+    """
+    
+    # (counter, derived rate, clock): server counters are timed by the response's
+    # arrival, client counters by the snapshot taken before the request
+    COUNTERS = (('messages', 'server_msg_rate', 'server_elapsed'), ('gc_cycles', 'gc_rate', 'server_elapsed'),
+                ('client_sent', 'client_send_rate', 'elapsed'), ('client_received', 'client_recv_rate', 'elapsed'))
+    
+    def __init__(self, url, client_counts=None, interval=1.0):
+        parsed = urlparse(url)
+        self.url = url
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.path = parsed.path or '/'
+        self.client_counts = client_counts
+        self.interval = interval
+        self.phase = 'startup'
+        self.samples = []
+        self.failures = 0
+        self.task = None
+        self.boundaries = set()
+        self.lock = asyncio.Lock()
+        self.started = time.perf_counter()
+    
+    async def fetch(self):
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), 2)
+        try:
+            writer.write(f"GET {self.path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\nConnection: close\r\n\r\n".encode())
+            response = await asyncio.wait_for(reader.read(), 2)
+        finally:
+            writer.close()
+        head, _, body = response.partition(b'\r\n\r\n')
+        status_line = head.split(b'\r\n')[0].decode(errors='replace')
+        if status_line.split()[1:2] != ['200']:
+            raise ValueError(f"{self.url}: {status_line}")
+        return json.loads(body)
+    
+    def snapshot(self):
+        return time.perf_counter(), self.client_counts() if self.client_counts else {}
+    
+    async def sample(self, phase=None, snapshot=None):
+        """Fetch the server's stats and record them with a client snapshot taken before the fetch"""
+        phase = phase or self.phase
+        taken, client = snapshot or self.snapshot()
+        async with self.lock:
+            scrape_start = time.perf_counter()
+            try:
+                stats = await self.fetch()
+            except Exception:
+                self.failures += 1
+                return None
+            return self._record(phase, taken, scrape_start, client, stats)
+    
+    def _record(self, phase, taken, scrape_start, client, stats):
+        now = time.perf_counter()
+        sample = {
+            'elapsed': taken - self.started,
+            'server_elapsed': now - self.started,
+            'timestamp': time.time(),
+            'phase': phase,
+            'scrape_ms': (now - scrape_start) * 1000,
+            **{key: value for key, value in stats.items() if isinstance(value, (int, float)) and not isinstance(value, bool)},
+            **client,
+        }
+        self.samples.append(sample)
+        return sample
+    
+    def timeline(self):
+        """Samples in snapshot order, each with its rates over the interval since the previous one"""
+        # Boundary samples can finish after a later periodic one, so order by snapshot time
+        self.samples.sort(key=lambda sample: sample['elapsed'])
+        for previous, sample in zip(self.samples, self.samples[1:]):
+            for counter, rate, clock in self.COUNTERS:
+                interval = sample[clock] - previous[clock]
+                if counter in sample and counter in previous and interval > 0:
+                    delta = sample[counter] - previous[counter]
+                    # A negative delta means the counter was reset (server restart)
+                    sample[rate] = delta / interval if delta >= 0 else None
+        return self.samples
+    
+    async def run(self, snapshot):
+        loop = asyncio.get_running_loop()
+        next_sample = loop.time()
+        while True:
+            await self.sample(snapshot=snapshot)
+            snapshot = None
+            # After a stall, resume the schedule instead of bursting to catch up
+            next_sample = max(next_sample + self.interval, loop.time())
+            await asyncio.sleep(next_sample - loop.time())
+    
+    def start(self):
+        self.started = time.perf_counter()
+        self.task = asyncio.create_task(self.run(self.snapshot()))
+    
+    def set_phase(self, name):
+        """Label later samples `name`; a boundary sample closes the previous phase's last interval"""
+        if self.task and name != self.phase:
+            boundary = asyncio.create_task(self.sample(self.phase, self.snapshot()))
+            self.boundaries.add(boundary)
+            boundary.add_done_callback(self.boundaries.discard)
+        self.phase = name
+    
+    async def stop(self):
+        """Stop sampling, take a final sample and return the summary"""
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, *self.boundaries, return_exceptions=True)
+            self.task = None
+        await self.sample()
+        return self.summary()
+    
+    def summary(self):
+        """Per-phase client and server rates plus peaks of the server gauges"""
+        phases = {}
+        samples = self.timeline()
+        for previous, sample in zip(samples, samples[1:]):
+            # An interval belongs to the phase it ended in
+            phase = phases.setdefault(sample['phase'], {'samples': 0, 'seconds': 0.0, 'deltas': Counter(), 'clocks': Counter(), 'peak': {}})
+            phase['samples'] += 1
+            phase['seconds'] += sample['elapsed'] - previous['elapsed']
+            for counter, _, clock in self.COUNTERS:
+                if counter in sample and counter in previous and sample[counter] >= previous[counter]:
+                    phase['deltas'][counter] += sample[counter] - previous[counter]
+                    phase['clocks'][counter] += sample[clock] - previous[clock]
+            for gauge in ('connections', 'connection_list', 'goroutines', 'memory_mb'):
+                if gauge in sample:
+                    phase['peak'][gauge] = max(phase['peak'].get(gauge, sample[gauge]), sample[gauge])
+        
+        for phase in phases.values():
+            deltas = phase.pop('deltas')
+            clocks = phase.pop('clocks')
+            for counter, rate, _ in self.COUNTERS:
+                if counter in deltas and clocks[counter] > 0:
+                    phase[rate] = deltas[counter] / clocks[counter]
+            if 'gc_cycles' in deltas:
+                phase['gc_cycles'] = deltas['gc_cycles']
+            if phase.get('client_send_rate'):
+                phase['server_to_client_ratio'] = phase.get('server_msg_rate', 0) / phase['client_send_rate']
+        
+        scrape_ms = sorted(sample['scrape_ms'] for sample in self.samples)
+        return {
+            'url': self.url,
+            'interval': self.interval,
+            'samples': len(self.samples),
+            'failures': self.failures,
+            'scrape_ms_p50': scrape_ms[len(scrape_ms) // 2] if scrape_ms else None,
+            'scrape_ms_max': scrape_ms[-1] if scrape_ms else None,
+            'phases': phases,
+        }
+
+
+# One /proc sample as written by sample_process_loop: a monotonic timestamp
+# followed by eight counters, named by PROC_FIELDS
+PROC_RECORD = struct.Struct('=d8Q')
+PROC_FIELDS = ('t', 'utime', 'stime', 'rss_bytes', 'threads', 'ctx_voluntary', 'ctx_involuntary', 'rchar', 'wchar')
+
+
+def proc_status_counter(status, key):
+    start = status.index(key) + len(key)
+    return int(status[start:status.index(b'\n', start)])
+
+
+def sample_process_loop(pid, path, hz, stop, pipe):
+    """ProcessSampler's child: append one PROC_RECORD per tick for pid until stop is set, then report own cost"""
+    proc = f'/proc/{pid}'
+    page_size = os.sysconf('SC_PAGE_SIZE')
+    stat_fd = os.open(f'{proc}/stat', os.O_RDONLY)
+    try:
+        io_fd = os.open(f'{proc}/io', os.O_RDONLY)
+    except OSError:
+        io_fd = None
+    # status is per thread, so context switches are summed over /proc/<pid>/task/*
+    task_fds = {}
+    known_threads = -1
+    period = 1.0 / hz
+    samples = missed = tick = 0
+    started = time.monotonic()
+    with open(path, 'wb') as out:
+        while not stop.is_set():
+            now = time.monotonic()
+            try:
+                stat = os.pread(stat_fd, 4096, 0)
+            except OSError:
+                break
+            fields = stat[stat.rindex(b')') + 2:].split()
+            threads = int(fields[17])
+            if threads != known_threads or tick % hz == 0:
+                try:
+                    live = set(os.listdir(f'{proc}/task'))
+                except OSError:
+                    break
+                for tid in set(task_fds) - live:
+                    os.close(task_fds.pop(tid))
+                for tid in live - set(task_fds):
+                    try:
+                        task_fds[tid] = os.open(f'{proc}/task/{tid}/status', os.O_RDONLY)
+                    except OSError:
+                        pass
+                known_threads = threads
+            voluntary = involuntary = 0
+            for tid, fd in list(task_fds.items()):
+                try:
+                    status = os.pread(fd, 4096, 0)
+                except OSError:
+                    os.close(task_fds.pop(tid))
+                    continue
+                voluntary += proc_status_counter(status, b'\nvoluntary_ctxt_switches:')
+                involuntary += proc_status_counter(status, b'\nnonvoluntary_ctxt_switches:')
+            rchar = wchar = 0
+            if io_fd is not None:
+                io = os.pread(io_fd, 4096, 0).split()
+                rchar, wchar = int(io[1]), int(io[3])
+            out.write(PROC_RECORD.pack(now, int(fields[11]), int(fields[12]), int(fields[21]) * page_size,
+                                       threads, voluntary, involuntary, rchar, wchar))
+            samples += 1
+            
+            # Drift-free schedule: ticks we overslept are skipped, never bunched up
+            tick += 1
+            delay = started + tick * period - time.monotonic()
+            if delay < 0:
+                skipped = int(-delay / period) + 1
+                missed += skipped
+                tick += skipped
+                delay += skipped * period
+            stop.wait(delay)
+    for fd in [stat_fd, io_fd, *task_fds.values()]:
+        if fd is not None:
+            os.close(fd)
+    times = os.times()
+    pipe.send({'samples': samples, 'missed': missed, 'seconds': time.monotonic() - started,
+               'cpu_seconds': times.user + times.system})
+
+
+class ProcessSampler:
+    """Samples one server process from /proc at up to `hz` per second in a separate process.
+    
+    The child reads /proc/<pid>/stat, io and every thread's status on a
+    drift-free schedule and appends fixed 72-byte PROC_RECORDs to a binary
+    file, so it neither competes with the load generator's event loop nor
+    blocks 100ms per sample like psutil.cpu_percent(interval=0.1). Phase marks
+    use CLOCK_MONOTONIC, which both processes share. CPU ticks are 1/CLK_TCK
+    seconds, so peaks are taken over `window`-second spans rather than per tick.
+    """
+    
+    def __init__(self, pid, path, hz=100, window=0.1):
+        self.pid = pid
+        self.path = Path(path)
+        self.hz = hz
+        self.window = window
+        self.marks = []
+        self.process = None
+        self.cost = {}
+    
+    def start(self, phase='startup'):
+        context = multiprocessing.get_context('spawn')
+        self.stop_event = context.Event()
+        self.receiver, sender = context.Pipe(duplex=False)
+        self.process = context.Process(target=sample_process_loop, daemon=True,
+                                       args=(self.pid, str(self.path), self.hz, self.stop_event, sender))
+        self.process.start()
+        self.mark(phase)
+    
+    def mark(self, phase):
+        self.marks.append((phase, time.monotonic()))
+    
+    def stop(self):
+        if not self.process:
+            return None
+        self.stop_event.set()
+        if self.receiver.poll(5):
+            self.cost = self.receiver.recv()
+        self.process.join(timeout=5)
+        self.process = None
+        return self.summary()
+    
+    def records(self):
+        try:
+            return [dict(zip(PROC_FIELDS, record)) for record in PROC_RECORD.iter_unpack(self.path.read_bytes())]
+        except OSError:
+            return []
+    
+    def phase_summary(self, rows):
+        clock_ticks = os.sysconf('SC_CLK_TCK')
+        first, last = rows[0], rows[-1]
+        seconds = last['t'] - first['t']
+        
+        def rate(row, earlier, *keys):
+            return sum(row[key] - earlier[key] for key in keys) / (row['t'] - earlier['t'])
+        
+        span = max(1, round(self.window * self.hz))
+        windows = [(row, rows[index - span]) for index, row in enumerate(rows) if index >= span]
+        cpu = sorted(rate(row, earlier, 'utime', 'stime') / clock_ticks * 100 for row, earlier in windows)
+        voluntary = [rate(row, earlier, 'ctx_voluntary') for row, earlier in windows]
+        involuntary = [rate(row, earlier, 'ctx_involuntary') for row, earlier in windows]
+        return {
+            'samples': len(rows),
+            'seconds': seconds,
+            'cpu_percent': rate(last, first, 'utime', 'stime') / clock_ticks * 100,
+            'cpu_percent_p99': cpu[min(len(cpu) - 1, int(len(cpu) * 0.99))] if cpu else 0,
+            'cpu_percent_peak': cpu[-1] if cpu else 0,
+            'rss_mb_avg': sum(row['rss_bytes'] for row in rows) / len(rows) / 1024 / 1024,
+            'rss_mb_peak': max(row['rss_bytes'] for row in rows) / 1024 / 1024,
+            'threads_peak': max(row['threads'] for row in rows),
+            'ctx_voluntary_per_sec': max(0, rate(last, first, 'ctx_voluntary')),
+            'ctx_voluntary_per_sec_peak': max(voluntary, default=0),
+            'ctx_involuntary_per_sec': max(0, rate(last, first, 'ctx_involuntary')),
+            'ctx_involuntary_per_sec_peak': max(involuntary, default=0),
+            'read_mb_per_sec': rate(last, first, 'rchar') / 1024 / 1024,
+            'write_mb_per_sec': rate(last, first, 'wchar') / 1024 / 1024,
+        }
+    
+    def summary(self):
+        records = self.records()
+        phases = []
+        bounds = self.marks[1:] + [(None, float('inf'))]
+        for (phase, begin), (_, end) in zip(self.marks, bounds):
+            rows = [row for row in records if begin <= row['t'] < end]
+            if len(rows) >= 2 and rows[-1]['t'] > rows[0]['t']:
+                phases.append({'phase': phase, **self.phase_summary(rows)})
+        seconds = self.cost.get('seconds', 0)
+        return {
+            'pid': self.pid,
+            'hz': self.hz,
+            'window_seconds': self.window,
+            'samples': len(records),
+            'achieved_hz': self.cost.get('samples', 0) / seconds if seconds else 0,
+            'missed_ticks': self.cost.get('missed', 0),
+            'sampler_cpu_percent': self.cost.get('cpu_seconds', 0) / seconds * 100 if seconds else 0,
+            'records_file': self.path.name,
+            'record_bytes': PROC_RECORD.size,
+            'phases': phases,
+        }
+
+
+def code_location(code):
+    return f"{getattr(code, 'co_qualname', code.co_name)} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def callback_location(callback):
+    """Where a loop callback's time went: a task step is charged to its coroutine, anything else to its function"""
+    owner = getattr(callback, '__self__', None)
+    if isinstance(owner, asyncio.Task):
+        code = getattr(owner.get_coro(), 'cr_code', None)
+        return code_location(code) if code else repr(owner.get_coro())
+    while isinstance(callback, functools.partial):
+        callback = callback.func
+    code = getattr(getattr(callback, '__func__', callback), '__code__', None)
+    return code_location(code) if code else getattr(callback, '__qualname__', repr(callback))
+
+
+class ClientSaturationMonitor:
+    """Self-instrumentation of the load generator: is the client the bottleneck?
+    
+    A ticker coroutine on the event loop wakes every `interval` seconds and
+    records how late it woke (loop lag), the CPU used by the loop thread
+    (time.thread_time, since the ticker runs on it) and by the whole process,
+    the pending task count and the ready-callback queue depth; gc callbacks
+    time collector pauses. A phase is client-bound when the loop thread
+    averaged cpu_threshold percent of a core or its p99 lag reached
+    lag_threshold_ms: the rates it produced then measure the harness, not the
+    server.
+    
+    With slow_callback_ms set (off by default), asyncio.Handle._run is
+    wrapped to time every callback (two perf_counter calls each) and callbacks
+    at or over the threshold are aggregated per source location and phase; for
+    a task step the location is the coroutine and the line it suspended at
+    after the step. The wrapper is process-wide, so it lives exactly as long as
+    the ticker task: asyncio.run cancels that task even when a phase crashes,
+    and its finally puts the original _run back.
+    """
+    
+    def __init__(self, interval=0.1, cpu_threshold=90, lag_threshold_ms=50, slow_callback_ms=None, top_callbacks=10):
+        self.interval = interval
+        self.cpu_threshold = cpu_threshold
+        self.lag_threshold_ms = lag_threshold_ms
+        self.slow_callback_ms = slow_callback_ms
+        self.top_callbacks = top_callbacks
+        self.phase = 'startup'
+        self.phases = {}
+        self.task = None
+        self.gc_started = None
+        self.handle_run = None
+        # Built up front so a profiler can leave it out of harness hot spots
+        self.callback_timer = self.make_callback_timer() if slow_callback_ms else None
+    
+    def state(self, name):
+        return self.phases.setdefault(name, {
+            'seconds': 0.0, 'loop_cpu': 0.0, 'process_cpu': 0.0, 'saturated_seconds': 0.0,
+            'lag': LatencyHistogram(), 'peak_tasks': 0, 'gc_pauses': 0, 'gc_seconds': 0.0, 'gc_max': 0.0,
+            'ticks': 0, 'ready_total': 0, 'ready_peak': 0, 'slow_callbacks': {},
+        })
+    
+    def record_slow_callback(self, handle, elapsed):
+        callback = handle._callback
+        location = callback_location(callback)
+        entry = self.state(self.phase)['slow_callbacks'].setdefault(location, [0, 0.0, 0.0, Counter()])
+        entry[0] += 1
+        entry[1] += elapsed
+        entry[2] = max(entry[2], elapsed)
+        owner = getattr(callback, '__self__', None)
+        if isinstance(owner, asyncio.Task):
+            frame = getattr(owner.get_coro(), 'cr_frame', None)
+            entry[3][frame.f_lineno if frame else 'done'] += 1
+    
+    def make_callback_timer(self):
+        threshold = self.slow_callback_ms / 1000
+        monitor = self
+        
+        def timed_run(handle):
+            started = time.perf_counter()
+            try:
+                return monitor.handle_run(handle)
+            finally:
+                elapsed = time.perf_counter() - started
+                if elapsed >= threshold:
+                    monitor.record_slow_callback(handle, elapsed)
+        
+        return timed_run
+    
+    def install_callback_timer(self):
+        self.handle_run = asyncio.Handle._run
+        asyncio.Handle._run = self.callback_timer
+    
+    def remove_callback_timer(self):
+        if self.handle_run:
+            asyncio.Handle._run = self.handle_run
+            self.handle_run = None
+    
+    def on_gc(self, stage, info):
+        if stage == 'start':
+            self.gc_started = time.perf_counter()
+        elif self.gc_started is not None:
+            pause = time.perf_counter() - self.gc_started
+            self.gc_started = None
+            state = self.state(self.phase)
+            state['gc_pauses'] += 1
+            state['gc_seconds'] += pause
+            state['gc_max'] = max(state['gc_max'], pause)
+    
+    async def run(self):
+        gc.callbacks.append(self.on_gc)
+        if self.slow_callback_ms:
+            self.install_callback_timer()
+        try:
+            await self.tick()
+        finally:
+            gc.callbacks.remove(self.on_gc)
+            self.remove_callback_timer()
+    
+    async def tick(self):
+        loop = asyncio.get_running_loop()
+        last_wall, last_loop_cpu, last_process = loop.time(), time.thread_time(), os.times()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            now, loop_cpu, process = loop.time(), time.thread_time(), os.times()
+            wall = now - last_wall
+            state = self.state(self.phase)
+            state['lag'].record(max(0.0, now - expected) * 1_000_000)
+            state['seconds'] += wall
+            state['loop_cpu'] += loop_cpu - last_loop_cpu
+            state['process_cpu'] += process.user + process.system - last_process.user - last_process.system
+            if wall > 0 and (loop_cpu - last_loop_cpu) / wall * 100 >= self.cpu_threshold:
+                state['saturated_seconds'] += wall
+            state['peak_tasks'] = max(state['peak_tasks'], len(asyncio.all_tasks()))
+            # Callbacks queued to run right now (selector event loops keep them in _ready)
+            ready = len(getattr(loop, '_ready', ()))
+            state['ticks'] += 1
+            state['ready_total'] += ready
+            state['ready_peak'] = max(state['ready_peak'], ready)
+            last_wall, last_loop_cpu, last_process = now, loop_cpu, process
+    
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+    
+    def set_phase(self, name):
+        self.phase = name
+    
+    def phase_summary(self, name):
+        """CPU, lag, task and GC figures for one phase, with the client-bound verdict"""
+        state = self.phases.get(name)
+        if not state or state['seconds'] <= 0:
+            return None
+        seconds = state['seconds']
+        lag = state['lag'].summary()
+        summary = {
+            'seconds': seconds,
+            'loop_cpu_percent': state['loop_cpu'] / seconds * 100,
+            'process_cpu_percent': state['process_cpu'] / seconds * 100,
+            'saturated_seconds': state['saturated_seconds'],
+            'loop_lag': lag,
+            'peak_tasks': state['peak_tasks'],
+            'gc_pauses': state['gc_pauses'],
+            'gc_pause_ms': state['gc_seconds'] * 1000,
+            'gc_max_pause_ms': state['gc_max'] * 1000,
+            'ready_callbacks_avg': state['ready_total'] / state['ticks'] if state['ticks'] else 0,
+            'ready_callbacks_peak': state['ready_peak'],
+            'slow_callback_ms': self.slow_callback_ms,
+            'slow_callbacks': [
+                {
+                    'location': location, 'count': count, 'total_ms': total * 1000, 'max_ms': longest * 1000,
+                    'suspended_at': [line for line, _ in lines.most_common(3)],
+                }
+                for location, (count, total, longest, lines) in sorted(
+                    state['slow_callbacks'].items(), key=lambda item: item[1][1], reverse=True
+                )[:self.top_callbacks]
+            ],
+        }
+        reasons = []
+        if summary['loop_cpu_percent'] >= self.cpu_threshold:
+            reasons.append(f"event loop thread at {summary['loop_cpu_percent']:.0f}% CPU")
+        if lag.get('p99_ms', 0) >= self.lag_threshold_ms:
+            reasons.append(f"p99 loop lag {lag['p99_ms']:.0f}ms")
+        summary['verdict'] = 'client-bound' if reasons else 'ok'
+        summary['reasons'] = reasons
+        return summary
+    
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+        summaries = {name: self.phase_summary(name) for name in self.phases}
+        return {name: summary for name, summary in summaries.items() if summary}
+
+
+def loop_hotspots_markdown(phases):
+    """Report section: per-phase loop lag and ready queue, then the slowest callbacks by source location"""
+    phases = {name: phase for name, phase in phases.items() if phase}
+    if not phases:
+        return ""
+    threshold = next(iter(phases.values())).get('slow_callback_ms')
+    section = "## 🐢 Event Loop Hot Spots\n\n"
+    section += "| Phase | Seconds | Lag p50 | Lag p99 | Lag max | Ready callbacks avg / peak | Slow callbacks |\n"
+    section += "|---|---|---|---|---|---|---|\n"
+    for name, phase in phases.items():
+        lag = phase['loop_lag']
+        slow = f"{sum(callback['count'] for callback in phase.get('slow_callbacks', [])):,}" if threshold else "-"
+        section += (f"| {name} | {phase['seconds']:.1f} | {lag.get('p50_ms', 0):.1f}ms | {lag.get('p99_ms', 0):.1f}ms | "
+                    f"{lag.get('max_ms', 0):.1f}ms | {phase.get('ready_callbacks_avg', 0):,.1f} / {phase.get('ready_callbacks_peak', 0):,} | {slow} |\n")
+    section += "\n"
+    if threshold:
+        section += f"Callbacks that held the loop for {threshold}ms or more, by total time (task steps are charged to their coroutine):\n\n"
+        for name, phase in phases.items():
+            for callback in phase.get('slow_callbacks', [])[:5]:
+                suspended = ", ".join(str(line) for line in callback['suspended_at'])
+                where = f", suspended at line {suspended}" if suspended else ""
+                section += (f"- **{name}:** `{callback['location']}` ×{callback['count']:,}, {callback['total_ms']:,.1f}ms total, "
+                            f"{callback['max_ms']:,.1f}ms max{where}\n")
+        section += "\n"
+    return section
+
+
+def saturation_line(saturation):
+    """One-line description of a phase's client_saturation summary"""
+    lag = saturation['loop_lag']
+    verdict = f"CLIENT-BOUND ({'; '.join(saturation['reasons'])})" if saturation['verdict'] == 'client-bound' else "ok"
+    return (f"loop CPU {saturation['loop_cpu_percent']:.0f}% (process {saturation['process_cpu_percent']:.0f}%), "
+            f"lag p99 {lag.get('p99_ms', 0):.1f}ms / max {lag.get('max_ms', 0):.1f}ms, peak {saturation['peak_tasks']:,} tasks, "
+            f"{saturation['gc_pauses']:,} GC pauses ({saturation['gc_pause_ms']:.1f}ms) → {verdict}")
+
+
+class PhaseProfiler:
+    """--profile: cProfile and tracemalloc around each test phase.
+    
+    Every phase writes profile_<phase>.prof (pstats/snakeviz) and
+    allocations_<phase>.txt (allocation sites ranked by growth over the phase,
+    with tracebacks) into the session directory. The summary keeps the hottest
+    functions by own time, with those defined in harness_file or this module
+    listed separately so harness hot spots stand out from library and
+    event-loop internals; `ignore` names instrumentation functions (such as
+    ClientSaturationMonitor.callback_timer) that sit under every callback and
+    are kept out of that list. cProfile is deterministic and slows the
+    harness, so a profiled run's rates are not comparable with unprofiled ones.
+    """
+    
+    def __init__(self, directory, harness_file, suffix='', top=15, frames=10, ignore=()):
+        self.directory = directory
+        self.suffix = suffix
+        self.top = top
+        self.frames = frames
+        self.harness_files = {os.path.abspath(harness_file), os.path.abspath(__file__)}
+        # pstats keys functions by their code object's (file, first line, name)
+        self.ignored = {(code.co_filename, code.co_firstlineno, code.co_name)
+                        for code in (function.__code__ for function in ignore if function)}
+        self.phase = None
+        self.profile = None
+        self.before = None
+    
+    def snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ))
+    
+    def start(self, phase):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+        tracemalloc.reset_peak()
+        self.phase = phase
+        self.before = self.snapshot()
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+    
+    def stop(self):
+        """Finish the current phase: dump the profile and allocation report, return the summary"""
+        if not self.profile:
+            return None
+        self.profile.disable()
+        after = self.snapshot()
+        _, traced_peak = tracemalloc.get_traced_memory()
+        name = f"{self.phase}{self.suffix}"
+        
+        profile_file = os.path.join(self.directory, f"profile_{name}.prof")
+        self.profile.dump_stats(profile_file)
+        stats = pstats.Stats(self.profile)
+        functions = []
+        for (filename, line, function), (_, calls, own, cumulative, _) in stats.stats.items():
+            functions.append({
+                'function': function,
+                'location': f"{os.path.basename(filename)}:{line}",
+                'calls': calls,
+                'own_ms': own * 1000,
+                'cumulative_ms': cumulative * 1000,
+                'harness': os.path.abspath(filename) in self.harness_files and (filename, line, function) not in self.ignored,
+            })
+        functions.sort(key=lambda function: function['own_ms'], reverse=True)
+        
+        growth = after.compare_to(self.before, 'lineno')
+        allocations_file = os.path.join(self.directory, f"allocations_{name}.txt")
+        with open(allocations_file, 'w') as f:
+            f.write(f"Top allocation sites by growth during {self.phase} (traced peak {traced_peak / 1024 / 1024:.1f}MB)\n\n")
+            for stat in growth[:self.top]:
+                f.write(f"{stat.size_diff / 1024:+,.1f}KB in {stat.count_diff:+,} blocks ({stat.size / 1024:,.1f}KB live)  {stat.traceback[0]}\n")
+            f.write("\nLargest growth by call stack (oldest frame first):\n\n")
+            for stat in after.compare_to(self.before, 'traceback')[:5]:
+                f.write(f"{stat.size_diff / 1024:+,.1f}KB in {stat.count_diff:+,} blocks\n")
+                f.write("\n".join(f"    {line}" for line in stat.traceback.format()) + "\n\n")
+        
+        self.profile = None
+        return {
+            'profile_file': os.path.basename(profile_file),
+            'allocations_file': os.path.basename(allocations_file),
+            'profiled_calls': stats.total_calls,
+            'profiled_seconds': stats.total_tt,
+            'traced_peak_mb': traced_peak / 1024 / 1024,
+            'hottest': functions[:self.top],
+            'harness_hottest': [function for function in functions if function['harness']][:self.top],
+            'allocations': [
+                {'site': str(stat.traceback[0]), 'size_kb': stat.size_diff / 1024, 'blocks': stat.count_diff}
+                for stat in growth[:self.top]
+            ],
+        }
+    
+    def close(self):
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+def profile_markdown(profiles):
+    """Report section: hottest harness functions and allocation sites per profiled phase"""
+    section = "## 🔬 Profile\n\ncProfile + tracemalloc per phase (profiling slows the harness; compare rates only with other profiled runs).\n\n"
+    for name, profile in profiles.items():
+        section += (f"### {name}\n\n{profile['profiled_calls']:,} calls, traced allocation peak {profile['traced_peak_mb']:.1f}MB; "
+                    f"`{profile['profile_file']}`, `{profile['allocations_file']}`\n\n")
+        section += "| Harness function | Location | Calls | Own ms | Cumulative ms |\n|---|---|---|---|---|\n"
+        for function in profile['harness_hottest'][:10]:
+            section += (f"| `{function['function']}` | {function['location']} | {function['calls']:,} | "
+                        f"{function['own_ms']:,.1f} | {function['cumulative_ms']:,.1f} |\n")
+        top = profile['hottest'][:5]
+        if top:
+            section += "\nHottest overall: " + ", ".join(f"`{function['function']}` ({function['location']}, {function['own_ms']:,.0f}ms)" for function in top) + "\n"
+        if profile['allocations']:
+            section += "\nTop allocation growth: " + ", ".join(f"{allocation['site']} ({allocation['size_kb']:+,.0f}KB)" for allocation in profile['allocations'][:3]) + "\n"
+        section += "\n"
+    return section
+
+
+class KernelTcpCounters:
+    """Host TCP counters from /proc/net/netstat, /proc/net/snmp and /proc/net/sockstat, per phase.
+    
+    A snapshot is taken when a phase starts and when it ends (and every
+    `interval` seconds in between when interval > 0), so each phase carries
+    the kernel's view of why connections failed next to the harness's
+    connection rate: accept-queue overflows (ListenOverflows/ListenDrops),
+    SYN-queue drops, retransmission timeouts, failed attempts, resets and
+    TIME-WAIT build-up against the ephemeral port range. The counters cover
+    the whole network namespace, so other traffic on the host is included.
+    """
+    
+    FILES = ('/proc/net/netstat', '/proc/net/snmp')
+    # Counters shown next to the connection rate, in report order
+    KEY_COUNTERS = ('TcpExt.ListenOverflows', 'TcpExt.ListenDrops', 'TcpExt.TCPReqQFullDrop', 'TcpExt.TCPReqQFullDoCookies',
+                    'TcpExt.TCPTimeouts', 'TcpExt.TCPSynRetrans', 'Tcp.RetransSegs', 'Tcp.AttemptFails', 'Tcp.EstabResets',
+                    'Tcp.OutRsts', 'TcpExt.TCPAbortOnMemory', 'TcpExt.TW', 'Tcp.ActiveOpens', 'Tcp.PassiveOpens')
+    # snmp values that are levels or settings, not running counts
+    GAUGES = ('Tcp.CurrEstab', 'Tcp.MaxConn', 'Tcp.RtoAlgorithm', 'Tcp.RtoMin', 'Tcp.RtoMax', 'Ip.Forwarding', 'Ip.DefaultTTL')
+    
+    def __init__(self, interval=0):
+        self.interval = interval
+        self.ephemeral_ports = ephemeral_port_range()
+        self.phase = None
+        self.samples = []
+        self.task = None
+    
+    @classmethod
+    def available(cls):
+        return all(os.path.exists(path) for path in cls.FILES)
+    
+    @staticmethod
+    def read_counters(path):
+        """'Section: name ...' / 'Section: value ...' line pairs as {'Section.name': value}"""
+        with open(path) as f:
+            lines = f.read().splitlines()
+        counters = {}
+        for header, values in zip(lines[::2], lines[1::2]):
+            section, _, names = header.partition(':')
+            for name, value in zip(names.split(), values.partition(':')[2].split()):
+                counters[f"{section}.{name}"] = int(value)
+        return counters
+    
+    @staticmethod
+    def read_sockstat():
+        """TCP socket levels: inuse, orphan, tw (TIME-WAIT), alloc and mem (pages)"""
+        with open('/proc/net/sockstat') as f:
+            for line in f:
+                if line.startswith('TCP:'):
+                    fields = line.split()[1:]
+                    return {name: int(value) for name, value in zip(fields[::2], fields[1::2])}
+        return {}
+    
+    def snapshot(self):
+        counters = {}
+        for path in self.FILES:
+            counters.update(self.read_counters(path))
+        return {'time': time.perf_counter(), 'counters': counters, 'sockstat': self.read_sockstat()}
+    
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            self.samples.append(self.snapshot())
+    
+    def start(self, phase):
+        self.phase = phase
+        self.samples = [self.snapshot()]
+        if self.interval > 0:
+            self.task = asyncio.create_task(self.run())
+    
+    def stop(self):
+        """Take the phase's closing snapshot and return its summary"""
+        if self.task:
+            self.task.cancel()
+            self.task = None
+        self.samples.append(self.snapshot())
+        return self.summary()
+    
+    def deltas(self, before, after):
+        return {
+            name: after['counters'][name] - value for name, value in before['counters'].items()
+            if name in after['counters'] and name not in self.GAUGES and after['counters'][name] != value
+        }
+    
+    def summary(self):
+        """Counter deltas, socket levels (start, end, peak) and what they point at"""
+        first, last = self.samples[0], self.samples[-1]
+        seconds = last['time'] - first['time']
+        deltas = self.deltas(first, last)
+        key = {name.split('.', 1)[1]: deltas.get(name, 0) for name in self.KEY_COUNTERS}
+        sockets = {
+            level: {
+                'start': first['sockstat'].get(level, 0),
+                'end': last['sockstat'].get(level, 0),
+                'peak': max(sample['sockstat'].get(level, 0) for sample in self.samples),
+            }
+            for level in ('inuse', 'orphan', 'tw')
+        }
+        summary = {
+            'seconds': seconds,
+            'counters': key,
+            'other_deltas': {name: delta for name, delta in deltas.items() if name not in self.KEY_COUNTERS},
+            'sockets': sockets,
+            'kernel_accept_rate': key['PassiveOpens'] / seconds if seconds > 0 else 0,
+            'ephemeral_ports': self.ephemeral_ports,
+            'findings': self.findings(key, sockets),
+        }
+        if len(self.samples) > 2:
+            summary['timeline'] = [
+                {
+                    'elapsed': sample['time'] - first['time'],
+                    **{name.split('.', 1)[1]: delta for name, delta in self.deltas(previous, sample).items() if name in self.KEY_COUNTERS},
+                    'tw': sample['sockstat'].get('tw', 0),
+                    'inuse': sample['sockstat'].get('inuse', 0),
+                }
+                for previous, sample in zip(self.samples, self.samples[1:])
+            ]
+        return summary
+    
+    def findings(self, counters, sockets):
+        """Which kernel or server limit the counters point at"""
+        findings = []
+        if counters['ListenOverflows'] or counters['ListenDrops']:
+            findings.append(f"accept queue overflowed {counters['ListenOverflows']:,} times ({counters['ListenDrops']:,} SYNs dropped): "
+                            f"the server accepts too slowly or its listen backlog / net.core.somaxconn is too small")
+        if counters['TCPReqQFullDrop']:
+            findings.append(f"SYN queue full, {counters['TCPReqQFullDrop']:,} SYNs dropped (net.ipv4.tcp_max_syn_backlog)")
+        if counters['TCPReqQFullDoCookies']:
+            findings.append(f"SYN queue full, {counters['TCPReqQFullDoCookies']:,} SYNs answered with syncookies")
+        if counters['TCPTimeouts'] or counters['TCPSynRetrans']:
+            findings.append(f"{counters['TCPTimeouts']:,} retransmission timeouts ({counters['TCPSynRetrans']:,} SYN retransmits): "
+                            f"dropped SYNs or segments show up as connect latency of 1s and more")
+        if counters['AttemptFails']:
+            findings.append(f"{counters['AttemptFails']:,} connection attempts failed (refused or reset during the handshake)")
+        if counters['EstabResets']:
+            findings.append(f"{counters['EstabResets']:,} established connections were reset")
+        if counters['TCPAbortOnMemory']:
+            findings.append(f"{counters['TCPAbortOnMemory']:,} connections aborted under TCP memory pressure (net.ipv4.tcp_mem)")
+        if sockets['tw']['peak'] > self.ephemeral_ports / 2:
+            findings.append(f"{sockets['tw']['peak']:,} sockets in TIME-WAIT against a {self.ephemeral_ports:,}-port ephemeral range: "
+                            f"new connects risk EADDRNOTAVAIL (ephemeral port exhaustion)")
+        return findings
+
+
+def kernel_tcp_line(kernel):
+    counters = kernel['counters']
+    shown = ['ListenOverflows', 'ListenDrops', 'TCPTimeouts', 'RetransSegs']
+    shown += [name for name in ('TCPReqQFullDrop', 'TCPSynRetrans', 'AttemptFails', 'EstabResets', 'TCPAbortOnMemory') if counters[name]]
+    tw = kernel['sockets']['tw']
+    return (", ".join(f"{name} +{counters[name]:,}" for name in shown)
+            + f", TIME-WAIT {tw['start']:,} → {tw['end']:,} (peak {tw['peak']:,}), kernel accepts {kernel['kernel_accept_rate']:,.0f}/sec")
+
+
+def kernel_tcp_markdown(phases):
+    """Per-phase kernel TCP counter deltas beside the harness's connection rate"""
+    if not phases:
+        return ""
+    markdown = ("## 🧮 Kernel TCP Counters\n\nDeltas of /proc/net/netstat and /proc/net/snmp over each phase, "
+                "TIME-WAIT from /proc/net/sockstat (host-wide, so other traffic is included).\n\n"
+                "| Phase | Seconds | Harness conn/sec | Kernel accepts/sec | ListenOverflows | ListenDrops | SYN queue drops | "
+                "TCPTimeouts | RetransSegs | AttemptFails | EstabResets | TIME-WAIT (peak) |\n"
+                "|---|---|---|---|---|---|---|---|---|---|---|---|\n")
+    for name, kernel in phases.items():
+        counters = kernel['counters']
+        rate = f"{kernel['connection_rate']:,.0f}" if kernel.get('connection_rate') is not None else "-"
+        tw = kernel['sockets']['tw']
+        markdown += (f"| {name} | {kernel['seconds']:.1f} | {rate} | {kernel['kernel_accept_rate']:,.0f} | {counters['ListenOverflows']:,} | "
+                     f"{counters['ListenDrops']:,} | {counters['TCPReqQFullDrop']:,} | {counters['TCPTimeouts']:,} | {counters['RetransSegs']:,} | "
+                     f"{counters['AttemptFails']:,} | {counters['EstabResets']:,} | {tw['end']:,} ({tw['peak']:,}) |\n")
+    markdown += "\n"
+    for name, kernel in phases.items():
+        for finding in kernel['findings']:
+            markdown += f"- ⚠️ **{name}:** {finding}\n"
+    if any(kernel['findings'] for kernel in phases.values()):
+        markdown += "\n"
+    return markdown
+
+
+class PhaseInstruments:
+    """The bookkeeping every harness wraps around a test phase.
+    
+    Labels the phase on the stats scrapers and samplers (`labels` are callables
+    taking a phase name) and on the client saturation monitor, takes kernel TCP
+    counters and the optional profile over it, then files what they measured
+    under the phase's result and the session dict. A shard runs with
+    report=False: its measurements ride back on the result and nothing prints.
+    """
+    
+    def __init__(self, session, labels=(), client_monitor=None, kernel_counters=None, profiler=None, report=True):
+        self.session = session
+        self.labels = [label for label in labels if label]
+        self.client_monitor = client_monitor
+        self.kernel_counters = kernel_counters
+        self.profiler = profiler
+        self.report = report
+    
+    def start(self, name, profile=True):
+        for label in self.labels:
+            label(name)
+        if self.client_monitor:
+            self.client_monitor.set_phase(name)
+        if self.kernel_counters:
+            self.kernel_counters.start(name)
+        if self.profiler and profile:
+            self.profiler.start(name)
+    
+    def stop(self):
+        """Stop the phase's counters and profile and return the labels to idle"""
+        profile = self.profiler.stop() if self.profiler else None
+        kernel = self.kernel_counters.stop() if self.kernel_counters else None
+        for label in self.labels:
+            label('idle')
+        if self.client_monitor:
+            self.client_monitor.set_phase('idle')
+        return profile, kernel
+    
+    def record(self, name, result, profile=None, kernel=None):
+        """Attach a finished phase's saturation, profile and kernel deltas to its result and print them"""
+        result = result if isinstance(result, dict) else None
+        saturation = self.client_monitor.phase_summary(name) if self.client_monitor else None
+        if saturation and result is not None:
+            result['client_saturation'] = saturation
+            if self.report:
+                print(f"   🩺 Client: {saturation_line(saturation)}")
+        if profile:
+            if not self.report:
+                if result is not None:
+                    result['profile'] = profile
+            else:
+                self.session.setdefault('profile', {})[name] = profile
+                hottest = profile['harness_hottest'][:1]
+                top = f"; hottest harness function {hottest[0]['function']} ({hottest[0]['own_ms']:,.0f}ms own)" if hottest else ""
+                print(f"   🔬 Profile: {profile['profiled_calls']:,} calls, traced peak {profile['traced_peak_mb']:.1f}MB{top} "
+                      f"→ {profile['profile_file']}")
+        if kernel:
+            if result is not None:
+                kernel['connection_rate'] = result.get('connection_rate', result.get('achieved_connect_rate'))
+                result['kernel_tcp'] = kernel
+            self.session.setdefault('kernel_tcp', {})[name] = kernel
+            print(f"   🧮 Kernel TCP: {kernel_tcp_line(kernel)}")
+            for finding in kernel['findings']:
+                print(f"   ⚠️ {finding}")
+    
+    async def run(self, name, phase, result_of=None, profile=True):
+        """Await phase() inside start/stop and record against its return value, or result_of() if given"""
+        self.start(name, profile)
+        try:
+            returned = await phase()
+        finally:
+            measured = self.stop()
+        self.record(name, returned if result_of is None else result_of(), *measured)
+        return returned
+
+
+async def probe_readiness(host, port, ws_url, health_path='/health', started=None, timeout=10.0,
+                          interval=0.005, process=None):
+    """Poll a starting server until it listens, upgrades a WebSocket and answers its health check.
+    
+    Every probe is async and retried every `interval` seconds, so startup is
+    resolved to a few milliseconds without blocking the event loop. Times are
+    seconds since `started` (a perf_counter reading taken before the spawn).
+    A None health_path skips the health stage for servers without HTTP routes.
+    """
+    started = time.perf_counter() if started is None else started
+    deadline = started + timeout
+    result = {'ready': False, 'time_to_listen': None, 'time_to_first_upgrade': None,
+              'time_to_healthy': None, 'attempts': 0}
+    
+    async def until(stage, attempt):
+        while time.perf_counter() < deadline:
+            if process is not None and process.poll() is not None:
+                result['exit_code'] = process.returncode
+                return False
+            result['attempts'] += 1
+            try:
+                if await attempt():
+                    result[stage] = time.perf_counter() - started
+                    return True
+            except Exception:
+                pass
+            await asyncio.sleep(interval)
+        return False
+    
+    async def listening():
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), 1)
+        writer.close()
+        return True
+    
+    async def upgraded():
+        ws = await websockets.connect(ws_url, open_timeout=1, close_timeout=1, ping_interval=None, compression=None)
+        await ws.close()
+        return True
+    
+    async def healthy():
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), 1)
+        try:
+            writer.write(f"GET {health_path} HTTP/1.1\r\nHost: {host}:{port}\r\nConnection: close\r\n\r\n".encode())
+            status_line = await asyncio.wait_for(reader.readline(), 1)
+        finally:
+            writer.close()
+        return status_line.split()[1:2] == [b'200']
+    
+    if await until('time_to_listen', listening):
+        stages = [until('time_to_first_upgrade', upgraded)]
+        if health_path:
+            stages.append(until('time_to_healthy', healthy))
+        result['ready'] = all(await asyncio.gather(*stages))
+    return result
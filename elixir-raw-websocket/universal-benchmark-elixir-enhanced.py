@@ -5,13 +5,56 @@ import json
 import time
 import statistics
 import os
+import argparse
+import urllib.request
 from datetime import datetime
+from urllib.parse import urlparse
 import signal
 import sys
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # repository root, see bench_common.py
+from bench_common import (
+    BackpressureMonitor, ClientSaturationMonitor, KernelTcpCounters, LATENCY_MARKER,
+    LatencyHistogram, PAYLOAD_ENCODINGS, PayloadTemplate, PhaseInstruments, PhaseProfiler,
+    RoundRobinScheduler, SendEngine, SourceAddressPool, StatsScraper, WireCounter, classify_sweep,
+    compression_kwargs, compression_label, cpu_seconds, deflate_negotiated, drain_summary,
+    drift_summary, fairness_summary, frame_text, kernel_tcp_line, kernel_tcp_markdown, latency_tag,
+    loop_hotspots_markdown, make_hold_sampler, make_size_sampler, profile_markdown,
+    teardown_connections, watch_server_drain,
+)
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# run_phase name -> the results key its test fills in
+PHASE_RESULTS = {'connection': 'connection_test', 'message': 'message_test', 'endurance': 'endurance_test',
+                 'payload_sweep': 'payload_sweep', 'churn': 'churn_test'}
+
 class EnhancedElixirWebSocketBenchmark:
-    def __init__(self, config):
+    def __init__(self, config, profile=False):
         self.config = config
+
+        # permessage-deflate offer, bytes on the wire and CPU per phase
+        self.compression = config.get('compression')
+        self.wire = WireCounter()
+        self.client_process = psutil.Process() if psutil else None
+        self.beam_process = None
+
+        # Optional write-buffer high-water mark; sends drain above it
+        backpressure_config = config.get('backpressure', {})
+        self.backpressure = BackpressureMonitor(
+            backpressure_config.get('high_water', 16384), backpressure_config.get('low_water')
+        ) if backpressure_config.get('enabled', False) else None
+
+        # Frame format for sends; the raw handler counts binary frames without decoding them
+        self.payload_encoding = config.get('payload', {}).get('encoding', 'json')
+        if self.payload_encoding not in PAYLOAD_ENCODINGS:
+            raise ValueError(f"Unknown payload encoding: {self.payload_encoding} "
+                             f"(expected one of {', '.join(PAYLOAD_ENCODINGS)})")
+        if self.payload_encoding != 'json' and not config.get('raw_websocket'):
+            raise ValueError("Phoenix channels need JSON text frames; binary encodings require raw_websocket")
         self.connections = []
         self.stats = {
             'connections_created': 0,
@@ -30,17 +73,70 @@ class EnhancedElixirWebSocketBenchmark:
                 'timestamp': datetime.now().isoformat(),
                 'server_url': config.get('server_url', 'ws://localhost:8081/socket/websocket'),
                 'language': 'elixir',
-                'framework': 'phoenix' if 'phoenix' in config.get('server_url', '') else 'raw'
+                'framework': 'phoenix' if 'phoenix' in config.get('server_url', '') else 'raw',
+                'payload_encoding': self.payload_encoding,
+                'compression': compression_label(config.get('compression'))
             },
             'connection_test': {},
             'message_test': {},
             'endurance_test': {},
+            'payload_sweep': {},
+            'churn_test': {},
             'system_info': self.get_system_info()
         }
 
+        # Reader tasks (drain and/or latency probes) and per-phase receive state
+        self.latency_config = config.get('latency', {})
+        # Only every probe_every-th message is a broadcast chat_message probe; the rest stay benchmark_test
+        self.probe_every = max(1, self.latency_config.get('probe_every', 100))
+        self.receiver_tasks = []
+        self.latency_probes = set()
+        self.e2e_latency = LatencyHistogram()
+        self.received = {'frames': 0, 'messages': 0, 'bytes': 0}
+        self.received_before = 0
+        self.receive_phase_start = time.time()
+
+        # Background /stats time series; send engines are kept for the running client counts
+        self.send_engines = []
+        scrape_config = config.get('stats_scraper', {})
+        self.stats_scraper = StatsScraper(
+            scrape_config.get('url', self.stats_url()), self.client_counts, scrape_config.get('interval', 1.0)
+        ) if scrape_config.get('enabled', True) else None
+
+        # Event-loop lag, loop-thread CPU, tasks and GC pauses of this process, per phase
+        client_config = config.get('client_monitor', {})
+        self.client_monitor = ClientSaturationMonitor(
+            client_config.get('interval', 0.1),
+            client_config.get('cpu_threshold', 90),
+            client_config.get('lag_threshold_ms', 50),
+            client_config.get('slow_callback_ms'),
+            client_config.get('top_callbacks', 10)
+        ) if client_config.get('enabled', True) else None
+
+        # Host TCP counters (/proc/net/netstat, snmp, sockstat) at every phase boundary
+        kernel_config = config.get('kernel_counters', {})
+        self.kernel_counters = KernelTcpCounters(
+            kernel_config.get('interval', 0)
+        ) if kernel_config.get('enabled', True) and KernelTcpCounters.available() else None
+
+        # Optional source-address fan-out past the per-target ephemeral port limit
+        source_addresses = config.get('source_addresses')
+        self.source_pool = SourceAddressPool(source_addresses) if source_addresses else None
+
         # Create results directory
         self.results_dir = self.create_results_directory()
 
+        # --profile: cProfile + tracemalloc per test phase, dumped into the session directory
+        self.profiler = PhaseProfiler(
+            self.results_dir, __file__, ignore=[self.client_monitor and self.client_monitor.callback_timer]
+        ) if profile else None
+        if profile:
+            self.results['benchmark_info']['profiled'] = True
+        self.instruments = PhaseInstruments(
+            self.results, [self.stats_scraper and self.stats_scraper.set_phase],
+            self.client_monitor, self.kernel_counters, self.profiler
+        )
+
     def get_system_info(self):
         """Get system information"""
         import platform
@@ -66,6 +162,16 @@ class EnhancedElixirWebSocketBenchmark:
 
     def save_results(self):
         """Save benchmark results to JSON file"""
+        # A result produced while the load generator was saturated measures the harness
+        judged = {name: result for name, result in self.results.items()
+                  if isinstance(result, dict) and result.get('client_saturation')}
+        if judged:
+            bound = [name for name, result in judged.items() if result['client_saturation']['verdict'] == 'client-bound']
+            self.results['client_verdict'] = 'client-bound' if bound else 'ok'
+            self.results['client_bound_tests'] = bound
+            if bound:
+                print(f"⚠️ Client-bound: the load generator saturated during {', '.join(bound)}; "
+                      f"those rates measure the harness, not the BEAM")
         results_file = os.path.join(self.results_dir, f"results_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{self.config.get('test_name', 'elixir')}.json")
 
         with open(results_file, 'w') as f:
@@ -87,7 +193,13 @@ class EnhancedElixirWebSocketBenchmark:
             f.write(f"**Test Name:** {self.results['benchmark_info']['test_name']}\n")
             f.write(f"**Framework:** {self.results['benchmark_info']['framework'].title()}\n")
             f.write(f"**Timestamp:** {self.results['benchmark_info']['timestamp']}\n")
-            f.write(f"**Server URL:** {self.results['benchmark_info']['server_url']}\n\n")
+            f.write(f"**Server URL:** {self.results['benchmark_info']['server_url']}\n")
+            f.write(f"**Payload Encoding:** {self.payload_encoding}\n")
+            f.write(f"**Compression:** {compression_label(self.compression)}\n\n")
+            if self.results.get('client_verdict') == 'client-bound':
+                f.write(f"> ⚠️ **CLIENT-BOUND** during {', '.join(self.results['client_bound_tests'])}: the load generator "
+                        f"saturated (event loop CPU or lag over threshold), so those rates are a measurement of the harness, "
+                        f"not the server. Do not publish them as server comparisons.\n\n")
 
             # Connection test results
             if self.results['connection_test']:
@@ -97,7 +209,17 @@ class EnhancedElixirWebSocketBenchmark:
                 f.write(f"- **Achieved:** {conn.get('successful_connections', 0):,} ({conn.get('success_rate', 0):.1f}%)\n")
                 f.write(f"- **Rate:** {conn.get('connection_rate', 0):.1f} conn/sec\n")
                 f.write(f"- **Duration:** {conn.get('duration', 0):.2f}s\n")
-                f.write(f"- **Failed:** {conn.get('failed_connections', 0):,}\n\n")
+                f.write(f"- **Failed:** {conn.get('failed_connections', 0):,}\n")
+                f.write(f"- **Compression:** {conn['compression']}, negotiated on {conn['compression_negotiated']:,} connections\n")
+                if conn.get('kernel_tcp'):
+                    f.write(f"- **Kernel TCP:** {kernel_tcp_line(conn['kernel_tcp'])}\n")
+                    for finding in conn['kernel_tcp']['findings']:
+                        f.write(f"  - ⚠️ {finding}\n")
+                f.write("\n")
+                for address, usage in conn.get('source_ports', {}).items():
+                    f.write(f"- **Source {address}:** {usage['ports_in_use']:,} ports in use ({usage['port_utilization']:.1f}% of ephemeral range), {usage['failed']:,} failed\n")
+                if conn.get('source_ports'):
+                    f.write("\n")
 
             # Message test results
             if self.results['message_test']:
@@ -115,7 +237,145 @@ class EnhancedElixirWebSocketBenchmark:
                 f.write(f"## 💪 Endurance Test Results\n\n")
                 f.write(f"- **Duration:** {end.get('duration', 0):.1f}s\n")
                 f.write(f"- **Messages:** {end.get('total_messages', 0):,}\n")
-                f.write(f"- **Avg Rate:** {end.get('average_rate', 0):,.0f} msg/sec\n\n")
+                f.write(f"- **Avg Rate:** {end.get('average_rate', 0):,.0f} msg/sec\n")
+                if 'fairness' in end:
+                    fairness = end['fairness']
+                    f.write(f"- **Fairness:** Jain index {fairness['jain_index']:.3f}; {fairness['active_connections']:,} of "
+                            f"{fairness['connections']:,} connections sent, {fairness['min_sent']:,}-{fairness['max_sent']:,} messages each\n")
+                f.write("\n")
+
+            # Payload sweep results
+            if self.results['payload_sweep']:
+                f.write(f"## 📏 Payload Sweep Results\n\n")
+                f.write("| Payload | Frame | msg/sec | MB/sec | Wire ratio | Client CPU | BEAM CPU | Send p50 | Send p99 | E2E p99 | Regime |\n")
+                f.write("|---|---|---|---|---|---|---|---|---|---|---|\n")
+                for step in self.results['payload_sweep']['steps']:
+                    label = f"{step['size']:,}B" if step['size'] is not None else "distribution"
+                    send = step['send_latency']
+                    e2e = step.get('e2e_latency')
+                    e2e_p99 = f"{e2e['p99_ms']:.2f}ms" if e2e else "-"
+                    client_cpu = f"{step['client_cpu_percent']:.0f}%" if 'client_cpu_percent' in step else "-"
+                    server_cpu = f"{step['server_cpu_percent']:.0f}%" if 'server_cpu_percent' in step else "-"
+                    f.write(f"| {label} | {step['avg_frame_bytes']:,.0f}B | {step['message_rate']:,.0f} | {step['mb_per_sec']:,.2f} | "
+                            f"{step.get('wire_ratio', 0):.2f} | {client_cpu} | {server_cpu} | "
+                            f"{send.get('p50_ms', 0):.2f}ms | {send.get('p99_ms', 0):.2f}ms | {e2e_p99} | {step.get('regime', '-')} |\n")
+                f.write("\n")
+
+            # Churn test results
+            if self.results['churn_test']:
+                churn = self.results['churn_test']
+                f.write(f"## 🔁 Churn Test Results\n\n")
+                f.write(f"- **Offered Connect Rate:** {churn['connect_rate']:,} conn/sec for {churn['duration']:.1f}s\n")
+                f.write(f"- **Connects:** {churn['connects']:,} ({churn['connect_failures']:,} failed)\n")
+                f.write(f"- **Disconnects:** {churn['disconnects']:,} ({churn['close_errors']:,} close errors)\n")
+                f.write(f"- **Sustained Churn:** {churn['churn_ops_rate']:,.0f} ops/sec ({churn['achieved_connect_rate']:,.0f} connects/sec)\n")
+                for key, label in (('handshake_latency', 'Handshake Latency'), ('close_latency', 'Close Latency')):
+                    latency = churn[key]
+                    if latency:
+                        f.write(f"- **{label}:** p50 {latency['p50_ms']:.2f}ms, p99 {latency['p99_ms']:.2f}ms, p99.9 {latency['p99_9_ms']:.2f}ms, max {latency['max_ms']:.2f}ms\n")
+                for key, label in (('rss_mb', 'BEAM RSS (MB)'), ('server_connections', 'Connection Counter'), ('ets_connections', 'ETS :connections')):
+                    drift = churn['server_drift'].get(key)
+                    if drift:
+                        f.write(f"- **{label}:** {drift['start']:,.1f} → {drift['end']:,.1f} (peak {drift['peak']:,.1f}, drift {drift['per_minute']:+,.2f}/min)\n")
+                f.write("\n")
+
+            # Teardown: client close rate and how fast the BEAM saw the connections go
+            if self.results.get('teardown'):
+                teardown = self.results['teardown']
+                f.write(f"## 🧹 Teardown Results\n\n")
+                f.write(f"- **Closed:** {teardown['graceful']:,} gracefully, {teardown['aborted']:,} aborted, "
+                        f"{teardown['already_closed']:,} already closed\n")
+                f.write(f"- **Close Rate:** {teardown['close_rate']:,.0f} conn/sec over {teardown['teardown_seconds']:.2f}s "
+                        f"({teardown['concurrency']:,} in parallel)\n")
+                if 'server_connections_before' in teardown:
+                    drain = f"{teardown['server_drain_seconds']:.2f}s" if teardown['server_drain_seconds'] is not None else "not within timeout"
+                    f.write(f"- **Server Drain:** {teardown['server_connections_before']:,} → {teardown['server_connections_after']:,} "
+                            f"connections at {teardown['server_disconnect_rate']:,.0f}/sec, zero after {drain}\n")
+                f.write("\n")
+
+            # Delivered (fan-out) throughput from the per-connection drain readers
+            for name in ('message_test', 'endurance_test'):
+                phase = self.results[name]
+                if phase and 'messages_received' in phase:
+                    f.write(f"## 📥 {name.replace('_', ' ').title()} Delivery\n\n")
+                    f.write(f"- **Delivered:** {phase['messages_received']:,} messages ({phase['bytes_received'] / 1024 / 1024:.1f}MB)\n")
+                    f.write(f"- **Delivered Rate:** {phase['delivered_rate']:,.0f} msg/sec\n")
+                    f.write(f"- **Fan-out:** {phase['fanout_ratio']:.1f}x per sent message\n\n")
+
+            # Bytes after framing/compression and CPU during the send window
+            for name in ('message_test', 'endurance_test'):
+                phase = self.results[name]
+                if phase and 'wire_bytes_sent' in phase:
+                    f.write(f"## 🗜️ {name.replace('_', ' ').title()} Wire & CPU\n\n")
+                    f.write(f"- **Wire Sent:** {phase['wire_bytes_sent'] / 1024 / 1024:.1f}MB\n")
+                    f.write(f"- **Wire Received:** {phase['wire_bytes_received'] / 1024 / 1024:.1f}MB\n")
+                    if 'client_cpu_percent' in phase:
+                        f.write(f"- **Client CPU:** {phase['client_cpu_percent']:.0f}%\n")
+                    if 'server_cpu_percent' in phase:
+                        f.write(f"- **BEAM CPU:** {phase['server_cpu_percent']:.0f}%\n")
+                    if 'blocked_seconds' in phase:
+                        f.write(f"- **Backpressure:** blocked {phase['blocked_seconds']:.2f}s over {phase['backpressure_pauses']:,} pauses "
+                                f"(high-water {phase['backpressure_high_water']:,}B, peak {phase['peak_buffered_bytes']:,}B buffered)\n")
+                        f.write(f"- **Enqueued vs Accepted:** {phase['enqueued_rate']:,.0f} msg/sec handed to transports, "
+                                f"{phase['accepted_rate']:,.0f} msg/sec accepted ({phase['flush_seconds']:.2f}s flush)\n")
+                    f.write("\n")
+
+            # Send latency is measured from each open-loop message's scheduled
+            # time; end-to-end latency from the probe stamp to its broadcast
+            for name in ('message_test', 'endurance_test'):
+                for key, label in (('send_latency', 'Send Latency'), ('e2e_latency', 'End-to-End Latency')):
+                    latency = self.results[name].get(key) if self.results[name] else None
+                    if latency:
+                        f.write(f"## ⏲️ {name.replace('_', ' ').title()} {label}\n\n")
+                        if key == 'send_latency':
+                            f.write(f"- **Offered:** {self.results[name]['arrival_rate']:,} msg/sec (open loop)\n")
+                        f.write(f"- **Samples:** {latency['count']:,}\n")
+                        f.write(f"- **p50:** {latency['p50_ms']:.2f}ms\n")
+                        f.write(f"- **p90:** {latency['p90_ms']:.2f}ms\n")
+                        f.write(f"- **p99:** {latency['p99_ms']:.2f}ms\n")
+                        f.write(f"- **p99.9:** {latency['p99_9_ms']:.2f}ms\n")
+                        f.write(f"- **Max:** {latency['max_ms']:.2f}ms\n\n")
+
+            # Server /stats time series next to the client's own counters
+            timeline = self.results.get('server_timeline')
+            if timeline:
+                summary = timeline['summary']
+                f.write(f"## 📡 Server Stats Timeline\n\n")
+                f.write(f"{summary['samples']:,} samples of `{summary['url']}` every {summary['interval']}s "
+                        f"({summary['failures']:,} failed, scrape p50 {summary['scrape_ms_p50'] or 0:.1f}ms). "
+                        f"Rates are per phase, from counter deltas between samples.\n\n")
+                f.write("| Phase | Seconds | Client sent msg/sec | Client received msg/sec | Server msg/sec | Server/client | Peak connections | Peak ETS connections |\n")
+                f.write("|---|---|---|---|---|---|---|---|\n")
+                for name, phase in summary['phases'].items():
+                    rates = [f"{phase[key]:,.0f}" if key in phase else "-" for key in ('client_send_rate', 'client_recv_rate', 'server_msg_rate')]
+                    ratio = f"{phase['server_to_client_ratio']:.2f}" if 'server_to_client_ratio' in phase else "-"
+                    peak = phase['peak']
+                    f.write(f"| {name} | {phase['seconds']:.1f} | {' | '.join(rates)} | {ratio} | "
+                            f"{peak.get('connections', '-')} | {peak.get('connection_list', '-')} |\n")
+                f.write("\n")
+
+            # Harness hot spots: loop lag and the callbacks that blocked it
+            f.write(loop_hotspots_markdown(self.results.get('client_phases', {})))
+
+            if self.results.get('profile'):
+                f.write(profile_markdown(self.results['profile']))
+
+            f.write(kernel_tcp_markdown(self.results.get('kernel_tcp')))
+
+            # Load generator self-instrumentation per phase
+            judged = [(name, result['client_saturation']) for name, result in self.results.items()
+                      if isinstance(result, dict) and result.get('client_saturation')]
+            if judged:
+                f.write(f"## 🩺 Load Generator Health\n\n")
+                f.write("| Test | Loop CPU | Process CPU | Lag p50 | Lag p99 | Lag max | Peak tasks | GC pauses | Verdict |\n")
+                f.write("|---|---|---|---|---|---|---|---|---|\n")
+                for name, saturation in judged:
+                    lag = saturation['loop_lag']
+                    verdict = f"⚠️ client-bound ({'; '.join(saturation['reasons'])})" if saturation['verdict'] == 'client-bound' else "ok"
+                    f.write(f"| {name} | {saturation['loop_cpu_percent']:.0f}% | {saturation['process_cpu_percent']:.0f}% | "
+                            f"{lag.get('p50_ms', 0):.1f}ms | {lag.get('p99_ms', 0):.1f}ms | {lag.get('max_ms', 0):.1f}ms | "
+                            f"{saturation['peak_tasks']:,} | {saturation['gc_pauses']:,} ({saturation['gc_pause_ms']:.1f}ms) | {verdict} |\n")
+                f.write("\n")
 
         print(f"📝 Report saved: {report_file}")
 
@@ -135,21 +395,40 @@ class EnhancedElixirWebSocketBenchmark:
             self.stats['errors'].append(f"Connection error: {str(e)}")
             return None
 
+    def next_source(self):
+        """Pick the next source address; returns (address or None, connect kwargs)"""
+        connect_kwargs = compression_kwargs(self.compression)
+        if not self.source_pool:
+            return None, connect_kwargs
+        source = self.source_pool.next_address()
+        connect_kwargs['local_addr'] = (source, 0)
+        return source, connect_kwargs
+
     async def connect_to_raw_websocket(self, user_id, url):
         """Connect to raw Elixir WebSocket server"""
+        source, connect_kwargs = self.next_source()
         try:
             # Raw WebSocket - direct connection
-            websocket = await websockets.connect(f"{url}/{user_id}", ping_interval=None)
+            websocket = await websockets.connect(f"{url}/{user_id}", ping_interval=None, **connect_kwargs)
+            self.wire.attach(websocket)
+            if self.backpressure:
+                self.backpressure.attach(websocket)
             self.stats['connections_created'] += 1
             return websocket
         except Exception as e:
             self.stats['connections_failed'] += 1
+            if source:
+                self.source_pool.record_failure(source)
             return None
 
     async def connect_to_phoenix(self, user_id, url):
         """Connect to Phoenix WebSocket with proper handshake"""
+        source, connect_kwargs = self.next_source()
         try:
-            websocket = await websockets.connect(url, ping_interval=None)
+            websocket = await websockets.connect(url, ping_interval=None, **connect_kwargs)
+            self.wire.attach(websocket)
+            if self.backpressure:
+                self.backpressure.attach(websocket)
 
             # Phoenix handshake - join channel
             join_message = {
@@ -176,40 +455,255 @@ class EnhancedElixirWebSocketBenchmark:
         except Exception as e:
             self.stats['connections_failed'] += 1
             self.stats['errors'].append(f"Connection error: {str(e)}")
+            if source:
+                self.source_pool.record_failure(source)
             return None
 
-    async def send_message(self, websocket, content, sequence):
-        """Send message (Phoenix or Raw)"""
-        try:
+    def build_payloads(self, make_content, pool_size=None):
+        """Pre-serialize a pool of message variants for the current phase.
+
+        Each variant is a (message, probe) pair of templates. The raw handler
+        only counts benchmark_test and broadcasts chat_message to every
+        connection, so the load stays benchmark_test and the probe variant
+        (chat_message) is only built while latency probes are on.
+        """
+        pool_size = max(1, pool_size or self.config.get('payload', {}).get('pool_size', 64))
+
+        def make_message(k, message_type):
+            content = PayloadTemplate.PROBE + make_content(k)
             if 'raw_websocket' in self.config and self.config['raw_websocket']:
                 # Raw WebSocket message
-                message = {
-                    "type": "benchmark_test",
+                return {
+                    "type": message_type,
                     "content": content,
-                    "sequence": sequence,
-                    "timestamp": time.time()
-                }
-            else:
-                # Phoenix channel message
-                message = {
-                    "topic": "chat:lobby",
-                    "event": "benchmark_test",
-                    "payload": {
-                        "content": content,
-                        "sequence": sequence,
-                        "timestamp": time.time()
-                    },
-                    "ref": f"msg_{sequence}"
+                    "sequence": PayloadTemplate.SEQUENCE,
+                    "timestamp": PayloadTemplate.TIMESTAMP
                 }
+            # Phoenix channel message
+            return {
+                "topic": "chat:lobby",
+                "event": "benchmark_test",
+                "payload": {
+                    "content": content,
+                    "sequence": PayloadTemplate.SEQUENCE,
+                    "timestamp": PayloadTemplate.TIMESTAMP
+                },
+                "ref": f"msg_{PayloadTemplate.SEQUENCE}"
+            }
+
+        template = PAYLOAD_ENCODINGS[self.payload_encoding]
+        return [
+            (template(make_message(k, "benchmark_test")),
+             template(make_message(k, "chat_message")) if self.latency_probes else None)
+            for k in range(pool_size)
+        ]
+
+    def render_message(self, payload, sequence, sender=0, scheduled=None):
+        """Fill in a pre-serialized message (Phoenix or Raw); every probe_every-th one carries a latency probe"""
+        template, probe_template = payload
+        if probe_template and sequence % self.probe_every == 0:
+            # Open-loop sends stamp their scheduled time so stalls count as latency
+            timestamp_ns = int(scheduled * 1e9) if scheduled is not None else time.monotonic_ns()
+            return probe_template.render(probe=latency_tag(sender, timestamp_ns), sequence=sequence, timestamp=time.time())
+
+        return template.render(probe="", sequence=sequence, timestamp=time.time())
+
+    def create_send_engine(self, payloads, render=None):
+        """Writer per connection, counted in client_counts(); message k uses payload variant k and
+        sequence k unless `render(slot, k, scheduled)` is given"""
+        engine = SendEngine(
+            self.connections,
+            render or (lambda slot, k, scheduled: self.render_message(payloads[k % len(payloads)], k, slot, scheduled)),
+            lambda e: self.stats['errors'].append(f"Message error: {str(e)}")
+        )
+        self.send_engines.append(engine)
+        return engine
+
+    def client_counts(self):
+        """Messages sent and received since start, for the stats time series"""
+        return {
+            'client_sent': sum(engine.sent for engine in self.send_engines),
+            'client_received': self.received_before + self.received['messages'],
+        }
 
-            await websocket.send(json.dumps(message))
-            self.stats['messages_sent'] += 1
-            return True
+    async def close_send_engine(self, engine):
+        await engine.close()
+        self.stats['messages_sent'] += engine.sent
+        self.stats['messages_failed'] += engine.errors
+
+    @property
+    def drain_enabled(self):
+        return self.config.get('drain', {}).get('enabled', False)
+
+    def start_receiver(self, websocket):
+        """Start the single reader task allowed on a connection"""
+        self.receiver_tasks.append(asyncio.create_task(self.receive_frames(websocket)))
+
+    def begin_receive_phase(self):
+        """Reset per-phase receive counters and the latency histogram"""
+        if self.latency_config.get('enabled', False) and self.connections and not self.latency_probes:
+            receivers = self.connections[:self.latency_config.get('receivers', 4)]
+            self.latency_probes.update(receivers)
+            if not self.drain_enabled:
+                # Without drain only the probe receivers get a reader
+                for connection in receivers:
+                    self.start_receiver(connection)
+            print(f"⏱️ Latency receivers: {len(receivers)} (probe every {self.probe_every:,} messages)")
+
+        self.e2e_latency = LatencyHistogram()
+        self.received_before += self.received['messages']
+        self.received = {'frames': 0, 'messages': 0, 'bytes': 0}
+        self.receive_phase_start = time.time()
+
+    async def end_receive_phase(self, result, messages_sent):
+        """Wait for in-flight deliveries, then attach receive counters and latency"""
+        if not self.receiver_tasks:
+            return
 
-        except Exception as e:
-            self.stats['messages_failed'] += 1
-            self.stats['errors'].append(f"Message error: {str(e)}")
-            return False
+        grace_period = max(
+            self.latency_config.get('grace_period', 1.0) if self.latency_probes else 0,
+            self.config.get('drain', {}).get('grace_period', 1.0) if self.drain_enabled else 0
+        )
+        await asyncio.sleep(grace_period)
+
+        if self.latency_probes:
+            result['e2e_latency'] = self.e2e_latency.summary()
+            result['e2e_latency_histogram'] = self.e2e_latency.to_dict()
+
+        if self.drain_enabled:
+            receive_window = time.time() - self.receive_phase_start
+            result['frames_received'] = self.received['frames']
+            result['messages_received'] = self.received['messages']
+            result['bytes_received'] = self.received['bytes']
+            result['receive_window'] = receive_window
+            result['delivered_rate'] = self.received['messages'] / receive_window if receive_window > 0 else 0
+            result['fanout_ratio'] = self.received['messages'] / messages_sent if messages_sent else 0
+
+    async def receive_frames(self, websocket):
+        """Drain one connection, counting frames without JSON-decoding them"""
+        try:
+            async for frame in websocket:
+                received_ns = time.monotonic_ns()
+                received = self.received
+                received['frames'] += 1
+                received['messages'] += 1
+                if isinstance(frame, bytes):
+                    received['bytes'] += len(frame)
+                    frame = frame_text(frame)
+                else:
+                    received['bytes'] += len(frame.encode('utf-8'))
+
+                if websocket in self.latency_probes:
+                    for match in LATENCY_MARKER.finditer(frame):
+                        self.e2e_latency.record((received_ns - int(match.group(2))) / 1000)
+        except (websockets.ConnectionClosed, asyncio.CancelledError):
+            pass
+
+    def begin_cost_window(self):
+        """Snapshot wire bytes and client/BEAM CPU at the start of a send window"""
+        if self.beam_process is None:
+            self.beam_process = self.find_beam_process()
+        if self.backpressure:
+            self.backpressure.peak_buffered = 0
+        return {
+            'time': time.time(),
+            'backpressure': (self.backpressure.pauses, self.backpressure.blocked_time()) if self.backpressure else None,
+            'wire': (self.wire.sent, self.wire.received),
+            'client_cpu': cpu_seconds(self.client_process),
+            'server_cpu': cpu_seconds(self.beam_process)
+        }
+
+    async def end_cost_window(self, window, result):
+        """Attach wire bytes and CPU used since begin_cost_window to a result.
+
+        With backpressure enabled, also waits for the client buffers to flush:
+        enqueued_rate counts messages handed to the transports, accepted_rate
+        only those the server side has taken off the client's hands.
+        """
+        elapsed = time.time() - window['time']
+        result['wire_bytes_sent'] = self.wire.sent - window['wire'][0]
+        result['wire_bytes_received'] = self.wire.received - window['wire'][1]
+        if result.get('bytes_sent'):
+            result['wire_ratio'] = result['wire_bytes_sent'] / result['bytes_sent']
+        for key, process in (('client', self.client_process), ('server', self.beam_process)):
+            now = cpu_seconds(process)
+            if now is not None and window[f'{key}_cpu'] is not None:
+                result[f'{key}_cpu_seconds'] = now - window[f'{key}_cpu']
+                result[f'{key}_cpu_percent'] = result[f'{key}_cpu_seconds'] / elapsed * 100 if elapsed > 0 else 0
+        if self.backpressure:
+            monitor = self.backpressure
+            buffered, largest = monitor.buffered(self.connections)
+            blocked = monitor.blocked_time() - window['backpressure'][1]
+            flush_seconds = await monitor.wait_flushed(self.connections)
+            sent = result.get('messages_sent', result.get('total_messages', 0))
+            result.update({
+                'backpressure_high_water': monitor.high_water,
+                'backpressure_pauses': monitor.pauses - window['backpressure'][0],
+                'blocked_seconds': blocked,
+                'peak_buffered_bytes': max(monitor.peak_buffered, largest),
+                'buffered_at_end_bytes': buffered,
+                'flush_seconds': flush_seconds,
+                'enqueued_rate': sent / elapsed if elapsed > 0 else 0,
+                'accepted_rate': sent / (elapsed + flush_seconds) if elapsed + flush_seconds > 0 else 0
+            })
+
+    def print_phase_metrics(self, result):
+        """Print delivery, send and end-to-end latency lines for a phase result"""
+        if 'messages_received' in result:
+            print(f"   📥 Delivered: {result['messages_received']:,} msgs "
+                  f"({result['delivered_rate']:,.0f} msg/sec, {result['bytes_received'] / 1024 / 1024:.1f}MB, "
+                  f"fan-out {result['fanout_ratio']:.1f}x)")
+        if 'wire_bytes_sent' in result:
+            server_cpu = f", server {result['server_cpu_percent']:.0f}%" if 'server_cpu_percent' in result else ""
+            print(f"   🗜️ Wire: {result['wire_bytes_sent'] / 1024 / 1024:.1f}MB sent, "
+                  f"{result['wire_bytes_received'] / 1024 / 1024:.1f}MB received; CPU client "
+                  f"{result.get('client_cpu_percent', 0):.0f}%{server_cpu}")
+        if 'blocked_seconds' in result:
+            print(f"   🚧 Backpressure: blocked {result['blocked_seconds']:.2f}s over {result['backpressure_pauses']:,} pauses, "
+                  f"peak {result['peak_buffered_bytes'] / 1024:.0f}KB buffered; enqueued {result['enqueued_rate']:,.0f} msg/sec, "
+                  f"accepted {result['accepted_rate']:,.0f} msg/sec ({result['flush_seconds']:.2f}s flush)")
+        for key, label in (('handshake_latency', 'Handshake latency'), ('close_latency', 'Close latency'),
+                           ('send_latency', 'Send latency'), ('e2e_latency', 'E2E latency')):
+            latency = result.get(key)
+            if latency:
+                print(f"   ⏲️ {label}: p50 {latency['p50_ms']:.2f}ms, p99 {latency['p99_ms']:.2f}ms, "
+                      f"p99.9 {latency['p99_9_ms']:.2f}ms, max {latency['max_ms']:.2f}ms ({latency['count']:,} samples)")
+
+    async def send_open_loop(self, engine, rate, total, error_threshold, progress_interval, max_in_flight=10000):
+        """Send `total` messages at a constant arrival rate (open loop).
+
+        Each message is scheduled at start + k/rate and its latency is measured
+        from that scheduled time, so a stalling server shows up as latency
+        instead of silently lowering the offered load. Message k goes to
+        connection k % N through the engine's writers; sending stops once more
+        than `error_threshold` sends have failed.
+        """
+        loop = asyncio.get_running_loop()
+        interval = 1.0 / rate
+        connection_count = len(engine.connections)
+        start = loop.time()
+        next_progress = start + progress_interval
+        issued = 0
+
+        while issued < total and engine.errors <= error_threshold:
+            due = min(total, int((loop.time() - start) * rate) + 1)
+            while issued < due and engine.outstanding < max_in_flight:
+                engine.submit(issued % connection_count, issued, start + issued * interval)
+                issued += 1
+
+            now = loop.time()
+            if now >= next_progress:
+                print(f"📊 Open loop [{int(now - start)}s]: {engine.sent:,}/{total:,} sent ({engine.sent / (now - start):,.0f}/sec, offered {rate:,.0f}/sec)")
+                next_progress += progress_interval
+
+            if engine.outstanding >= max_in_flight:
+                # Client is saturated; queued messages keep accruing latency from their schedule
+                await engine.wait_for_space(max_in_flight)
+            else:
+                await asyncio.sleep(max(0, start + issued * interval - loop.time()))
+
+        await engine.wait_idle()
+        return engine.latency
 
     async def connection_test(self):
         """Test maximum concurrent connections"""
@@ -248,6 +742,8 @@ class EnhancedElixirWebSocketBenchmark:
                 for result in batch_results:
                     if result and not isinstance(result, Exception):
                         self.connections.append(result)
+                        if self.drain_enabled:
+                            self.start_receiver(result)
 
             except asyncio.TimeoutError:
                 print(f"\n⚠️ Batch timeout at {i:,} connections")
@@ -278,12 +774,20 @@ class EnhancedElixirWebSocketBenchmark:
             'batch_size': batch_size,
             'timeout': timeout
         }
+        if self.source_pool:
+            self.results['connection_test']['source_ports'] = self.source_pool.usage(self.connections)
+        self.results['connection_test']['compression'] = compression_label(self.compression)
+        self.results['connection_test']['compression_negotiated'] = sum(1 for ws in self.connections if deflate_negotiated(ws))
 
         print(f"\n📊 ELIXIR CONNECTION RESULTS:")
         print(f"   ✅ Achieved: {successful:,}/{target:,} ({successful/target*100:.1f}%)")
         print(f"   ⚡ Rate: {rate:.1f} conn/sec")
         print(f"   ⏱️ Time: {elapsed:.2f}s")
         print(f"   ❌ Failed: {self.stats['connections_failed']:,}")
+        print(f"   🗜️ Compression: {compression_label(self.compression)} "
+              f"(negotiated on {self.results['connection_test']['compression_negotiated']:,} connections)")
+        for address, usage in self.results['connection_test'].get('source_ports', {}).items():
+            print(f"   🔌 {address}: {usage['ports_in_use']:,} ports in use ({usage['port_utilization']:.1f}% of ephemeral range), {usage['failed']:,} failed")
 
     async def message_test(self):
         """Test message throughput"""
@@ -303,34 +807,47 @@ class EnhancedElixirWebSocketBenchmark:
         print(f"📦 Batch size: {batch_size}")
         print(f"💪 Using: {active_connections:,} connections")
 
-        start_time = time.time()
-
-        for i in range(0, target_messages, batch_size):
-            batch_end = min(i + batch_size, target_messages)
-
-            # Create message batch
-            batch_tasks = []
-            for j in range(i, batch_end):
-                connection = self.connections[j % active_connections]
-                content = f"benchmark_message_{j}" * self.config['tests']['message_test']['message_size_multiplier']
-
-                task = asyncio.create_task(self.send_message(connection, content, j))
-                batch_tasks.append(task)
-
-            # Execute batch
-            await asyncio.gather(*batch_tasks, return_exceptions=True)
-
-            # Progress update
-            elapsed = time.time() - start_time
-            rate = self.stats['messages_sent'] / elapsed if elapsed > 0 else 0
-            print(f"📊 Progress: {self.stats['messages_sent']:,}/{target_messages:,} ({rate:.0f} msg/sec)", end='\r')
-
-            # Check error threshold
-            if self.stats['messages_failed'] > self.config['tests']['message_test']['error_threshold']:
-                print(f"\n⚠️ Too many errors ({self.stats['messages_failed']:,}), stopping test")
-                break
-
-            await asyncio.sleep(0.001)
+        arrival_rate = self.config['tests']['message_test'].get('arrival_rate')
+        size_multiplier = self.config['tests']['message_test']['message_size_multiplier']
+        send_latency = None
+        self.begin_receive_phase()
+        costs = self.begin_cost_window()
+        payloads = self.build_payloads(lambda k: f"benchmark_message_{k}" * size_multiplier)
+
+        engine = self.create_send_engine(payloads)
+
+        if arrival_rate:
+            print(f"⏲️ Open loop: {arrival_rate:,} msg/sec offered")
+            start_time = time.time()
+            send_latency = await self.send_open_loop(
+                engine, arrival_rate, target_messages,
+                self.config['tests']['message_test'].get('error_threshold', float('inf')),
+                progress_interval=5,
+                max_in_flight=self.config['tests']['message_test'].get('max_in_flight', 10000)
+            )
+        else:
+            # Closed loop: keep at most batch_size messages queued across the writers
+            start_time = time.time()
+            error_threshold = self.config['tests']['message_test']['error_threshold'] - self.stats['messages_failed']
+
+            for j in range(target_messages):
+                if engine.outstanding >= batch_size:
+                    await engine.wait_for_space(batch_size)
+
+                    # Check error threshold
+                    if engine.errors > error_threshold:
+                        print(f"\n⚠️ Too many errors ({engine.errors:,}), stopping test")
+                        break
+                engine.submit(j % active_connections, j)
+
+                # Progress update
+                if j % batch_size == 0 and j > 0:
+                    elapsed = time.time() - start_time
+                    rate = engine.sent / elapsed if elapsed > 0 else 0
+                    print(f"📊 Progress: {engine.sent:,}/{target_messages:,} ({rate:.0f} msg/sec)", end='\r')
+
+            await engine.wait_idle()
+        await self.close_send_engine(engine)
 
         elapsed = time.time() - start_time
         rate = self.stats['messages_sent'] / elapsed if elapsed > 0 else 0
@@ -344,14 +861,23 @@ class EnhancedElixirWebSocketBenchmark:
             'message_rate': rate,
             'duration': elapsed,
             'active_connections': active_connections,
-            'batch_size': batch_size
+            'batch_size': batch_size,
+            'mode': 'open_loop' if arrival_rate else 'closed_loop',
+            'encoding': self.payload_encoding
         }
+        if arrival_rate:
+            self.results['message_test']['arrival_rate'] = arrival_rate
+            self.results['message_test']['send_latency'] = send_latency.summary()
+            self.results['message_test']['send_latency_histogram'] = send_latency.to_dict()
+        await self.end_cost_window(costs, self.results['message_test'])
+        await self.end_receive_phase(self.results['message_test'], self.results['message_test']['messages_sent'])
 
         print(f"\n📊 ELIXIR MESSAGE RESULTS:")
         print(f"   ✅ Sent: {self.stats['messages_sent']:,}/{target_messages:,} ({self.stats['messages_sent']/target_messages*100:.1f}%)")
         print(f"   ⚡ Rate: {rate:,.0f} msg/sec")
         print(f"   ❌ Errors: {self.stats['messages_failed']:,}")
         print(f"   ⏱️ Time: {elapsed:.2f}s")
+        self.print_phase_metrics(self.results['message_test'])
 
     async def endurance_test(self):
         """Test sustained performance - MAXIMUM THROUGHPUT"""
@@ -369,45 +895,70 @@ class EnhancedElixirWebSocketBenchmark:
         print(f"🎯 Duration: {duration} seconds")
         print(f"📊 Checkpoint interval: {checkpoint_interval}s")
 
-        start_time = time.time()
-        last_checkpoint = start_time
-        total_endurance_messages = 0
+        arrival_rate = self.config['tests']['endurance_test'].get('arrival_rate')
+        send_latency = None
         rates = []
-        checkpoint_start_messages = 0
-
-        while time.time() - start_time < duration:
-            # Send batch of messages AS FAST AS POSSIBLE
-            batch_tasks = []
-            for i in range(messages_per_batch):
-                connection = self.connections[i % len(self.connections)]
-                content = f"endurance_msg_{total_endurance_messages + i}"
-
-                task = asyncio.create_task(self.send_message(connection, content, total_endurance_messages + i))
-                batch_tasks.append(task)
-
-            await asyncio.gather(*batch_tasks, return_exceptions=True)
-            total_endurance_messages += messages_per_batch
-
-            # Checkpoint reporting
-            current_time = time.time()
-            if current_time - last_checkpoint >= checkpoint_interval:
-                # Calculate ACTUAL throughput for this checkpoint period
-                messages_in_period = total_endurance_messages - checkpoint_start_messages
-                period_duration = current_time - last_checkpoint
-                checkpoint_rate = messages_in_period / period_duration
-                rates.append(checkpoint_rate)
-
-                total_elapsed = current_time - start_time
-                overall_rate = total_endurance_messages / total_elapsed
-
-                print(f"💪 ENDURANCE [{int(total_elapsed)}s]: {total_endurance_messages:,} msgs ({checkpoint_rate:,.0f}/sec, overall: {overall_rate:,.0f}/sec)")
-
-                last_checkpoint = current_time
-                checkpoint_start_messages = total_endurance_messages
-
-            # REMOVE OR MINIMIZE THE SLEEP - this was throttling you!
-            # await asyncio.sleep(0.01)  # ← DELETE THIS LINE or make it much smaller
-            await asyncio.sleep(0.001)  # Much smaller delay
+        self.begin_receive_phase()
+        costs = self.begin_cost_window()
+        payloads = self.build_payloads(lambda k: f"endurance_msg_{k}")
+
+        engine = self.create_send_engine(payloads)
+        connections_lost = False
+
+        if arrival_rate:
+            print(f"⏲️ Open loop: {arrival_rate:,} msg/sec offered")
+            start_time = time.time()
+            send_latency = await self.send_open_loop(
+                engine, arrival_rate, int(duration * arrival_rate),
+                self.config['tests']['endurance_test'].get('error_threshold', float('inf')),
+                progress_interval=checkpoint_interval,
+                max_in_flight=self.config['tests']['endurance_test'].get('max_in_flight', 10000)
+            )
+            total_endurance_messages = engine.sent
+        else:
+            start_time = time.time()
+            last_checkpoint = start_time
+            submitted = 0
+            rates = []
+            checkpoint_start_messages = 0
+            scheduler = RoundRobinScheduler(self.connections)
+
+            while not connections_lost and time.time() - start_time < duration:
+                # Hand a batch to the writers and let them send it AS FAST AS POSSIBLE
+                for i in range(messages_per_batch):
+                    slot = scheduler.next_slot()
+                    if slot is None:
+                        connections_lost = True
+                        break
+                    engine.submit(slot, submitted)
+                    submitted += 1
+
+                await engine.wait_idle()
+                total_endurance_messages = engine.sent
+
+                # Checkpoint reporting
+                current_time = time.time()
+                if current_time - last_checkpoint >= checkpoint_interval:
+                    # Calculate ACTUAL throughput for this checkpoint period
+                    messages_in_period = total_endurance_messages - checkpoint_start_messages
+                    period_duration = current_time - last_checkpoint
+                    checkpoint_rate = messages_in_period / period_duration
+                    rates.append(checkpoint_rate)
+
+                    total_elapsed = current_time - start_time
+                    overall_rate = total_endurance_messages / total_elapsed
+
+                    print(f"💪 ENDURANCE [{int(total_elapsed)}s]: {total_endurance_messages:,} msgs ({checkpoint_rate:,.0f}/sec, overall: {overall_rate:,.0f}/sec)")
+
+                    last_checkpoint = current_time
+                    checkpoint_start_messages = total_endurance_messages
+
+                await asyncio.sleep(0.001)
+
+            if connections_lost:
+                print("❌ Every connection closed, ending the endurance test early")
+            total_endurance_messages = engine.sent
+        await self.close_send_engine(engine)
 
         final_elapsed = time.time() - start_time
         actual_rate = total_endurance_messages / final_elapsed
@@ -419,46 +970,369 @@ class EnhancedElixirWebSocketBenchmark:
             'average_rate': actual_rate,
             'checkpoint_rates': rates,
             'messages_per_batch': messages_per_batch,
-            'checkpoint_interval': checkpoint_interval
+            'checkpoint_interval': checkpoint_interval,
+            'fairness': fairness_summary(engine.sent_per_slot),
+            'mode': 'open_loop' if arrival_rate else 'closed_loop',
+            'encoding': self.payload_encoding
         }
+        if connections_lost:
+            self.results['endurance_test']['error'] = 'all_connections_closed'
+        if arrival_rate:
+            self.results['endurance_test']['arrival_rate'] = arrival_rate
+            self.results['endurance_test']['send_latency'] = send_latency.summary()
+            self.results['endurance_test']['send_latency_histogram'] = send_latency.to_dict()
+        await self.end_cost_window(costs, self.results['endurance_test'])
+        await self.end_receive_phase(self.results['endurance_test'], total_endurance_messages)
 
         print(f"💪 ELIXIR ENDURANCE RESULTS:")
         print(f"   ⏱️ Duration: {final_elapsed:.1f}s")
         print(f"   📊 Messages: {total_endurance_messages:,}")
         print(f"   🚀 Avg Rate: {actual_rate:,.0f} msg/sec")
+        fairness = self.results['endurance_test']['fairness']
+        print(f"   ⚖️ Fairness: Jain {fairness['jain_index']:.3f}, {fairness['active_connections']:,}/{fairness['connections']:,} "
+              f"connections sent ({fairness['min_sent']:,}-{fairness['max_sent']:,} msgs each)")
+        self.print_phase_metrics(self.results['endurance_test'])
+
+    async def payload_step(self, size, sizes, sweep_config, read_limit):
+        """Send one sweep step whose payload pool has the given content sizes"""
+        payloads = self.build_payloads(lambda k: chr(ord('a') + k % 26) * sizes[k], len(sizes))
+        largest = max(len(self.render_message(p, 0)) for p in payloads) + 64
+        label = f"{size:,}B" if size is not None else f"distribution (mean {sum(sizes) / len(sizes):,.0f}B)"
+        if largest > read_limit:
+            print(f"⏭️ {label}: {largest:,}-byte frames exceed the server frame limit ({read_limit:,}), skipping")
+            return None
 
-    async def cleanup(self):
-        """Clean up connections"""
-        print(f"\n🧹 Cleaning up {len(self.connections):,} connections...")
+        target_messages = sweep_config.get('messages_per_step', len(self.connections) * 5)
+        window = sweep_config.get('batch_size', 1000)
+        counters = {'bytes': 0}
+        loop = asyncio.get_running_loop()
+
+        def render(slot, k, scheduled):
+            message = self.render_message(payloads[k % len(payloads)], k, slot, scheduled)
+            counters['bytes'] += len(message)
+            return message
+
+        self.begin_receive_phase()
+        costs = self.begin_cost_window()
+        engine = self.create_send_engine(payloads, render)
+        start_time = time.time()
+
+        # Closed loop; latency runs from dispatch to the write completing
+        for k in range(target_messages):
+            if engine.outstanding >= window:
+                await engine.wait_for_space(window)
+            engine.submit(k % len(self.connections), k, loop.time())
+        await self.close_send_engine(engine)
+
+        elapsed = time.time() - start_time
+        step = {
+            'size': size,
+            'target_messages': target_messages,
+            'messages_sent': engine.sent,
+            'messages_failed': engine.errors,
+            'bytes_sent': counters['bytes'],
+            'duration': elapsed,
+            'message_rate': engine.sent / elapsed if elapsed > 0 else 0,
+            'mb_per_sec': counters['bytes'] / 1024 / 1024 / elapsed if elapsed > 0 else 0,
+            'avg_frame_bytes': counters['bytes'] / engine.sent if engine.sent else 0,
+            'send_latency': engine.latency.summary(),
+            'send_latency_histogram': engine.latency.to_dict()
+        }
+        await self.end_cost_window(costs, step)
+        await self.end_receive_phase(step, engine.sent)
+
+        latency = step['send_latency']
+        print(f"📏 {label}: {step['message_rate']:,.0f} msg/sec, {step['mb_per_sec']:,.2f} MB/sec "
+              f"(wire {step.get('wire_ratio', 0):.2f}x, client CPU {step.get('client_cpu_percent', 0):.0f}%), "
+              f"p50 {latency.get('p50_ms', 0):.2f}ms, p99 {latency.get('p99_ms', 0):.2f}ms ({engine.errors} errors)")
+        return step
+
+    async def payload_sweep(self):
+        """Throughput and latency across payload sizes"""
+        if not self.connections:
+            print("❌ No connections available for payload sweep")
+            return
+
+        sweep_config = self.config['tests']['payload_sweep']
+        # The raw handler's max_frame_size; Cowboy closes the connection above it
+        read_limit = sweep_config.get('read_limit', 131072)
+        pool_size = self.config.get('payload', {}).get('pool_size', 64)
+
+        print(f"\n📏 ELIXIR PAYLOAD SWEEP")
+        print("=" * 50)
+
+        steps = []
+        for size in sweep_config.get('sizes', []):
+            step = await self.payload_step(size, [size] * pool_size, sweep_config, read_limit)
+            if step:
+                steps.append(step)
+            await asyncio.sleep(sweep_config.get('pause_seconds', 1))
+
+        distribution = sweep_config.get('distribution')
+        if distribution:
+            # Keep the tail under the frame limit unless the config bounds it
+            draw = make_size_sampler({'max': read_limit - 256, **distribution})
+            sizes = [draw() for _ in range(distribution.get('pool_size', 256))]
+            step = await self.payload_step(None, sizes, sweep_config, read_limit)
+            if step:
+                step['distribution'] = distribution
+                steps.append(step)
+
+        self.results['payload_sweep'] = {
+            'config': sweep_config,
+            'encoding': self.payload_encoding,
+            'steps': classify_sweep(steps)
+        }
 
-        close_tasks = []
-        for conn in self.connections:
-            if conn and not conn.closed:
-                close_tasks.append(asyncio.create_task(conn.close()))
+        print(f"📏 ELIXIR SWEEP RESULTS:")
+        for step in steps:
+            label = f"{step['size']:,}B" if step['size'] is not None else "distribution"
+            print(f"   {label:>14}: {step['message_rate']:>10,.0f} msg/sec {step['mb_per_sec']:>8,.2f} MB/sec"
+                  f"  {step.get('regime', '')}")
 
-        if close_tasks:
-            await asyncio.gather(*close_tasks, return_exceptions=True)
+    def find_beam_process(self):
+        """Local BEAM process for RSS sampling, if psutil is available and the server runs here"""
+        if not psutil:
+            return None
+        for proc in psutil.process_iter(['name']):
+            if 'beam' in (proc.info['name'] or ''):
+                return proc
+        return None
+
+    def stats_url(self):
+        """The raw server's StatsHandler, on the WebSocket URL's host"""
+        url = urlparse(self.config.get('server_url', 'ws://localhost:8081/socket/websocket'))
+        scheme = 'https' if url.scheme == 'wss' else 'http'
+        return f"{scheme}://{url.netloc}/stats"
+
+    def sample_server(self, beam):
+        """One server sample: connection counter and ETS :connections size from /stats, BEAM RSS"""
+        sample = {'timestamp': time.time()}
+        try:
+            with urllib.request.urlopen(self.stats_url(), timeout=2) as response:
+                stats = json.loads(response.read())
+            sample['server_connections'] = stats.get('connections')
+            sample['ets_connections'] = stats.get('connection_list')
+        except Exception:
+            pass
+        if beam:
+            try:
+                sample['rss_mb'] = beam.memory_info().rss / 1024 / 1024
+            except psutil.Error:
+                pass
+        return sample
+
+    async def churn_test(self):
+        """Connect/disconnect churn at a target connect rate"""
+        churn_config = self.config['tests']['churn_test']
+        connect_rate = churn_config['connect_rate']
+        duration = churn_config['duration']
+        hold_time = make_hold_sampler(churn_config.get('hold_time', {}))
+        max_open = churn_config.get('max_open', 10000)
+        progress_interval = churn_config.get('progress_interval', 5)
+
+        print(f"\n🔁 ELIXIR CHURN TEST")
+        print("=" * 50)
+        print(f"🎯 Connect rate: {connect_rate:,} conn/sec for {duration}s")
+        print(f"⏳ Hold time: {churn_config.get('hold_time', {'distribution': 'exponential', 'mean': 2.0})}")
+
+        handshakes = LatencyHistogram()
+        closes = LatencyHistogram()
+        counters = {'connects': 0, 'connect_failures': 0, 'disconnects': 0, 'close_errors': 0}
+        sessions = set()
+        samples = []
+        beam = self.find_beam_process()
+        loop = asyncio.get_running_loop()
+
+        async def sample_loop():
+            while True:
+                samples.append(await loop.run_in_executor(None, self.sample_server, beam))
+                await asyncio.sleep(churn_config.get('sample_interval', 1.0))
+
+        async def session(user_id):
+            started = time.perf_counter()
+            websocket = await self.connect_to_server(user_id)
+            if not websocket:
+                counters['connect_failures'] += 1
+                return
+            handshakes.record((time.perf_counter() - started) * 1_000_000)
+            counters['connects'] += 1
+
+            await asyncio.sleep(hold_time())
+
+            closing = time.perf_counter()
+            try:
+                await websocket.close()
+                closes.record((time.perf_counter() - closing) * 1_000_000)
+                counters['disconnects'] += 1
+            except Exception:
+                counters['close_errors'] += 1
+
+        sampler = asyncio.create_task(sample_loop())
+
+        # Open loop: session k starts at start + k/rate, capped at max_open live sessions
+        interval = 1.0 / connect_rate
+        start = loop.time()
+        next_progress = start + progress_interval
+        issued = 0
+
+        while loop.time() - start < duration:
+            due = int((loop.time() - start) * connect_rate) + 1
+            while issued < due and len(sessions) < max_open:
+                task = asyncio.create_task(session(f"churn_{issued}"))
+                sessions.add(task)
+                task.add_done_callback(sessions.discard)
+                issued += 1
+
+            now = loop.time()
+            if now >= next_progress:
+                elapsed = now - start
+                print(f"🔁 Churn [{int(elapsed)}s]: {counters['connects']:,} connects, {counters['disconnects']:,} disconnects, "
+                      f"{len(sessions):,} open ({(counters['connects'] + counters['disconnects']) / elapsed:,.0f} ops/sec)")
+                next_progress += progress_interval
+
+            if len(sessions) >= max_open:
+                await asyncio.sleep(0.01)
+            else:
+                await asyncio.sleep(max(0, start + issued * interval - loop.time()))
+
+        window = loop.time() - start
+        window_connects = counters['connects']
+        window_ops = counters['connects'] + counters['disconnects']
+
+        # Let the sessions still holding finish, then give the server time to settle
+        if sessions:
+            await asyncio.wait(list(sessions))
+        total_time = loop.time() - start
+        await asyncio.sleep(churn_config.get('settle_seconds', 2))
+        sampler.cancel()
+        samples.append(await loop.run_in_executor(None, self.sample_server, beam))
+
+        self.results['churn_test'] = {
+            'connect_rate': connect_rate,
+            'sessions_started': issued,
+            'window_connects': window_connects,
+            'window_ops': window_ops,
+            'churn_ops_rate': window_ops / window if window > 0 else 0,
+            'achieved_connect_rate': window_connects / window if window > 0 else 0,
+            'duration': window,
+            'test_time': total_time,
+            'handshake_latency': handshakes.summary(),
+            'handshake_latency_histogram': handshakes.to_dict(),
+            'close_latency': closes.summary(),
+            'close_latency_histogram': closes.to_dict(),
+            'server_samples': samples,
+            'server_drift': {
+                key: drift_summary(samples, key)
+                for key in ('rss_mb', 'server_connections', 'ets_connections')
+                if drift_summary(samples, key)
+            }
+        }
+        self.results['churn_test'].update(counters)
+        churn = self.results['churn_test']
+
+        print(f"🔁 ELIXIR CHURN RESULTS:")
+        print(f"   ✅ Connects: {counters['connects']:,}/{issued:,} ({counters['connect_failures']:,} failed)")
+        print(f"   🔌 Disconnects: {counters['disconnects']:,} ({counters['close_errors']:,} close errors)")
+        print(f"   ⚡ Churn: {churn['churn_ops_rate']:,.0f} ops/sec ({churn['achieved_connect_rate']:,.0f} connects/sec sustained)")
+        self.print_phase_metrics(churn)
+        for key, label in (('rss_mb', 'BEAM RSS'), ('server_connections', 'Connection counter'), ('ets_connections', 'ETS :connections')):
+            drift = churn['server_drift'].get(key)
+            if drift:
+                print(f"   📈 {label}: {drift['start']:,.1f} → {drift['end']:,.1f} "
+                      f"(peak {drift['peak']:,.1f}, {drift['per_minute']:+,.2f}/min)")
+
+    async def run_phase(self, name, phase):
+        """Run one test phase, labelling the stats samples taken meanwhile and judging client saturation"""
+        return await self.instruments.run(
+            name, phase, lambda: self.results.get(PHASE_RESULTS.get(name)), profile=name in PHASE_RESULTS
+        )
+
+    async def stop_stats_scraper(self):
+        """Stop the /stats sampler and record its time series and per-phase summary"""
+        if not (self.stats_scraper and self.stats_scraper.task):
+            return
+        summary = await self.stats_scraper.stop()
+        self.results['server_timeline'] = {'summary': summary, 'samples': self.stats_scraper.samples}
+
+        print(f"\n📡 Server stats: {summary['samples']:,} samples every {summary['interval']}s "
+              f"({summary['failures']:,} failed, scrape p50 {summary['scrape_ms_p50'] or 0:.1f}ms)")
+        for name, phase in summary['phases'].items():
+            print(f"   {name}: client sent {phase.get('client_send_rate', 0):,.0f} msg/sec, "
+                  f"server {phase.get('server_msg_rate', 0):,.0f} msg/sec, peak {phase['peak'].get('connections', 0):,} connections")
 
+    def server_connection_count(self):
+        try:
+            with urllib.request.urlopen(self.stats_url(), timeout=2) as response:
+                return json.load(response).get('connections')
+        except Exception:
+            return None
+
+    async def cleanup(self):
+        """Close every connection (bounded parallel, abort on timeout) while watching the server drain"""
+        print(f"\n🧹 Cleaning up {len(self.connections):,} connections...")
+        if not self.connections:
+            return
+        teardown_config = self.config.get('teardown', {})
+        stop = asyncio.Event()
+        before = await asyncio.get_running_loop().run_in_executor(None, self.server_connection_count)
+        started = time.perf_counter()
+        watcher = asyncio.create_task(watch_server_drain(
+            self.server_connection_count, stop, teardown_config.get('drain_timeout', 30.0)
+        ))
+
+        result = await teardown_connections(
+            self.connections, teardown_config.get('concurrency', 1000), teardown_config.get('close_timeout', 2.0)
+        )
+        stop.set()
+        result.update(drain_summary(before, await watcher, started))
         self.connections.clear()
+        self.results['teardown'] = result
+
+        print(f"   🧹 Closed {result['graceful']:,} gracefully, aborted {result['aborted']:,} "
+              f"in {result['teardown_seconds']:.2f}s ({result['close_rate']:,.0f}/sec)")
+        if 'server_connections_before' in result:
+            drain = f"{result['server_drain_seconds']:.2f}s" if result['server_drain_seconds'] is not None else "not within timeout"
+            print(f"   📉 Server: {result['server_connections_before']:,} → {result['server_connections_after']:,} connections "
+                  f"({result['server_disconnect_rate']:,.0f}/sec), drained to zero: {drain}")
 
     async def run_benchmark(self):
         """Run complete benchmark suite"""
         self.stats['start_time'] = time.time()
+        if self.payload_encoding != 'json':
+            print(f"📦 Payload encoding: {self.payload_encoding} (the raw handler counts binary frames "
+                  f"without decoding or broadcasting them)")
+
+        if self.stats_scraper:
+            self.stats_scraper.start()
+        if self.client_monitor:
+            self.client_monitor.start()
 
         try:
             if self.config['tests']['connection_test']['enabled']:
-                await self.connection_test()
+                await self.run_phase('connection', self.connection_test)
 
             if self.config['tests']['message_test']['enabled']:
-                await self.message_test()
+                await self.run_phase('message', self.message_test)
 
             if self.config['tests']['endurance_test']['enabled']:
-                await self.endurance_test()
+                await self.run_phase('endurance', self.endurance_test)
+
+            if self.config['tests'].get('payload_sweep', {}).get('enabled', False):
+                await self.run_phase('payload_sweep', self.payload_sweep)
+
+            if self.config['tests'].get('churn_test', {}).get('enabled', False):
+                await self.run_phase('churn', self.churn_test)
 
         except KeyboardInterrupt:
             print("\n🛑 Benchmark interrupted by user")
         finally:
-            await self.cleanup()
+            await self.run_phase('cleanup', self.cleanup)
+            await self.stop_stats_scraper()
+            if self.client_monitor:
+                self.results['client_phases'] = await self.client_monitor.stop()
+            if self.profiler:
+                self.profiler.close()
 
         # Save results
         results_file = self.save_results()
@@ -467,11 +1341,13 @@ class EnhancedElixirWebSocketBenchmark:
         print(f"📁 Results: {self.results_dir}")
 
 async def main():
-    if len(sys.argv) != 2:
-        print("Usage: python universal-benchmark-elixir-enhanced.py <config.json>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description='Elixir WebSocket benchmark')
+    parser.add_argument('config', help='Configuration file path')
+    parser.add_argument('--profile', action='store_true',
+                        help='cProfile + tracemalloc each test phase; dumps go to the session directory')
+    args = parser.parse_args()
 
-    config_file = sys.argv[1]
+    config_file = args.config
 
     try:
         with open(config_file, 'r') as f:
@@ -492,7 +1368,7 @@ async def main():
         subprocess.check_call([sys.executable, "-m", "pip", "install", "psutil"])
         import psutil
 
-    benchmark = EnhancedElixirWebSocketBenchmark(config)
+    benchmark = EnhancedElixirWebSocketBenchmark(config, profile=args.profile)
     await benchmark.run_benchmark()
 
 if __name__ == "__main__":
@@ -6,10 +6,24 @@ import time
 import psutil
 import threading
 import sys
+import argparse
+import socket
+import struct
+import subprocess
+from collections import Counter
 from datetime import datetime
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, fields
+from array import array
 from typing import List, Dict, Optional
 import os
+import urllib.request
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # repository root, see bench_common.py
+from bench_common import (
+    LatencyHistogram, ProcessSampler, SourceAddressPool, drain_summary, ephemeral_port_range,
+    teardown_connections, watch_server_drain,
+)
 
 @dataclass
 class SystemSnapshot:
@@ -23,13 +37,256 @@ class SystemSnapshot:
     connections_count: int
     open_files: int
     network_connections: int
+    tcp_established: int
+    tcp_time_wait: int
+    tcp_close_wait: int
+    socket_sample_ms: float
 
-class SystemMonitor:
+# Snapshot fields that get all-time running statistics (connections_count is
+# patched in after the sample is taken, so it only lives in the ring)
+SUMMARY_FIELDS = ("cpu_percent", "memory_used_mb", "memory_percent", "beam_cpu_percent", "beam_memory_mb",
+                  "beam_memory_percent", "open_files", "network_connections", "tcp_established",
+                  "tcp_time_wait", "tcp_close_wait", "socket_sample_ms")
+
+class SnapshotRing:
+    """Fixed-capacity ring of SystemSnapshots stored column-wise in preallocated arrays.
+    
+    Appending overwrites the oldest slot, so retention costs O(1) per sample
+    with no allocation or list rebuild however long the run. Indexing and
+    iteration (oldest first) rebuild SystemSnapshot objects on demand.
+    """
+    
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.columns = {
+            field.name: array("d" if field.type is float else "q", [0]) * capacity
+            for field in fields(SystemSnapshot)
+        }
+        self.start = 0
+        self.size = 0
+    
+    def __len__(self):
+        return self.size
+    
+    def slot(self, index: int) -> int:
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError("snapshot index out of range")
+        return (self.start + index) % self.capacity
+    
+    def append(self, snapshot: SystemSnapshot):
+        if self.size < self.capacity:
+            slot = (self.start + self.size) % self.capacity
+            self.size += 1
+        else:
+            slot = self.start
+            self.start = (self.start + 1) % self.capacity
+        for name, column in self.columns.items():
+            column[slot] = getattr(snapshot, name)
+    
+    def update(self, index: int, name: str, value):
+        self.columns[name][self.slot(index)] = value
+    
+    def __getitem__(self, index: int) -> SystemSnapshot:
+        slot = self.slot(index)
+        return SystemSnapshot(**{name: column[slot] for name, column in self.columns.items()})
+    
+    def __iter__(self):
+        for index in range(self.size):
+            yield self[index]
+
+class RunningStats:
+    """Constant-space min/max/mean and percentiles of one metric.
+    
+    Percentiles come from LatencyHistogram's log-linear buckets (<1% relative
+    error); its integer slots hold the value in thousandths here.
+    """
+    SCALE = 1000
+    
     def __init__(self):
-        self.snapshots: List[SystemSnapshot] = []
+        self.count = 0
+        self.total = 0.0
+        self.minimum = float("inf")
+        self.maximum = float("-inf")
+        self.histogram = LatencyHistogram()
+    
+    def record(self, value: float):
+        self.count += 1
+        self.total += value
+        if value < self.minimum:
+            self.minimum = value
+        if value > self.maximum:
+            self.maximum = value
+        self.histogram.record(value * self.SCALE)
+    
+    def summary(self, suffix: str = "") -> Dict:
+        if not self.count:
+            return {f"{key}{suffix}": 0 for key in ("min", "max", "avg", "p50", "p90", "p99")}
+        summary = {
+            f"min{suffix}": self.minimum,
+            f"max{suffix}": self.maximum,
+            f"avg{suffix}": self.total / self.count,
+        }
+        for percentile in (50, 90, 99):
+            summary[f"p{percentile}{suffix}"] = self.histogram.value_at_percentile(percentile) / self.SCALE
+        return summary
+
+# Kernel TCP state numbers (include/net/tcp_states.h)
+TCP_STATES = {1: "ESTABLISHED", 2: "SYN_SENT", 3: "SYN_RECV", 4: "FIN_WAIT1", 5: "FIN_WAIT2", 6: "TIME_WAIT",
+              7: "CLOSE", 8: "CLOSE_WAIT", 9: "LAST_ACK", 10: "LISTEN", 11: "CLOSING", 12: "NEW_SYN_RECV"}
+
+class SocketAccounting:
+    """Cheap socket and FD accounting for the server port, without psutil's per-socket objects.
+    
+    Per-state TCP counts for sockets whose local port is the server port come
+    from a netlink sock_diag dump with the port filter run in the kernel, so
+    only matching sockets cross into Python; if netlink is unavailable the
+    /proc/net/tcp and tcp6 tables are scanned instead. Filtering is by port
+    rather than owner because TIME_WAIT sockets no longer belong to any
+    process. The FD count is the size of /proc/<pid>/fd and /proc/net/sockstat
+    adds host-wide totals. Every sample reports its own wall and CPU cost.
+    """
+    NETLINK_SOCK_DIAG = 4
+    SOCK_DIAG_BY_FAMILY = 20
+    NLM_F_REQUEST = 0x1
+    NLM_F_DUMP = 0x300
+    NLMSG_ERROR = 2
+    NLMSG_DONE = 3
+    INET_DIAG_REQ_BYTECODE = 1
+    INET_DIAG_BC_S_GE = 2
+    INET_DIAG_BC_S_LE = 3
+    ALL_STATES = (1 << 13) - 1
+    
+    def __init__(self, port: int):
+        self.port = port
+        self.seq = 0
+        self.netlink = None
+        self.backend = "proc"
+        try:
+            self.netlink = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, self.NETLINK_SOCK_DIAG)
+            self.diag_states()
+            self.backend = "sock_diag"
+        except (OSError, AttributeError):
+            if self.netlink:
+                self.netlink.close()
+            self.netlink = None
+    
+    def diag_request(self, family: int) -> bytes:
+        # Bytecode: accept iff port <= sport <= port; a failed test jumps past the end (reject)
+        bytecode = struct.pack("=BBHHH", self.INET_DIAG_BC_S_GE, 8, 20, 0, self.port)
+        bytecode += struct.pack("=BBHHH", self.INET_DIAG_BC_S_LE, 8, 12, 0, self.port)
+        attribute = struct.pack("=HH", 4 + len(bytecode), self.INET_DIAG_REQ_BYTECODE) + bytecode
+        request = struct.pack("=BBBxI", family, socket.IPPROTO_TCP, 0, self.ALL_STATES) + bytes(48) + attribute
+        self.seq += 1
+        header = struct.pack("=IHHII", 16 + len(request), self.SOCK_DIAG_BY_FAMILY,
+                             self.NLM_F_REQUEST | self.NLM_F_DUMP, self.seq, 0)
+        return header + request
+    
+    def diag_states(self) -> Counter:
+        """Per-state counts from a kernel-filtered sock_diag dump (IPv4 and IPv6)"""
+        states = Counter()
+        for family in (socket.AF_INET, socket.AF_INET6):
+            self.netlink.send(self.diag_request(family))
+            done = False
+            while not done:
+                data = self.netlink.recv(65536)
+                offset = 0
+                while offset + 16 <= len(data):
+                    length, kind = struct.unpack_from("=IH", data, offset)
+                    if kind == self.NLMSG_DONE:
+                        done = True
+                        break
+                    if kind == self.NLMSG_ERROR:
+                        error = -struct.unpack_from("=i", data, offset + 16)[0]
+                        raise OSError(error, os.strerror(error))
+                    # inet_diag_msg: family, state, ... right after the netlink header
+                    states[data[offset + 17]] += 1
+                    offset += (length + 3) & ~3
+        return states
+    
+    def proc_states(self) -> Counter:
+        """Per-state counts by scanning /proc/net/tcp and tcp6 (text, every socket on the host)"""
+        states = Counter()
+        suffix = f":{self.port:04X}"
+        for path in ("/proc/net/tcp", "/proc/net/tcp6"):
+            try:
+                with open(path) as table:
+                    next(table, None)
+                    for line in table:
+                        columns = line.split(None, 4)
+                        if columns[1].endswith(suffix):
+                            states[int(columns[3], 16)] += 1
+            except OSError:
+                continue
+        return states
+    
+    @staticmethod
+    def sockstat() -> Dict:
+        """Host-wide TCP totals from /proc/net/sockstat (inuse, orphan, tw, alloc, mem)"""
+        try:
+            with open("/proc/net/sockstat") as f:
+                for line in f:
+                    if line.startswith("TCP:"):
+                        values = line.split()[1:]
+                        return {key: int(value) for key, value in zip(values[::2], values[1::2])}
+        except OSError:
+            pass
+        return {}
+    
+    @staticmethod
+    def fd_count(pid: int) -> int:
+        try:
+            return len(os.listdir(f"/proc/{pid}/fd"))
+        except OSError:
+            return 0
+    
+    def sample(self, pid: Optional[int] = None) -> Dict:
+        started = time.perf_counter()
+        cpu_started = time.thread_time()
+        if self.netlink:
+            try:
+                states = self.diag_states()
+            except OSError:
+                self.netlink.close()
+                self.netlink = None
+                self.backend = "proc"
+                states = self.proc_states()
+        else:
+            states = self.proc_states()
+        result = {
+            "fd_count": self.fd_count(pid) if pid else 0,
+            "tcp_states": {TCP_STATES.get(state, str(state)): count for state, count in states.items()},
+            "sockstat": self.sockstat(),
+        }
+        result["sample_ms"] = (time.perf_counter() - started) * 1000
+        result["sample_cpu_ms"] = (time.thread_time() - cpu_started) * 1000
+        return result
+    
+    def close(self):
+        if self.netlink:
+            self.netlink.close()
+            self.netlink = None
+
+class SystemMonitor:
+    def __init__(self, window: int = 600, downsample: int = 60, port: int = 8081, server_side: bool = True):
+        # Hot window at full (1s) resolution; older data survives only downsampled
+        self.snapshots = SnapshotRing(window)
+        self.downsample = downsample
+        self.history: List[Dict] = []
+        self.bucket: Dict = {}
+        self.running = {name: RunningStats() for name in SUMMARY_FIELDS}
+        self.total_snapshots = 0
+        self.first_timestamp = None
+        self.last_timestamp = None
+        self.lock = threading.Lock()
         self.monitoring = False
         self.beam_process = None
         self.monitor_thread = None
+        # Load agents sample only their own host; the BEAM and its sockets are the coordinator's to watch
+        self.sockets = SocketAccounting(port) if server_side else None
+        self.socket_sample_cpu_ms = 0.0
+        self.sockstat = {}
         
     def find_beam_process(self):
         """Find the BEAM/Elixir process"""
@@ -44,9 +301,10 @@ class SystemMonitor:
     
     def start_monitoring(self):
         """Start system monitoring in background thread"""
-        self.beam_process = self.find_beam_process()
-        if not self.beam_process:
-            print("⚠️  Could not find BEAM process - monitoring system only")
+        if self.sockets:
+            self.beam_process = self.find_beam_process()
+            if not self.beam_process:
+                print("⚠️  Could not find BEAM process - monitoring system only")
         
         self.monitoring = True
         self.monitor_thread = threading.Thread(target=self._monitor_loop, daemon=True)
@@ -58,8 +316,57 @@ class SystemMonitor:
         self.monitoring = False
         if self.monitor_thread:
             self.monitor_thread.join(timeout=2)
+        if self.sockets:
+            self.sockets.close()
+        with self.lock:
+            self.flush_bucket()
         print("🔍 System monitoring stopped...")
     
+    def record(self, snapshot: SystemSnapshot):
+        """Store one snapshot: ring slot, running statistics and the current downsample bucket"""
+        with self.lock:
+            self.snapshots.append(snapshot)
+            self.total_snapshots += 1
+            if self.first_timestamp is None:
+                self.first_timestamp = snapshot.timestamp
+            self.last_timestamp = snapshot.timestamp
+            
+            bucket = self.bucket
+            if not bucket:
+                bucket.update(timestamp=snapshot.timestamp, samples=0)
+            bucket["samples"] += 1
+            bucket["end"] = snapshot.timestamp
+            for name in SUMMARY_FIELDS:
+                value = getattr(snapshot, name)
+                self.running[name].record(value)
+                bucket[f"{name}_sum"] = bucket.get(f"{name}_sum", 0) + value
+                bucket[f"{name}_max"] = max(bucket.get(f"{name}_max", value), value)
+            if bucket["samples"] >= self.downsample:
+                self.flush_bucket()
+    
+    def flush_bucket(self):
+        """Close the current bucket into the long-term store as per-field averages and peaks"""
+        bucket = self.bucket
+        if not bucket:
+            return
+        entry = {"timestamp": bucket["timestamp"], "end": bucket["end"], "samples": bucket["samples"]}
+        for name in SUMMARY_FIELDS:
+            entry[f"{name}_avg"] = bucket[f"{name}_sum"] / bucket["samples"]
+            entry[f"{name}_max"] = bucket[f"{name}_max"]
+        self.history.append(entry)
+        self.bucket = {}
+    
+    def set_connections(self, count: int):
+        """Attach the client's connection count to the latest snapshot"""
+        with self.lock:
+            if self.snapshots:
+                self.snapshots.update(-1, "connections_count", count)
+    
+    def snapshot_dicts(self) -> List[Dict]:
+        """The hot window, oldest first"""
+        with self.lock:
+            return [asdict(snapshot) for snapshot in self.snapshots]
+    
     def _monitor_loop(self):
         """Main monitoring loop"""
         while self.monitoring:
@@ -72,8 +379,7 @@ class SystemMonitor:
                 beam_cpu = 0.0
                 beam_memory_mb = 0.0
                 beam_memory_percent = 0.0
-                open_files = 0
-                network_connections = 0
+                beam_pid = None
                 
                 if self.beam_process and self.beam_process.is_running():
                     try:
@@ -81,23 +387,19 @@ class SystemMonitor:
                         beam_memory_info = self.beam_process.memory_info()
                         beam_memory_mb = beam_memory_info.rss / 1024 / 1024
                         beam_memory_percent = self.beam_process.memory_percent()
-                        
-                        # Count open files
-                        try:
-                            open_files = len(self.beam_process.open_files())
-                        except (psutil.AccessDenied, psutil.NoSuchProcess):
-                            open_files = 0
-                        
-                        # Count network connections
-                        try:
-                            connections = self.beam_process.connections()
-                            network_connections = len([c for c in connections if c.laddr.port == 8081])
-                        except (psutil.AccessDenied, psutil.NoSuchProcess):
-                            network_connections = 0
-                            
+                        beam_pid = self.beam_process.pid
                     except (psutil.NoSuchProcess, psutil.AccessDenied):
                         self.beam_process = self.find_beam_process()
                 
+                # Socket states on the server port and BEAM descriptor count, from the kernel directly
+                if self.sockets:
+                    sockets = self.sockets.sample(beam_pid)
+                    self.socket_sample_cpu_ms += sockets["sample_cpu_ms"]
+                    self.sockstat = sockets["sockstat"]
+                else:
+                    sockets = {"fd_count": 0, "tcp_states": {}, "sample_ms": 0.0}
+                tcp_states = sockets["tcp_states"]
+                
                 snapshot = SystemSnapshot(
                     timestamp=time.time(),
                     cpu_percent=cpu_percent,
@@ -107,15 +409,15 @@ class SystemMonitor:
                     beam_memory_mb=beam_memory_mb,
                     beam_memory_percent=beam_memory_percent,
                     connections_count=0,  # Will be updated during tests
-                    open_files=open_files,
-                    network_connections=network_connections
+                    open_files=sockets["fd_count"],  # every descriptor, sockets included
+                    network_connections=sum(tcp_states.values()) - tcp_states.get("TIME_WAIT", 0),
+                    tcp_established=tcp_states.get("ESTABLISHED", 0),
+                    tcp_time_wait=tcp_states.get("TIME_WAIT", 0),
+                    tcp_close_wait=tcp_states.get("CLOSE_WAIT", 0),
+                    socket_sample_ms=sockets["sample_ms"]
                 )
                 
-                self.snapshots.append(snapshot)
-                
-                # Keep only last 10 minutes of data
-                cutoff_time = time.time() - 600
-                self.snapshots = [s for s in self.snapshots if s.timestamp > cutoff_time]
+                self.record(snapshot)
                 
             except Exception as e:
                 print(f"⚠️  Monitoring error: {e}")
@@ -124,55 +426,65 @@ class SystemMonitor:
     
     def get_current_stats(self) -> Optional[SystemSnapshot]:
         """Get the most recent snapshot"""
-        return self.snapshots[-1] if self.snapshots else None
+        with self.lock:
+            return self.snapshots[-1] if self.snapshots else None
     
     def get_stats_summary(self) -> Dict:
-        """Get summary statistics"""
-        if not self.snapshots:
-            return {}
-        
-        cpu_values = [s.cpu_percent for s in self.snapshots]
-        memory_values = [s.memory_used_mb for s in self.snapshots]
-        beam_cpu_values = [s.beam_cpu_percent for s in self.snapshots]
-        beam_memory_values = [s.beam_memory_mb for s in self.snapshots]
-        
-        return {
-            "monitoring_duration": self.snapshots[-1].timestamp - self.snapshots[0].timestamp,
-            "total_snapshots": len(self.snapshots),
-            "system_cpu": {
-                "min": min(cpu_values),
-                "max": max(cpu_values),
-                "avg": sum(cpu_values) / len(cpu_values)
-            },
-            "system_memory": {
-                "min_mb": min(memory_values),
-                "max_mb": max(memory_values),
-                "avg_mb": sum(memory_values) / len(memory_values)
-            },
-            "beam_cpu": {
-                "min": min(beam_cpu_values) if beam_cpu_values else 0,
-                "max": max(beam_cpu_values) if beam_cpu_values else 0,
-                "avg": sum(beam_cpu_values) / len(beam_cpu_values) if beam_cpu_values else 0
-            },
-            "beam_memory": {
-                "min_mb": min(beam_memory_values) if beam_memory_values else 0,
-                "max_mb": max(beam_memory_values) if beam_memory_values else 0,
-                "avg_mb": sum(beam_memory_values) / len(beam_memory_values) if beam_memory_values else 0
-            },
-            "peak_open_files": max([s.open_files for s in self.snapshots]),
-            "peak_network_connections": max([s.network_connections for s in self.snapshots])
-        }
+        """Summary statistics over the whole run, from the running accumulators"""
+        with self.lock:
+            if not self.total_snapshots:
+                return {}
+            
+            summary = {
+                "monitoring_duration": self.last_timestamp - self.first_timestamp,
+                "total_snapshots": self.total_snapshots,
+                "retained_snapshots": len(self.snapshots),
+                "history_buckets": len(self.history) + (1 if self.bucket else 0),
+                "system_cpu": self.running["cpu_percent"].summary(),
+                "system_memory": self.running["memory_used_mb"].summary("_mb"),
+            }
+            if not self.sockets:
+                return summary
+            
+            return {
+                **summary,
+                "beam_cpu": self.running["beam_cpu_percent"].summary(),
+                "beam_memory": self.running["beam_memory_mb"].summary("_mb"),
+                "peak_open_files": self.running["open_files"].maximum,
+                "peak_network_connections": self.running["network_connections"].maximum,
+                "tcp_established": self.running["tcp_established"].summary(),
+                "tcp_time_wait": self.running["tcp_time_wait"].summary(),
+                "tcp_close_wait": self.running["tcp_close_wait"].summary(),
+                "socket_accounting": {
+                    "backend": self.sockets.backend,
+                    "port": self.sockets.port,
+                    **self.running["socket_sample_ms"].summary("_ms"),
+                    "total_cpu_ms": self.socket_sample_cpu_ms,
+                    "last_sockstat": self.sockstat,
+                }
+            }
 
 # Enhanced benchmark class
 class EnhancedWebSocketBenchmark:
-    def __init__(self, config_path: str):
-        with open(config_path, 'r') as f:
-            self.config = json.load(f)
+    def __init__(self, config_path: Optional[str] = None, config: Optional[Dict] = None, server_side: bool = True):
+        if config is None:
+            with open(config_path, 'r') as f:
+                config = json.load(f)
+        self.config = config
         
         self.server_url = self.config["server_url"]
+        # The raw server's /health carries no connection count; /stats does
+        parsed = urlparse(self.server_url)
+        self.stats_url = self.config.get("stats_url", f"http://{parsed.netloc}/stats")
         self.test_name = self.config.get("test_name", "websocket_test")
-        self.monitor = SystemMonitor()
+        self.monitor = SystemMonitor(port=parsed.port or 8081, server_side=server_side)
         self.connections = []
+        self.handshakes = LatencyHistogram()
+        
+        # Optional source-address fan-out past the per-target ephemeral port limit
+        source_addresses = self.config.get("source_addresses")
+        self.source_pool = SourceAddressPool(source_addresses) if source_addresses else None
+        self.sampler = None
         
     async def test_connections(self):
         """Enhanced connection test with monitoring"""
@@ -213,7 +525,7 @@ class EnhancedWebSocketBenchmark:
                 
                 # Count results
                 for result in results:
-                    if isinstance(result, Exception):
+                    if isinstance(result, Exception) or not result:
                         failed += 1
                     else:
                         successful += 1
@@ -221,8 +533,7 @@ class EnhancedWebSocketBenchmark:
                             self.connections.append(result)
                 
                 # Update monitoring with current connection count
-                if self.monitor.snapshots:
-                    self.monitor.snapshots[-1].connections_count = successful
+                self.monitor.set_connections(successful)
                 
                 # Progress update with system stats
                 if i % (batch_size * 10) == 0 and i > 0:
@@ -230,12 +541,15 @@ class EnhancedWebSocketBenchmark:
                     rate = successful / elapsed
                     current_stats = self.monitor.get_current_stats()
                     
-                    if current_stats:
+                    if current_stats and self.monitor.sockets:
                         print(f"📊 Progress: {successful:,}/{target:,} ({successful/target*100:.1f}%) | "
                               f"Rate: {rate:.1f}/sec | "
                               f"CPU: {current_stats.cpu_percent:.1f}% | "
                               f"BEAM RAM: {current_stats.beam_memory_mb:.1f}MB | "
                               f"BEAM CPU: {current_stats.beam_cpu_percent:.1f}%")
+                    elif current_stats:
+                        print(f"📊 Progress: {successful:,}/{target:,} ({successful/target*100:.1f}%) | "
+                              f"Rate: {rate:.1f}/sec | CPU: {current_stats.cpu_percent:.1f}%")
                     else:
                         print(f"📊 Progress: {successful:,}/{target:,} ({successful/target*100:.1f}%) | Rate: {rate:.1f}/sec")
         
@@ -258,6 +572,10 @@ class EnhancedWebSocketBenchmark:
             print(f"   📁 Open Files: {final_stats.open_files:,}")
             print(f"   🌐 Network Connections: {final_stats.network_connections:,}")
         
+        if self.source_pool:
+            for address, usage in self.source_pool.usage(self.connections).items():
+                print(f"   🔌 {address}: {usage['ports_in_use']:,} ports in use ({usage['port_utilization']:.1f}% of ephemeral range), {usage['failed']:,} failed")
+        
         return {
             "target_connections": target,
             "successful_connections": successful,
@@ -267,25 +585,112 @@ class EnhancedWebSocketBenchmark:
             "duration": duration,
             "batch_size": batch_size,
             "timeout": timeout,
+            "source_ports": self.source_pool.usage(self.connections) if self.source_pool else None,
+            "handshake_latency": self.handshakes.summary(),
+            "handshake_latency_histogram": self.handshakes.to_dict(),
             "final_system_stats": asdict(final_stats) if final_stats else None
         }
     
     async def _connect_with_timeout(self, timeout):
         """Connect with timeout"""
+        connect_kwargs = {}
+        if self.source_pool:
+            source = self.source_pool.next_address()
+            connect_kwargs["local_addr"] = (source, 0)
+        
+        started = time.perf_counter()
         try:
             ws = await asyncio.wait_for(
                 websockets.connect(
                     self.server_url,
                     ping_interval=None,
                     close_timeout=1,
-                    open_timeout=timeout
+                    open_timeout=timeout,
+                    **connect_kwargs
                 ),
                 timeout=timeout
             )
+            self.handshakes.record((time.perf_counter() - started) * 1_000_000)
             return ws
         except Exception:
+            if self.source_pool:
+                self.source_pool.record_failure(source)
             return None
     
+    async def close_connections(self) -> Optional[Dict]:
+        """Close every open connection (bounded parallel, abort on timeout)"""
+        if not self.connections:
+            return None
+        print(f"\n🧹 Cleaning up {len(self.connections):,} connections...")
+        teardown_config = self.config.get("teardown", {})
+        result = await teardown_connections(
+            self.connections,
+            teardown_config.get("concurrency", 1000),
+            teardown_config.get("close_timeout", 2.0)
+        )
+        self.connections = []
+        print(f"   🧹 Closed {result['graceful']:,} gracefully, aborted {result['aborted']:,} "
+              f"in {result['teardown_seconds']:.2f}s ({result['close_rate']:,.0f}/sec)")
+        return result
+    
+    def server_connection_count(self) -> Optional[int]:
+        try:
+            with urllib.request.urlopen(self.stats_url, timeout=2) as response:
+                return json.load(response).get("connections")
+        except Exception:
+            return None
+    
+    async def teardown(self) -> Optional[Dict]:
+        """Close every connection while watching the server's connection count drain"""
+        if not self.connections:
+            return None
+        stop = asyncio.Event()
+        before = await asyncio.get_running_loop().run_in_executor(None, self.server_connection_count)
+        started = time.perf_counter()
+        watcher = asyncio.create_task(watch_server_drain(
+            self.server_connection_count, stop, self.config.get("teardown", {}).get("drain_timeout", 30.0)
+        ))
+        
+        result = await self.close_connections()
+        stop.set()
+        result.update(drain_summary(before, await watcher, started))
+        if "server_connections_before" in result:
+            drain = f"{result['server_drain_seconds']:.2f}s" if result["server_drain_seconds"] is not None else "not within timeout"
+            print(f"   📉 Server: {result['server_connections_before']:,} → {result['server_connections_after']:,} connections "
+                  f"({result['server_disconnect_rate']:,.0f}/sec), drained to zero: {drain}")
+        return result
+    
+    def start_sampler(self, phase: str):
+        """Sample beam.smp (or process_sampler.pid) from /proc at process_sampler.hz in a separate process"""
+        sampler_config = self.config.get("process_sampler", {})
+        if not sampler_config.get("enabled", True):
+            return
+        pid = sampler_config.get("pid")
+        if not pid:
+            beam = self.monitor.find_beam_process()
+            pid = beam.pid if beam else None
+        if not pid:
+            print("⚠️  No server process to sample")
+            return
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        os.makedirs("results", exist_ok=True)
+        self.sampler = ProcessSampler(pid, f"results/process_samples_{self.test_name}_{timestamp}.bin",
+                                      sampler_config.get("hz", 100), sampler_config.get("window", 0.1))
+        self.sampler.start(phase)
+    
+    def mark_phase(self, phase: str):
+        if self.sampler:
+            self.sampler.mark(phase)
+    
+    def stop_sampler(self) -> Optional[Dict]:
+        if not self.sampler:
+            return None
+        summary = self.sampler.stop()
+        self.sampler = None
+        print(f"🔬 Server sampled {summary['samples']:,} times at {summary['achieved_hz']:.0f}Hz "
+              f"({summary['missed_ticks']:,} ticks missed, sampler CPU {summary['sampler_cpu_percent']:.1f}%)")
+        return summary
+    
     async def run_benchmark(self):
         """Run the enhanced benchmark"""
         print(f"🚀 ENHANCED WEBSOCKET BENCHMARK WITH SYSTEM MONITORING")
@@ -301,6 +706,8 @@ class EnhancedWebSocketBenchmark:
             }
         }
         
+        self.start_sampler("connection_test")
+        
         # Run connection test
         if self.config["tests"].get("connection_test", {}).get("enabled", True):
             connection_results = await self.test_connections()
@@ -311,19 +718,22 @@ class EnhancedWebSocketBenchmark:
         monitoring_summary = self.monitor.get_stats_summary()
         if monitoring_summary:
             results["system_monitoring"] = monitoring_summary
-            results["monitoring_snapshots"] = [asdict(s) for s in self.monitor.snapshots]
+            results["monitoring_snapshots"] = self.monitor.snapshot_dicts()
         
         # Stop monitoring
         self.monitor.stop_monitoring()
+        if monitoring_summary:
+            results["monitoring_history"] = self.monitor.history
         
         # Cleanup connections
-        if self.connections:
-            print(f"\n🧹 Cleaning up {len(self.connections):,} connections...")
-            for ws in self.connections:
-                try:
-                    await ws.close()
-                except:
-                    pass
+        self.mark_phase("teardown")
+        teardown = await self.teardown()
+        if teardown:
+            results["teardown"] = teardown
+        
+        process_samples = self.stop_sampler()
+        if process_samples:
+            results["server_process_samples"] = process_samples
         
         # Save results
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -336,18 +746,330 @@ class EnhancedWebSocketBenchmark:
         print(f"\n💾 Results saved to: {results_file}")
         return results
 
+# Distributed load: a coordinator hands each agent a slice of the config over
+# a newline-delimited JSON control channel ("host:port" or "unix:/path")
+CONTROL_STREAM_LIMIT = 64 * 1024 * 1024
+AGENT_SUMMED_KEYS = ("target_connections", "successful_connections", "failed_connections")
+
+
+async def send_control(writer, message: Dict):
+    writer.write((json.dumps(message) + "\n").encode())
+    await writer.drain()
+
+
+async def recv_control(reader) -> Dict:
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("control channel closed")
+    return json.loads(line)
+
+
+async def open_control(address: str):
+    """Connect to a coordinator control address"""
+    if address.startswith("unix:"):
+        return await asyncio.open_unix_connection(address[5:], limit=CONTROL_STREAM_LIMIT)
+    host, port = address.rsplit(":", 1)
+    return await asyncio.open_connection(host, int(port), limit=CONTROL_STREAM_LIMIT)
+
+
+def split_config(config: Dict, agent_count: int) -> List[Dict]:
+    """Give each agent its share of the connection target and batch size"""
+    slices = []
+    for index in range(agent_count):
+        agent_config = json.loads(json.dumps(config))
+        test_config = agent_config["tests"]["connection_test"]
+        target = test_config["target_connections"]
+        test_config["target_connections"] = target // agent_count + (1 if index < target % agent_count else 0)
+        test_config["batch_size"] = max(1, -(-test_config["batch_size"] // agent_count))
+        slices.append(agent_config)
+    return slices
+
+
+def merge_agent_results(agent_results: List[Dict]) -> Dict:
+    """Merge per-agent connection results: sum counters, merge histograms, recompute rates"""
+    merged = dict(agent_results[0])
+    for key in AGENT_SUMMED_KEYS:
+        merged[key] = sum(r.get(key, 0) for r in agent_results)
+    # Agents start together, so the slowest one defines the phase
+    merged["duration"] = max(r.get("duration", 0) for r in agent_results)
+    merged["batch_size"] = sum(r.get("batch_size", 0) for r in agent_results)
+    merged["success_rate"] = (merged["successful_connections"] / merged["target_connections"] * 100) if merged["target_connections"] else 0
+    merged["connection_rate"] = merged["successful_connections"] / merged["duration"] if merged["duration"] > 0 else 0
+    
+    handshakes = LatencyHistogram()
+    for r in agent_results:
+        handshakes.merge(LatencyHistogram.from_dict(r.get("handshake_latency_histogram", {})))
+    merged["handshake_latency"] = handshakes.summary()
+    merged["handshake_latency_histogram"] = handshakes.to_dict()
+    
+    # Agents binding the same source address share its ephemeral range, so
+    # utilization comes from the summed ports; per-agent figures stay in per_agent
+    source_ports = {}
+    for r in agent_results:
+        for address, usage in (r.get("source_ports") or {}).items():
+            total = source_ports.setdefault(address, {"ports_in_use": 0, "failed": 0})
+            for key in total:
+                total[key] += usage[key]
+    port_range = ephemeral_port_range()
+    for usage in source_ports.values():
+        usage["port_utilization"] = usage["ports_in_use"] / port_range * 100
+    merged["source_ports"] = source_ports or None
+    
+    merged["final_system_stats"] = None
+    merged["per_agent"] = agent_results
+    return merged
+
+
+def merge_agent_teardowns(teardowns: List[Dict]) -> Optional[Dict]:
+    """Merge per-agent close_connections results; agents close in parallel, so the slowest sets the time"""
+    teardowns = [t for t in teardowns if t]
+    if not teardowns:
+        return None
+    merged = {key: sum(t[key] for t in teardowns) for key in ("connections", "graceful", "aborted", "already_closed")}
+    merged["concurrency"] = sum(t["concurrency"] for t in teardowns)
+    merged["teardown_seconds"] = max(t["teardown_seconds"] for t in teardowns)
+    closed = merged["graceful"] + merged["aborted"]
+    merged["close_rate"] = closed / merged["teardown_seconds"] if merged["teardown_seconds"] > 0 else 0
+    return merged
+
+
+class DistributedCoordinator:
+    """Runs a test across load agents and writes one merged results file.
+    
+    Local agents are spawned as subprocesses of this script; remote agents
+    are started by hand with --agent <coordinator address> and counted in
+    via remote_agents. Every phase starts on a barrier: the coordinator
+    waits until all agents are ready, then broadcasts a common start time.
+    """
+    
+    def __init__(self, config_path: str, local_agents: int, remote_agents: int = 0,
+                 listen: str = "127.0.0.1:0", join_timeout: float = 60):
+        with open(config_path, 'r') as f:
+            self.config = json.load(f)
+        
+        self.config_path = config_path
+        self.test_name = self.config.get("test_name", "websocket_test")
+        self.local_agents = local_agents
+        self.remote_agents = remote_agents
+        self.agent_count = local_agents + remote_agents
+        self.listen = listen
+        self.join_timeout = join_timeout
+        # The coordinator's own view of the server: system monitor, /stats connection count, /proc sampler
+        self.local = EnhancedWebSocketBenchmark(config=self.config)
+        self.monitor = self.local.monitor
+        self.agent_processes = []
+        self.agents = []
+        self.joined = asyncio.Queue()
+    
+    async def _on_agent(self, reader, writer):
+        await self.joined.put((reader, writer))
+    
+    async def start_control_server(self) -> str:
+        """Listen for agents; returns the address agents should connect to"""
+        if self.listen.startswith("unix:"):
+            path = self.listen[5:]
+            if os.path.exists(path):
+                os.unlink(path)
+            self.server = await asyncio.start_unix_server(self._on_agent, path, limit=CONTROL_STREAM_LIMIT)
+            return self.listen
+        
+        host, port = self.listen.rsplit(":", 1)
+        self.server = await asyncio.start_server(self._on_agent, host, int(port), limit=CONTROL_STREAM_LIMIT)
+        bound_port = self.server.sockets[0].getsockname()[1]
+        connect_host = "127.0.0.1" if host in ("0.0.0.0", "") else host
+        return f"{connect_host}:{bound_port}"
+    
+    async def broadcast(self, message: Dict):
+        await asyncio.gather(*[send_control(writer, message) for _, writer, _ in self.agents])
+    
+    async def gather_replies(self, expected_type: str) -> List[Dict]:
+        replies = await asyncio.gather(*[recv_control(reader) for reader, _, _ in self.agents])
+        for reply in replies:
+            if reply.get("type") != expected_type:
+                raise RuntimeError(f"Agent sent {reply.get('type')} while waiting for {expected_type}: {reply.get('error', '')}")
+        return replies
+    
+    async def run(self) -> Dict:
+        print(f"🛰️ DISTRIBUTED BENCHMARK: {self.agent_count} agents ({self.local_agents} local, {self.remote_agents} remote)")
+        address = await self.start_control_server()
+        print(f"📡 Control channel: {address}")
+        
+        for _ in range(self.local_agents):
+            self.agent_processes.append(subprocess.Popen([sys.executable, os.path.abspath(__file__), "--agent", address]))
+        
+        try:
+            # Handshake: every agent says hello, receives its slice and reports ready
+            deadline = time.time() + self.join_timeout
+            while len(self.agents) < self.agent_count:
+                reader, writer = await asyncio.wait_for(self.joined.get(), timeout=max(0.1, deadline - time.time()))
+                hello = await recv_control(reader)
+                hello.pop("type", None)
+                self.agents.append((reader, writer, hello))
+                print(f"🤝 Agent {len(self.agents)}/{self.agent_count} joined from {hello.get('host')} (pid {hello.get('pid')})")
+            
+            slices = split_config(self.config, self.agent_count)
+            for index, (_, writer, _) in enumerate(self.agents):
+                await send_control(writer, {"type": "config", "agent_index": index, "agent_count": self.agent_count, "config": slices[index]})
+            await self.gather_replies("ready")
+            
+            self.monitor.start_monitoring()
+            self.local.start_sampler("connection_test")
+            results = {
+                "benchmark_info": {
+                    "test_name": self.test_name,
+                    "timestamp": datetime.now().isoformat(),
+                    "server_url": self.config["server_url"],
+                    "agents": [hello for _, _, hello in self.agents]
+                }
+            }
+            
+            if self.config["tests"].get("connection_test", {}).get("enabled", True):
+                # Barrier: all agents are ready, so start them at the same wall-clock instant
+                await self.broadcast({"type": "start", "phase": "connection_test", "start_at": time.time() + 0.5})
+                replies = await self.gather_replies("result")
+                results["connection_test"] = merge_agent_results([reply["result"] for reply in replies])
+                results["agent_monitoring"] = [
+                    {"agent_index": index, "host": self.agents[index][2].get("host"), "system_monitoring": reply["system_monitoring"]}
+                    for index, reply in enumerate(replies)
+                ]
+                results["agent_snapshots"] = [
+                    dict(snapshot, agent_index=index) for index, reply in enumerate(replies) for snapshot in reply["snapshots"]
+                ]
+            
+            monitoring_summary = self.monitor.get_stats_summary()
+            if monitoring_summary:
+                results["system_monitoring"] = monitoring_summary
+                results["monitoring_snapshots"] = self.monitor.snapshot_dicts()
+            self.monitor.stop_monitoring()
+            if monitoring_summary:
+                results["monitoring_history"] = self.monitor.history
+            
+            # Agents close their connections on stop while the server's count is watched draining
+            self.local.mark_phase("teardown")
+            stop = asyncio.Event()
+            before = await asyncio.get_running_loop().run_in_executor(None, self.local.server_connection_count)
+            started = time.perf_counter()
+            watcher = asyncio.create_task(watch_server_drain(
+                self.local.server_connection_count, stop, self.config.get("teardown", {}).get("drain_timeout", 30.0)
+            ))
+            await self.broadcast({"type": "stop"})
+            replies = await self.gather_replies("closed")
+            stop.set()
+            teardown = merge_agent_teardowns([reply["teardown"] for reply in replies])
+            drain = drain_summary(before, await watcher, started)
+            if teardown or drain:
+                results["teardown"] = {**(teardown or {}), **drain}
+            
+            process_samples = self.local.stop_sampler()
+            if process_samples:
+                results["server_process_samples"] = process_samples
+        finally:
+            if self.local.sampler:
+                self.local.stop_sampler()
+            for _, writer, _ in self.agents:
+                writer.close()
+            self.server.close()
+            for process in self.agent_processes:
+                try:
+                    await asyncio.to_thread(process.wait, timeout=30)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+        
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        results_file = f"results/enhanced_benchmark_{self.test_name}_{timestamp}.json"
+        
+        os.makedirs("results", exist_ok=True)
+        with open(results_file, 'w') as f:
+            json.dump(results, f, indent=2)
+        
+        if "connection_test" in results:
+            ct = results["connection_test"]
+            print(f"\n📊 MERGED CONNECTION RESULTS ({self.agent_count} agents):")
+            print(f"   ✅ Achieved: {ct['successful_connections']:,}/{ct['target_connections']:,} ({ct['success_rate']:.1f}%)")
+            print(f"   ⚡ Rate: {ct['connection_rate']:.1f} conn/sec")
+            if ct["handshake_latency"]:
+                print(f"   ⏲️ Handshake: p50 {ct['handshake_latency']['p50_ms']:.2f}ms, p99 {ct['handshake_latency']['p99_ms']:.2f}ms")
+        teardown = results.get("teardown", {})
+        if "graceful" in teardown:
+            print(f"   🧹 Closed {teardown['graceful']:,} gracefully, aborted {teardown['aborted']:,} "
+                  f"in {teardown['teardown_seconds']:.2f}s ({teardown['close_rate']:,.0f}/sec)")
+        if "server_connections_before" in teardown:
+            drain = f"{teardown['server_drain_seconds']:.2f}s" if teardown["server_drain_seconds"] is not None else "not within timeout"
+            print(f"   📉 Server: {teardown['server_connections_before']:,} → {teardown['server_connections_after']:,} connections "
+                  f"({teardown['server_disconnect_rate']:,.0f}/sec), drained to zero: {drain}")
+        print(f"\n💾 Results saved to: {results_file}")
+        return results
+
+
+async def run_agent(address: str):
+    """Load agent: take a config slice from the coordinator and run phases on its signal"""
+    reader, writer = await open_control(address)
+    await send_control(writer, {"type": "hello", "host": socket.gethostname(), "pid": os.getpid()})
+    
+    assignment = await recv_control(reader)
+    benchmark = EnhancedWebSocketBenchmark(config=assignment["config"], server_side=False)
+    print(f"🛰️ Agent {assignment['agent_index'] + 1}/{assignment['agent_count']} ready")
+    await send_control(writer, {"type": "ready"})
+    
+    try:
+        while True:
+            message = await recv_control(reader)
+            if message["type"] == "stop":
+                await send_control(writer, {"type": "closed", "teardown": await benchmark.close_connections()})
+                break
+            if message["type"] == "start":
+                await asyncio.sleep(max(0, message["start_at"] - time.time()))
+                try:
+                    result = await benchmark.test_connections()
+                    # Connections stay open until stop so the agents' loads overlap
+                    await send_control(writer, {
+                        "type": "result",
+                        "phase": message["phase"],
+                        "result": result,
+                        "system_monitoring": benchmark.monitor.get_stats_summary(),
+                        "snapshots": benchmark.monitor.snapshot_dicts()
+                    })
+                except Exception as e:
+                    await send_control(writer, {"type": "error", "phase": message["phase"], "error": str(e)})
+    finally:
+        benchmark.monitor.stop_monitoring()
+        await benchmark.close_connections()
+        writer.close()
+
+
 async def main():
-    if len(sys.argv) != 2:
+    parser = argparse.ArgumentParser(description="WebSocket connection benchmark with system monitoring")
+    parser.add_argument("config", nargs="?", help="Benchmark config JSON")
+    parser.add_argument("--agents", type=int, default=0,
+                        help="Coordinate this many local load agent processes")
+    parser.add_argument("--remote-agents", type=int, default=0,
+                        help="Also wait for this many agents started on other hosts")
+    parser.add_argument("--listen", default=None,
+                        help="Coordinator control address, host:port or unix:/path")
+    parser.add_argument("--agent", metavar="ADDRESS", default=None,
+                        help="Run as a load agent for the coordinator at ADDRESS")
+    args = parser.parse_args()
+    
+    if args.agent:
+        await run_agent(args.agent)
+        return
+    
+    config_path = args.config
+    if not config_path:
         print("Usage: python universal-benchmark-with-monitoring.py <config.json>")
         sys.exit(1)
     
-    config_path = sys.argv[1]
     if not os.path.exists(config_path):
         print(f"❌ Config file not found: {config_path}")
         sys.exit(1)
     
-    benchmark = EnhancedWebSocketBenchmark(config_path)
-    results = await benchmark.run_benchmark()
+    if args.agents or args.remote_agents:
+        listen = args.listen or ("0.0.0.0:0" if args.remote_agents else "127.0.0.1:0")
+        coordinator = DistributedCoordinator(config_path, args.agents, args.remote_agents, listen)
+        results = await coordinator.run()
+    else:
+        benchmark = EnhancedWebSocketBenchmark(config_path)
+        results = await benchmark.run_benchmark()
     
     # Print summary
     print(f"\n🏆 ENHANCED BENCHMARK COMPLETE")
@@ -364,6 +1086,19 @@ async def main():
         print(f"🖥️ System CPU: {sm['system_cpu']['avg']:.1f}% avg, {sm['system_cpu']['max']:.1f}% peak")
         print(f"💾 BEAM Memory: {sm['beam_memory']['avg_mb']:.1f}MB avg, {sm['beam_memory']['max_mb']:.1f}MB peak")
         print(f"⚡ BEAM CPU: {sm['beam_cpu']['avg']:.1f}% avg, {sm['beam_cpu']['max']:.1f}% peak")
+        sa = sm['socket_accounting']
+        print(f"🔌 TCP on :{sa['port']}: {sm['tcp_established']['max']:.0f} ESTABLISHED, "
+              f"{sm['tcp_time_wait']['max']:.0f} TIME_WAIT, {sm['tcp_close_wait']['max']:.0f} CLOSE_WAIT peak "
+              f"({sa['backend']}, {sa['avg_ms']:.2f}ms avg / {sa['max_ms']:.2f}ms max per sample)")
+    
+    if "server_process_samples" in results:
+        ps = results["server_process_samples"]
+        print(f"🔬 Server process at {ps['achieved_hz']:.0f}Hz (peaks over {ps['window_seconds'] * 1000:.0f}ms):")
+        for phase in ps["phases"]:
+            print(f"   {phase['phase']}: CPU {phase['cpu_percent']:.0f}% avg / {phase['cpu_percent_peak']:.0f}% peak, "
+                  f"RSS {phase['rss_mb_peak']:.1f}MB peak, {phase['threads_peak']} threads, "
+                  f"{phase['ctx_voluntary_per_sec']:,.0f}+{phase['ctx_involuntary_per_sec']:,.0f} ctx switches/sec "
+                  f"(peak {phase['ctx_voluntary_per_sec_peak']:,.0f}+{phase['ctx_involuntary_per_sec_peak']:,.0f})")
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
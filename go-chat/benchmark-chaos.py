@@ -13,14 +13,52 @@ import requests
 import psutil
 import threading
 import platform
+import os
 import sys
+import argparse
 from datetime import datetime, timezone
 from pathlib import Path
 import csv
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # repository root, see bench_common.py
+from bench_common import (
+    KernelTcpCounters, LatencyHistogram, PAYLOAD_ENCODINGS, PayloadTemplate, PhaseInstruments,
+    PhaseProfiler, ProcessSampler, RampController, SendEngine, SourceAddressPool, WireCounter,
+    build_payload_pool, compression_kwargs, compression_label, cpu_seconds, deflate_negotiated,
+    drain_summary, kernel_tcp_line, kernel_tcp_markdown, probe_readiness, profile_markdown,
+    teardown_connections, watch_server_drain,
+)
+
 class ChaosBenchmarkSuite:
-    def __init__(self):
+    def __init__(self, tsunami_arrival_rate=None, drain=False, adaptive_ramp=False, handshake_target_ms=250,
+                 source_addresses=None, encoding='json', compression=None, close_concurrency=1000, sample_hz=100,
+                 profile=False, kernel_interval=0):
         self.server_process = None
+        # Host TCP counters at each test's start and end (and every kernel_interval seconds if > 0)
+        self.kernel_counters = KernelTcpCounters(kernel_interval) if KernelTcpCounters.available() else None
+        # /proc sampling rate for the server process (0 = off)
+        self.sample_hz = sample_hz
+        self.sampler = None
+        # Parallel closes in flight during teardown
+        self.close_concurrency = close_concurrency
+        # permessage-deflate offer (None = library default); go-chat's upgrader has it disabled
+        self.compression = compression
+        self.wire = WireCounter()
+        self.client_process = psutil.Process()
+        # Tsunami frame format; go-chat reads non-JSON frames but never broadcasts them
+        self.encoding = encoding
+        # Bind outgoing sockets round-robin across these local addresses
+        self.source_pool = SourceAddressPool(source_addresses) if source_addresses else None
+        # AIMD connection ramp instead of fixed 50-connection batches
+        self.adaptive_ramp = adaptive_ramp
+        self.handshake_target_ms = handshake_target_ms
+        self.last_ramp = None
+        # Offered msg/sec for an open-loop tsunami; None keeps the closed loop
+        self.tsunami_arrival_rate = tsunami_arrival_rate
+        # Drain every connection so go-chat's broadcasts don't back up client buffers
+        self.drain = drain
+        self.receiver_tasks = []
+        self.received = {'frames': 0, 'messages': 0, 'bytes': 0}
         self.base_url = "http://localhost:8080"
         self.ws_url = "ws://localhost:8080/ws"
         self.connections = []
@@ -29,17 +67,24 @@ class ChaosBenchmarkSuite:
         self.session_id = datetime.now().strftime("%Y%m%d_%H%M%S")
         self.results_dir = Path(f"chaos-results/sessions/{self.session_id}")
         self.results_dir.mkdir(parents=True, exist_ok=True)
+        # --profile: cProfile + tracemalloc per test, dumped into the session directory
+        self.profiler = PhaseProfiler(self.results_dir, __file__) if profile else None
         
         # Initialize results storage
         self.session_data = {
             'session_id': self.session_id,
             'timestamp': datetime.now(timezone.utc).isoformat(),
             'system_info': self.get_system_info(),
+            'payload_encoding': encoding,
+            'compression': compression_label(compression),
             'test_results': [],
             'performance_timeline': [],
             'resource_usage': [],
             'blog_summary': {}
         }
+        self.instruments = PhaseInstruments(
+            self.session_data, [self.mark_phase], kernel_counters=self.kernel_counters, profiler=self.profiler
+        )
         
     def get_system_info(self):
         """Collect comprehensive system information"""
@@ -170,6 +215,21 @@ class ChaosBenchmarkSuite:
 - **Connection Rate:** {result['connection_rate']:.1f} conn/sec
 - **Duration:** {result['creation_time']:.2f} seconds
 
+"""
+                if 'kernel_tcp' in result:
+                    md_content += f"- **Kernel TCP:** {kernel_tcp_line(result['kernel_tcp'])}\n"
+                    for finding in result['kernel_tcp']['findings']:
+                        md_content += f"  - ⚠️ {finding}\n"
+                    md_content += "\n"
+                for address, usage in result.get('source_ports', {}).items():
+                    md_content += f"- **Source {address}:** {usage['ports_in_use']:,} ports in use ({usage['port_utilization']:.1f}% of ephemeral range), {usage['failed']:,} failed\n"
+                if 'source_ports' in result:
+                    md_content += "\n"
+                if 'handshake_ceiling' in result:
+                    latency = result['handshake_latency']
+                    md_content += f"""- **Handshake Ceiling:** {result['handshake_ceiling']:,.0f} conn/sec (adaptive ramp, {result['ramp']['rounds']} rounds, {result['ramp']['unhealthy_rounds']} back-offs)
+- **Handshake Latency:** p50 {latency.get('p50_ms', 0):.2f}ms, p99 {latency.get('p99_ms', 0):.2f}ms, max {latency.get('max_ms', 0):.2f}ms
+
 """
             elif result['test'] == 'message_tsunami':
                 success_rate = (result['messages_sent']/result['target_messages']*100)
@@ -179,6 +239,21 @@ class ChaosBenchmarkSuite:
 - **Message Rate:** {result['message_rate']:.1f} msg/sec
 - **Duration:** {result['tsunami_time']:.2f} seconds
 - **Errors:** {result['errors']}
+- **Encoding:** {result.get('encoding', 'json')}
+- **Compression:** {result.get('compression', 'library default')}
+- **Wire:** {result.get('wire_bytes_sent', 0) / 1024 / 1024:.1f}MB sent, {result.get('wire_bytes_received', 0) / 1024 / 1024:.1f}MB received
+- **CPU:** client {result.get('client_cpu_percent', 0):.0f}%, server {result.get('server_cpu_percent', 0):.0f}%
+
+"""
+                if 'messages_received' in result:
+                    md_content += f"""- **Delivered:** {result['messages_received']:,} messages ({result['bytes_received'] / 1024 / 1024:.1f}MB)
+- **Delivered Rate:** {result['delivered_rate']:,.0f} msg/sec (fan-out {result['fanout_ratio']:.1f}x per sent message)
+
+"""
+                if result.get('send_latency'):
+                    latency = result['send_latency']
+                    md_content += f"""- **Mode:** open loop at {result['arrival_rate']:,} msg/sec offered
+- **Send Latency (from schedule):** p50 {latency['p50_ms']:.2f}ms, p90 {latency['p90_ms']:.2f}ms, p99 {latency['p99_ms']:.2f}ms, p99.9 {latency['p99_9_ms']:.2f}ms, max {latency['max_ms']:.2f}ms
 
 """
         
@@ -198,11 +273,47 @@ class ChaosBenchmarkSuite:
 
 """
         
+        teardown = self.session_data.get('teardown')
+        if teardown:
+            md_content += f"""## 🧹 Teardown
+
+- **Closed:** {teardown['graceful']:,} gracefully, {teardown['aborted']:,} aborted in {teardown['teardown_seconds']:.2f}s ({teardown['close_rate']:,.0f}/sec at concurrency {teardown['concurrency']:,})
+"""
+            if 'server_connections_before' in teardown:
+                drain = f"{teardown['server_drain_seconds']:.2f}s" if teardown['server_drain_seconds'] is not None else "not within timeout"
+                md_content += f"""- **Server-Observed Disconnects:** {teardown['server_connections_before']:,} → {teardown['server_connections_after']:,} ({teardown['server_disconnect_rate']:,.0f}/sec)
+- **Server Drain to Zero:** {drain}
+"""
+            md_content += "\n"
+        
+        samples = self.session_data.get('server_process_samples')
+        if samples and samples['phases']:
+            md_content += f"""## 🔬 Server Process at {samples['achieved_hz']:.0f}Hz
+
+Sampled from /proc in a separate process ({samples['samples']:,} samples, sampler CPU {samples['sampler_cpu_percent']:.1f}%). Peaks are over {samples['window_seconds'] * 1000:.0f}ms windows.
+
+| Phase | Seconds | CPU avg | CPU p99 | CPU peak | RSS peak | Threads | Voluntary ctx/s (peak) | Involuntary ctx/s (peak) | Read / Write MB/s |
+|-------|---------|---------|---------|----------|----------|---------|------------------------|--------------------------|-------------------|
+"""
+            for phase in samples['phases']:
+                md_content += (f"| {phase['phase']} | {phase['seconds']:.1f} | {phase['cpu_percent']:.0f}% | {phase['cpu_percent_p99']:.0f}% "
+                               f"| {phase['cpu_percent_peak']:.0f}% | {phase['rss_mb_peak']:.1f}MB | {phase['threads_peak']} "
+                               f"| {phase['ctx_voluntary_per_sec']:,.0f} ({phase['ctx_voluntary_per_sec_peak']:,.0f}) "
+                               f"| {phase['ctx_involuntary_per_sec']:,.0f} ({phase['ctx_involuntary_per_sec_peak']:,.0f}) "
+                               f"| {phase['read_mb_per_sec']:.2f} / {phase['write_mb_per_sec']:.2f} |\n")
+            md_content += "\n"
+        
+        if self.session_data.get('profile'):
+            md_content += profile_markdown(self.session_data['profile'])
+        
+        md_content += kernel_tcp_markdown(self.session_data.get('kernel_tcp'))
+        
         md_content += f"""## 📈 Raw Data Files
 
 - Full JSON Results: `full_results_{self.session_id}.json`
 - CSV Summary: `summary_{self.session_id}.csv`
 - Performance Timeline: `performance_data_{self.session_id}.json`
+- Server Process Samples: `process_samples_{self.session_id}.bin` (struct `=d8Q` records)
 
 ---
 *Generated by Go Chat Server Chaos Testing Suite*
@@ -250,7 +361,7 @@ class ChaosBenchmarkSuite:
     async def start_server(self):
         """Start the Go server with logging"""
         print("🚀 Starting Go server...")
-        start_time = time.time()
+        started = time.perf_counter()
         
         self.server_process = subprocess.Popen(
             ['./go-chat'],
@@ -260,21 +371,25 @@ class ChaosBenchmarkSuite:
         )
         
         # Wait for server to start
-        for i in range(10):
-            try:
-                response = requests.get(f"{self.base_url}/health", timeout=2)
-                if response.status_code == 200:
-                    startup_time = time.time() - start_time
-                    print(f"✅ Server started in {startup_time:.2f}s")
-                    
-                    # Log startup metrics
-                    self.log_performance_point('server_startup', {
-                        'startup_time': startup_time,
-                        'pid': self.server_process.pid
-                    })
-                    return True
-            except:
-                await asyncio.sleep(1)
+        readiness = await probe_readiness('localhost', 8080, self.ws_url, '/health', started, 10,
+                                          process=self.server_process)
+        if readiness['ready']:
+            startup_time = readiness['time_to_healthy']
+            print(f"✅ Server started in {startup_time:.3f}s "
+                  f"(listening {readiness['time_to_listen'] * 1000:.1f}ms, first upgrade {readiness['time_to_first_upgrade'] * 1000:.1f}ms)")
+            
+            # Log startup metrics
+            self.log_performance_point('server_startup', {
+                'startup_time': startup_time,
+                'time_to_listen': readiness['time_to_listen'],
+                'time_to_first_upgrade': readiness['time_to_first_upgrade'],
+                'pid': self.server_process.pid
+            })
+            if self.sample_hz:
+                self.sampler = ProcessSampler(self.server_process.pid,
+                                              self.results_dir / f"process_samples_{self.session_id}.bin", self.sample_hz)
+                self.sampler.start()
+            return True
                 
         print("❌ Server failed to start")
         return False
@@ -290,6 +405,9 @@ class ChaosBenchmarkSuite:
         """Create connections with detailed logging"""
         print(f"🌊 Creating {count:,} connections - PREPARE FOR MAYHEM!")
         
+        if self.adaptive_ramp:
+            return await self.ramp_massive_connections(count, test_name)
+        
         batch_size = 50
         successful = 0
         failed = 0
@@ -311,6 +429,8 @@ class ChaosBenchmarkSuite:
                 for result in batch_results:
                     if result and not isinstance(result, Exception):
                         self.connections.append(result)
+                        if self.drain:
+                            self.receiver_tasks.append(asyncio.create_task(self.receive_frames(result)))
                         successful += 1
                         batch_successful += 1
                     else:
@@ -361,15 +481,110 @@ class ChaosBenchmarkSuite:
         
         return successful
     
+    async def ramp_massive_connections(self, count, test_name):
+        """Create connections in AIMD-sized rounds, backing off when handshakes degrade"""
+        ramp = RampController(latency_target_ms=self.handshake_target_ms)
+        handshakes = LatencyHistogram()
+        successful = 0
+        failed = 0
+        position = 0
+        start_time = time.time()
+        
+        async def timed_connection(user_id):
+            started = time.perf_counter()
+            ws = await self.create_single_connection(user_id)
+            return ws, time.perf_counter() - started
+        
+        while position < count:
+            window = ramp.window
+            round_end = min(position + window, count)
+            round_start = time.perf_counter()
+            
+            results = await asyncio.gather(*[
+                timed_connection(f"{test_name}_user_{i}") for i in range(position, round_end)
+            ])
+            
+            latencies = []
+            for ws, handshake in results:
+                if ws:
+                    self.connections.append(ws)
+                    if self.drain:
+                        self.receiver_tasks.append(asyncio.create_task(self.receive_frames(ws)))
+                    latencies.append(handshake)
+                    handshakes.record(handshake * 1e6)
+                else:
+                    failed += 1
+            successful += len(latencies)
+            
+            healthy = ramp.record_round(latencies, (round_end - position) - len(latencies), time.perf_counter() - round_start)
+            last = ramp.rounds[-1]
+            print(f"📊 Ramp: {successful:,}/{round_end:,} connections, window {window} ({last['rate']:.0f} conn/sec) "
+                  f"{'✅' if healthy else '⚠️ backing off'}")
+            
+            self.log_performance_point(f'{test_name}_ramp', {
+                'window': window,
+                'round_successful': len(latencies),
+                'round_rate': last['rate'],
+                'round_p95_ms': last['p95_ms'],
+                'healthy': healthy,
+                'total_successful': successful,
+                'total_failed': failed
+            })
+            position = round_end
+            
+            if ramp.exhausted:
+                print(f"⚠️ Server degraded for {ramp.unhealthy_streak} rounds, stopping at {successful:,} connections")
+                break
+        
+        total_time = time.time() - start_time
+        self.last_ramp = dict(ramp.summary(), handshake_latency=handshakes.summary())
+        print(f"🎯 CONNECTION RESULT: {successful:,}/{count:,} connections created!")
+        print(f"📈 Handshake ceiling: {ramp.ceiling['rate']:.0f} conn/sec at window {ramp.ceiling['window']}")
+        
+        self.log_performance_point(f'{test_name}_final', {
+            'total_successful': successful,
+            'total_failed': failed,
+            'total_time': total_time,
+            'final_rate': successful / total_time if total_time > 0 else 0,
+            'handshake_ceiling': ramp.ceiling['rate']
+        })
+        
+        return successful
+    
+    async def receive_frames(self, ws):
+        """Drain one connection, counting frames without JSON-decoding them"""
+        try:
+            async for frame in ws:
+                received = self.received
+                received['frames'] += 1
+                if isinstance(frame, bytes):
+                    # A binary frame is always exactly one message
+                    received['messages'] += 1
+                    received['bytes'] += len(frame)
+                    continue
+                # go-chat joins queued messages with newlines in one frame
+                received['messages'] += frame.count('\n') + 1
+                received['bytes'] += len(frame.encode('utf-8'))
+        except (websockets.ConnectionClosed, asyncio.CancelledError):
+            pass
+    
     async def create_single_connection(self, user_id):
         """Create a single WebSocket connection"""
+        connect_kwargs = compression_kwargs(self.compression)
+        if self.source_pool:
+            source = self.source_pool.next_address()
+            connect_kwargs['local_addr'] = (source, 0)
+        
         try:
             ws = await asyncio.wait_for(
-                websockets.connect(f"{self.ws_url}?id={user_id}"),
+                websockets.connect(f"{self.ws_url}?id={user_id}", **connect_kwargs),
                 timeout=2.0
             )
+            self.wire.attach(ws)
             return ws
         except Exception:
+            if self.source_pool:
+                self.source_pool.record_failure(source)
             return None
     
     async def extreme_test_connection_apocalypse(self):
@@ -397,17 +612,80 @@ class ChaosBenchmarkSuite:
             'connection_rate': successful / creation_time if creation_time > 0 else 0,
             'timestamp': datetime.now(timezone.utc).isoformat()
         }
+        if self.last_ramp:
+            result['ramp'] = self.last_ramp
+            result['handshake_ceiling'] = self.last_ramp['handshake_ceiling']
+            result['handshake_latency'] = self.last_ramp['handshake_latency']
+        if self.source_pool:
+            result['source_ports'] = self.source_pool.usage(self.connections)
+        result['compression'] = compression_label(self.compression)
+        result['compression_negotiated'] = sum(1 for ws in self.connections if deflate_negotiated(ws))
         
         print(f"📊 APOCALYPSE RESULTS:")
         print(f"   💀 Connections: {successful:,}/{target_connections:,}")
         print(f"   ⚡ Creation time: {creation_time:.2f}s")
         print(f"   🚀 Rate: {result['connection_rate']:.1f} conn/sec")
+        print(f"   🗜️ Compression: {result['compression']} (negotiated on {result['compression_negotiated']:,} connections)")
+        for address, usage in result.get('source_ports', {}).items():
+            print(f"   🔌 {address}: {usage['ports_in_use']:,} ports in use ({usage['port_utilization']:.1f}% of ephemeral range), {usage['failed']:,} failed")
         
         self.session_data['test_results'].append(result)
         return result
     
-    async def extreme_test_message_tsunami(self):
-        """Test 2: MESSAGE TSUNAMI"""
+    def tsunami_payloads(self, pool_size=64):
+        """Tsunami frames serialized once in the chosen encoding; each send only fills in its sequence"""
+        return build_payload_pool(lambda k: {
+            "type": "tsunami",
+            "content": f"TSUNAMI_{k}_🌊" * 10,
+            "sequence": PayloadTemplate.SEQUENCE
+        }, pool_size, self.encoding)
+    
+    async def send_tsunami_open_loop(self, target_messages, error_threshold, max_in_flight=10000):
+        """Send the tsunami at a constant arrival rate (open loop).
+        
+        Latency is measured from each message's scheduled send time, so a
+        stalling server shows up as latency instead of lowering the load.
+        Message k goes to connection k % N through SendEngine's per-connection
+        writers, as in the other harnesses; sending stops once more than
+        error_threshold sends have failed.
+        """
+        loop = asyncio.get_running_loop()
+        rate = self.tsunami_arrival_rate
+        interval = 1.0 / rate
+        connection_count = len(self.connections)
+        payloads = self.tsunami_payloads()
+        
+        def render(slot, index, scheduled):
+            return payloads[index % len(payloads)].render(sequence=index, timestamp=time.time())
+        
+        engine = SendEngine(self.connections, render)
+        start = loop.time()
+        issued = 0
+        
+        try:
+            while issued < target_messages and engine.errors <= error_threshold:
+                due = min(target_messages, int((loop.time() - start) * rate) + 1)
+                while issued < due and engine.outstanding < max_in_flight:
+                    engine.submit(issued % connection_count, issued, start + issued * interval)
+                    issued += 1
+                
+                if engine.outstanding >= max_in_flight:
+                    # Sender is saturated; the backlog keeps accruing latency from its schedule
+                    await engine.wait_for_space(max_in_flight)
+                else:
+                    await asyncio.sleep(max(0, start + issued * interval - loop.time()))
+        finally:
+            await engine.close()
+        
+        self.log_performance_point('tsunami_open_loop', {
+            'arrival_rate': rate,
+            'messages_sent': engine.sent,
+            'errors': engine.errors
+        })
+        return engine.sent, engine.errors, engine.latency.summary()
+    
+    async def extreme_test_message_tsunami(self, error_threshold=100):
+        """Test 2: MESSAGE TSUNAMI; aborts after more than error_threshold failed sends"""
         print("\n🌊 EXTREME TEST 2: MESSAGE TSUNAMI")
         print("=" * 60)
         
@@ -420,37 +698,52 @@ class ChaosBenchmarkSuite:
         start_time = time.time()
         messages_sent = 0
         errors = 0
+        self.received = {'frames': 0, 'messages': 0, 'bytes': 0}
         
         self.log_resource_usage('tsunami_start')
-        
-        # Send tsunami of messages
-        for i in range(target_messages):
-            try:
-                ws = self.connections[i % len(self.connections)]
-                message = {
-                    "type": "tsunami",
-                    "content": f"TSUNAMI_{i}_🌊" * 10,
-                    "sequence": i
-                }
-                await ws.send(json.dumps(message))
-                messages_sent += 1
-                
-                # Log progress every 10K messages
-                if i % 10000 == 0 and i > 0:
-                    current_rate = messages_sent / (time.time() - start_time)
-                    self.log_performance_point('tsunami_progress', {
-                        'messages_sent': messages_sent,
-                        'current_rate': current_rate,
-                        'errors': errors
-                    })
-                    await asyncio.sleep(0.001)
+        wire_start = (self.wire.sent, self.wire.received)
+        client_cpu_start = cpu_seconds(self.client_process)
+        server_cpu_start = cpu_seconds(psutil.Process(self.server_process.pid)) if self.server_process else None
+        
+        send_latency = None
+        
+        if self.tsunami_arrival_rate:
+            print(f"⏲️ Open loop: {self.tsunami_arrival_rate:,} msg/sec offered")
+            messages_sent, errors, send_latency = await self.send_tsunami_open_loop(target_messages, error_threshold)
+        else:
+            # Send tsunami of messages
+            payloads = self.tsunami_payloads()
+            for i in range(target_messages):
+                try:
+                    ws = self.connections[i % len(self.connections)]
+                    await ws.send(payloads[i % len(payloads)].render(sequence=i, timestamp=time.time()))
+                    messages_sent += 1
                     
-            except Exception:
-                errors += 1
-                if errors > 100:
-                    break
-        
+                    # Log progress every 10K messages
+                    if i % 10000 == 0 and i > 0:
+                        current_rate = messages_sent / (time.time() - start_time)
+                        self.log_performance_point('tsunami_progress', {
+                            'messages_sent': messages_sent,
+                            'current_rate': current_rate,
+                            'errors': errors
+                        })
+                        await asyncio.sleep(0.001)
+                        
+                except Exception:
+                    errors += 1
+                    if errors > error_threshold:
+                        break
+            
         tsunami_time = time.time() - start_time
+        costs = {
+            'wire_bytes_sent': self.wire.sent - wire_start[0],
+            'wire_bytes_received': self.wire.received - wire_start[1],
+            'client_cpu_seconds': cpu_seconds(self.client_process) - client_cpu_start
+        }
+        if server_cpu_start is not None:
+            server_cpu = cpu_seconds(psutil.Process(self.server_process.pid))
+            if server_cpu is not None:
+                costs['server_cpu_seconds'] = server_cpu - server_cpu_start
         self.log_resource_usage('tsunami_end')
         
         result = {
@@ -460,14 +753,42 @@ class ChaosBenchmarkSuite:
             'errors': errors,
             'tsunami_time': tsunami_time,
             'message_rate': messages_sent / tsunami_time if tsunami_time > 0 else 0,
+            'mode': 'open_loop' if self.tsunami_arrival_rate else 'closed_loop',
+            'encoding': self.encoding,
+            'compression': compression_label(self.compression),
             'timestamp': datetime.now(timezone.utc).isoformat()
         }
+        result.update(costs)
+        for key in ('client', 'server'):
+            if f'{key}_cpu_seconds' in result and tsunami_time > 0:
+                result[f'{key}_cpu_percent'] = result[f'{key}_cpu_seconds'] / tsunami_time * 100
+        if self.tsunami_arrival_rate:
+            result['arrival_rate'] = self.tsunami_arrival_rate
+            result['send_latency'] = send_latency
+        if self.drain:
+            # Let broadcasts still in flight land before counting deliveries
+            await asyncio.sleep(1)
+            receive_window = time.time() - start_time
+            result.update({
+                'frames_received': self.received['frames'],
+                'messages_received': self.received['messages'],
+                'bytes_received': self.received['bytes'],
+                'receive_window': receive_window,
+                'delivered_rate': self.received['messages'] / receive_window,
+                'fanout_ratio': self.received['messages'] / messages_sent if messages_sent else 0
+            })
         
         print(f"📊 TSUNAMI RESULTS:")
         print(f"   💀 Messages: {messages_sent:,}/{target_messages:,}")
         print(f"   ❌ Errors: {errors}")
         print(f"   ⚡ Time: {tsunami_time:.2f}s")
         print(f"   🚀 Rate: {result['message_rate']:.1f} msg/sec")
+        print(f"   🗜️ Wire: {result['wire_bytes_sent'] / 1024 / 1024:.1f}MB sent, {result['wire_bytes_received'] / 1024 / 1024:.1f}MB received; "
+              f"CPU client {result['client_cpu_percent']:.0f}%" + (f", server {result['server_cpu_percent']:.0f}%" if 'server_cpu_percent' in result else ""))
+        if self.drain:
+            print(f"   📥 Delivered: {result['messages_received']:,} msgs ({result['delivered_rate']:,.0f} msg/sec, fan-out {result['fanout_ratio']:.1f}x)")
+        if send_latency:
+            print(f"   ⏲️ Send latency: p50 {send_latency['p50_ms']:.2f}ms, p99 {send_latency['p99_ms']:.2f}ms, max {send_latency['max_ms']:.2f}ms")
         
         self.session_data['test_results'].append(result)
         return result
@@ -487,10 +808,10 @@ class ChaosBenchmarkSuite:
                 return
             
             # Run tests
-            await self.extreme_test_connection_apocalypse()
+            await self.run_phase('connection_apocalypse', self.extreme_test_connection_apocalypse)
             await asyncio.sleep(3)
             
-            await self.extreme_test_message_tsunami()
+            await self.run_phase('message_tsunami', self.extreme_test_message_tsunami)
             await asyncio.sleep(3)
             
             # Generate blog summary
@@ -499,21 +820,69 @@ class ChaosBenchmarkSuite:
         finally:
             # Cleanup and save
             print("\n🧹 Cleaning up and saving results...")
-            cleanup_count = 0
-            for ws in self.connections:
-                try:
-                    await ws.close()
-                    cleanup_count += 1
-                except:
-                    pass
+            self.mark_phase('teardown')
+            await self.teardown()
+            self.stop_sampler()
             
             self.stop_server()
+            if self.profiler:
+                self.profiler.close()
             self.save_results()
             
             print(f"\n🎉 BENCHMARK COMPLETE!")
             print(f"📁 Results saved in: {self.results_dir}")
             print(f"📝 Blog report ready: blog_report_{self.session_id}.md")
     
+    def mark_phase(self, phase):
+        if self.sampler:
+            self.sampler.mark(phase)
+    
+    async def run_phase(self, name, test):
+        """Run one test as a sampler phase with kernel TCP counters, profiled when --profile is on"""
+        return await self.instruments.run(name, test)
+    
+    def stop_sampler(self):
+        """Stop the /proc sampler and keep its per-phase summary"""
+        if not self.sampler:
+            return None
+        summary = self.sampler.stop()
+        self.sampler = None
+        self.session_data['server_process_samples'] = summary
+        print(f"   🔬 Server sampled {summary['samples']:,} times at {summary['achieved_hz']:.0f}Hz "
+              f"({summary['missed_ticks']:,} ticks missed, sampler CPU {summary['sampler_cpu_percent']:.1f}%)")
+        for phase in summary['phases']:
+            print(f"      {phase['phase']}: CPU {phase['cpu_percent']:.0f}% avg / {phase['cpu_percent_peak']:.0f}% peak, "
+                  f"RSS {phase['rss_mb_peak']:.1f}MB peak, {phase['threads_peak']} threads, "
+                  f"{phase['ctx_voluntary_per_sec']:,.0f}+{phase['ctx_involuntary_per_sec']:,.0f} ctx switches/sec")
+        return summary
+    
+    def server_connection_count(self):
+        try:
+            return requests.get(f"{self.base_url}/stats", timeout=2).json().get('connections')
+        except Exception:
+            return None
+    
+    async def teardown(self):
+        """Close every connection in parallel while watching go-chat's connection count drain"""
+        stop = asyncio.Event()
+        before = await asyncio.get_running_loop().run_in_executor(None, self.server_connection_count)
+        started = time.perf_counter()
+        watcher = asyncio.create_task(watch_server_drain(self.server_connection_count, stop))
+        
+        result = await teardown_connections(self.connections, self.close_concurrency)
+        stop.set()
+        result.update(drain_summary(before, await watcher, started))
+        self.connections = []
+        
+        self.session_data['teardown'] = result
+        print(f"   🧹 Closed {result['graceful']:,} gracefully, aborted {result['aborted']:,} "
+              f"in {result['teardown_seconds']:.2f}s ({result['close_rate']:,.0f}/sec)")
+        if 'server_connections_before' in result:
+            drain = f"{result['server_drain_seconds']:.2f}s" if result['server_drain_seconds'] is not None else "not within timeout"
+            print(f"   📉 Server: {result['server_connections_before']:,} → {result['server_connections_after']:,} connections "
+                  f"({result['server_disconnect_rate']:,.0f}/sec), drained to zero: {drain}")
+        return result
+    
     def generate_blog_summary(self):
         """Generate summary data for blog post"""
         results = self.session_data['test_results']
@@ -523,10 +892,12 @@ class ChaosBenchmarkSuite:
         max_connections = 0
         max_message_rate = 0
         total_messages = 0
+        negotiated = 0
         
         for result in results:
             if result['test'] == 'connection_apocalypse':
                 max_connections = result['successful_connections']
+                negotiated = result.get('compression_negotiated', 0)
             elif result['test'] == 'message_tsunami':
                 max_message_rate = result['message_rate']
                 total_messages = result['messages_sent']
@@ -548,7 +919,7 @@ class ChaosBenchmarkSuite:
         optimizations = f"""- **System-level optimizations:** Increased file descriptor limits to {system.get('file_descriptor_limit', 'optimized')}
 - **Network tuning:** Optimized TCP buffers and connection queues
 - **Go runtime tuning:** Configured GOMAXPROCS and garbage collection
-- **WebSocket optimization:** Enabled compression and connection pooling"""
+- **WebSocket compression:** {compression_label(self.compression)} offered, permessage-deflate negotiated on {negotiated:,} of {max_connections:,} connections"""
 
         self.session_data['blog_summary'] = {
             'analysis': analysis,
@@ -560,13 +931,50 @@ class ChaosBenchmarkSuite:
         }
 
 async def main():
+    parser = argparse.ArgumentParser(description='Go Chat Server Chaos Benchmark Suite')
+    parser.add_argument('--arrival-rate', type=int, default=None,
+                        help='Run the message tsunami open-loop at this many msg/sec')
+    parser.add_argument('--drain', action='store_true',
+                        help='Read every connection and report delivered msg/sec')
+    parser.add_argument('--ramp', choices=['fixed', 'adaptive'], default='fixed',
+                        help='Connection ramp: fixed 50-connection batches or AIMD adaptive')
+    parser.add_argument('--handshake-target-ms', type=float, default=250,
+                        help='p95 handshake latency the adaptive ramp treats as healthy')
+    parser.add_argument('--source-addresses', nargs='+', default=None,
+                        help='Local addresses or ranges to bind round-robin, e.g. 127.0.0.2-127.0.0.9')
+    parser.add_argument('--encoding', choices=PAYLOAD_ENCODINGS, default='json',
+                        help='Tsunami frames: JSON text, binary struct header, or MessagePack-style compact')
+    parser.add_argument('--compression', default='default', choices=['default', 'off', *map(str, range(1, 10))],
+                        help='permessage-deflate: default (library offer), off, or a zlib level 1-9')
+    parser.add_argument('--close-concurrency', type=int, default=1000,
+                        help='Connections closed in parallel during teardown')
+    parser.add_argument('--sample-hz', type=int, default=100,
+                        help='Sample the server process from /proc at this rate (0 = off)')
+    parser.add_argument('--profile', action='store_true',
+                        help='cProfile + tracemalloc each test; dumps go to the session directory')
+    parser.add_argument('--kernel-interval', type=float, default=0,
+                        help='Also snapshot kernel TCP counters every N seconds during a test (0 = start and end only)')
+    args = parser.parse_args()
+    
+    compression = None
+    if args.compression == 'off':
+        compression = {'enabled': False}
+    elif args.compression != 'default':
+        compression = {'enabled': True, 'level': int(args.compression)}
+    
     print("🎯 ULTIMATE GO CHAT SERVER BENCHMARK SUITE")
     print("Results will be saved for blog content!")
     print("")
     
     input("Press ENTER to start comprehensive benchmarking... ")
     
-    benchmark = ChaosBenchmarkSuite()
+    benchmark = ChaosBenchmarkSuite(tsunami_arrival_rate=args.arrival_rate, drain=args.drain,
+                                    adaptive_ramp=args.ramp == 'adaptive',
+                                    handshake_target_ms=args.handshake_target_ms,
+                                    source_addresses=args.source_addresses,
+                                    encoding=args.encoding, compression=compression,
+                                    close_concurrency=args.close_concurrency, sample_hz=args.sample_hz,
+                                    profile=args.profile, kernel_interval=args.kernel_interval)
     await benchmark.run_full_benchmark_suite()
 
 if __name__ == "__main__":
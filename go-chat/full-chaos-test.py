@@ -8,9 +8,15 @@ import time
 import requests
 import os
 import signal
+import sys
 import psutil
 from datetime import datetime
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # repository root, see bench_common.py
+from bench_common import (
+    probe_readiness,
+)
+
 class GoServerChaosTest:
     def __init__(self):
         self.server_process = None
@@ -21,6 +27,7 @@ class GoServerChaosTest:
     async def start_server(self):
         """Start the Go server"""
         print("🚀 Starting Go server...")
+        started = time.perf_counter()
         self.server_process = subprocess.Popen(
             ['./go-chat'],
             cwd='.',
@@ -29,14 +36,12 @@ class GoServerChaosTest:
         )
         
         # Wait for server to start
-        for i in range(10):
-            try:
-                response = requests.get(f"{self.base_url}/health", timeout=2)
-                if response.status_code == 200:
-                    print("✅ Server started successfully")
-                    return True
-            except:
-                await asyncio.sleep(1)
+        readiness = await probe_readiness('localhost', 8080, self.ws_url, '/health', started, 10,
+                                          process=self.server_process)
+        if readiness['ready']:
+            print(f"✅ Server started in {readiness['time_to_healthy']:.3f}s "
+                  f"(listening {readiness['time_to_listen'] * 1000:.1f}ms, first upgrade {readiness['time_to_first_upgrade'] * 1000:.1f}ms)")
+            return True
                 
         print("❌ Server failed to start")
         return False
@@ -121,7 +126,7 @@ class GoServerChaosTest:
         
         # Kill the process
         print("💀 Killing server process...")
-        kill_time = time.time()
+        kill_time = time.perf_counter()
         
         if self.server_process:
             self.server_process.kill()
@@ -129,22 +134,13 @@ class GoServerChaosTest:
             
         # Measure downtime
         print("⏱️  Measuring downtime...")
-        downtime = 0
         max_downtime = 30  # seconds
         
-        for i in range(max_downtime):
-            await asyncio.sleep(1)
-            downtime += 1
-            
-            # Check if someone manually restarts it
-            try:
-                response = requests.get(f"{self.base_url}/health", timeout=1)
-                if response.status_code == 200:
-                    recovery_time = time.time() - kill_time
-                    print(f"✅ Server recovered after {recovery_time:.2f}s")
-                    break
-            except:
-                continue
+        # Check if someone manually restarts it
+        recovery = await probe_readiness('localhost', 8080, self.ws_url, '/health', kill_time, max_downtime)
+        if recovery['ready']:
+            recovery_time = recovery['time_to_healthy']
+            print(f"✅ Server recovered after {recovery_time:.2f}s")
         else:
             print(f"❌ Server did not recover within {max_downtime}s")
             recovery_time = max_downtime
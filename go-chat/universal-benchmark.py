@@ -14,40 +14,349 @@ import psutil
 import platform
 import sys
 import argparse
+import multiprocessing
+import os
 from datetime import datetime, timezone
 from pathlib import Path
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # repository root, see bench_common.py
+from bench_common import (
+    BackpressureMonitor, ClientSaturationMonitor, KernelTcpCounters, LATENCY_MARKER,
+    LatencyHistogram, PAYLOAD_ENCODINGS, PayloadTemplate, PhaseInstruments, PhaseProfiler,
+    RampController, RoundRobinScheduler, SendEngine, SourceAddressPool, StatsScraper, WireCounter,
+    build_payload_pool, classify_sweep, compression_kwargs, compression_label, cpu_seconds,
+    deflate_negotiated, drain_summary, drift_summary, ephemeral_port_range, fairness_summary,
+    frame_text, kernel_tcp_line, kernel_tcp_markdown, latency_tag, loop_hotspots_markdown,
+    make_hold_sampler, make_size_sampler, probe_readiness, profile_markdown, saturation_line,
+    teardown_connections, watch_server_drain,
+)
+
+# Counters that add up across shards; everything else is recomputed after merging
+SHARD_SUMMED_KEYS = (
+    'target_connections', 'successful_connections', 'failed_connections',
+    'target_messages', 'messages_sent', 'errors',
+    'total_messages', 'connections_used',
+    'frames_received', 'messages_received', 'bytes_received',
+    'sessions_started', 'connects', 'connect_failures', 'disconnects', 'close_errors',
+    'window_connects', 'window_ops', 'bytes_sent',
+    'wire_bytes_sent', 'wire_bytes_received', 'client_cpu_seconds', 'compression_negotiated',
+    'backpressure_pauses', 'blocked_seconds', 'buffered_at_end_bytes',
+)
+# Wall-clock durations: shards run in lockstep, so the slowest one defines the phase
+SHARD_DURATION_KEYS = ('creation_time', 'test_time', 'duration', 'receive_window', 'flush_seconds')
+# Per-shard peaks; the combined peak is the largest one
+SHARD_PEAK_KEYS = ('peak_buffered_bytes',)
+
+
+def merge_shard_results(shard_results):
+    """Merge per-worker phase results into one combined result"""
+    shard_results = [r for r in shard_results if r]
+    if not shard_results:
+        return None
+    
+    merged = dict(shard_results[0])
+    for key in SHARD_SUMMED_KEYS:
+        if key in merged:
+            merged[key] = sum(r.get(key, 0) for r in shard_results)
+    for key in SHARD_DURATION_KEYS + SHARD_PEAK_KEYS:
+        if key in merged:
+            merged[key] = max(r.get(key, 0) for r in shard_results)
+    
+    # Histograms merge exactly, so percentiles are recomputed over every shard's samples
+    for key in ('send_latency', 'e2e_latency', 'handshake_latency', 'close_latency'):
+        histograms = [r[f'{key}_histogram'] for r in shard_results if r.get(f'{key}_histogram')]
+        if histograms:
+            histogram = LatencyHistogram()
+            for data in histograms:
+                histogram.merge(LatencyHistogram.from_dict(data))
+            merged[key] = histogram.summary()
+            merged[f'{key}_histogram'] = histogram.to_dict()
+    
+    if 'source_ports' in merged:
+        # Shards on one host share each source address's ephemeral range
+        source_ports = {}
+        for r in shard_results:
+            for address, usage in r.get('source_ports', {}).items():
+                total = source_ports.setdefault(address, {'ports_in_use': 0, 'failed': 0})
+                for key in total:
+                    total[key] += usage[key]
+        port_range = ephemeral_port_range()
+        for usage in source_ports.values():
+            usage['port_utilization'] = usage['ports_in_use'] / port_range * 100
+        merged['source_ports'] = source_ports
+    
+    if 'arrival_rate' in merged:
+        merged['arrival_rate'] = sum(r.get('arrival_rate', 0) for r in shard_results)
+    if 'connect_rate' in merged:
+        merged['connect_rate'] = sum(r.get('connect_rate', 0) for r in shard_results)
+    
+    # Recompute derived rates from the merged counters
+    if 'successful_connections' in merged:
+        merged['success_rate'] = (merged['successful_connections'] / merged['target_connections'] * 100) if merged['target_connections'] else 0
+        merged['connection_rate'] = merged['successful_connections'] / merged['creation_time'] if merged['creation_time'] > 0 else 0
+    if 'messages_sent' in merged:
+        merged['success_rate'] = (merged['messages_sent'] / merged['target_messages'] * 100) if merged['target_messages'] else 0
+        merged['message_rate'] = merged['messages_sent'] / merged['test_time'] if merged['test_time'] > 0 else 0
+    if 'total_messages' in merged:
+        merged['average_rate'] = merged['total_messages'] / merged['duration'] if merged['duration'] > 0 else 0
+    if 'bytes_sent' in merged:
+        merged['mb_per_sec'] = merged['bytes_sent'] / 1024 / 1024 / merged['test_time'] if merged['test_time'] > 0 else 0
+        merged['avg_frame_bytes'] = merged['bytes_sent'] / merged['messages_sent'] if merged['messages_sent'] else 0
+    if 'wire_bytes_sent' in merged and merged.get('bytes_sent'):
+        merged['wire_ratio'] = merged['wire_bytes_sent'] / merged['bytes_sent']
+    if 'client_cpu_seconds' in merged:
+        elapsed = merged.get('test_time', merged.get('duration', 0))
+        merged['client_cpu_percent'] = merged['client_cpu_seconds'] / elapsed * 100 if elapsed > 0 else 0
+    if 'enqueued_rate' in merged:
+        sent = merged.get('messages_sent', merged.get('total_messages', 0))
+        elapsed = merged.get('test_time', merged.get('duration', 0))
+        merged['enqueued_rate'] = sent / elapsed if elapsed > 0 else 0
+        merged['accepted_rate'] = sent / (elapsed + merged['flush_seconds']) if elapsed + merged['flush_seconds'] > 0 else 0
+    if 'handshake_ceiling' in merged:
+        # Shards peak at different moments, so their ceilings do not add up; the
+        # combined ceiling is the rate all shards sustained over their healthy rounds
+        healthy = [[step for step in r['ramp']['history'] if step['healthy'] and step['rate'] > 0]
+                   for r in shard_results if r.get('ramp')]
+        connections = sum(step['successful'] for rounds in healthy for step in rounds)
+        seconds = max((sum(step['successful'] / step['rate'] for step in rounds) for rounds in healthy), default=0)
+        merged['handshake_ceiling'] = connections / seconds if seconds > 0 else 0
+    if 'fairness' in merged:
+        parts = [r['fairness'] for r in shard_results]
+        fairness = {key: sum(part[key] for part in parts) for key in ('connections', 'active_connections', 'total', 'sum_squares')}
+        fairness['min_sent'] = min(part['min_sent'] for part in parts)
+        fairness['max_sent'] = max(part['max_sent'] for part in parts)
+        fairness['jain_index'] = (fairness['total'] ** 2 / (fairness['connections'] * fairness['sum_squares'])
+                                  if fairness['sum_squares'] else 0)
+        merged['fairness'] = fairness
+    if 'client_saturation' in merged:
+        # Each shard is its own client; report the most loaded one and how many were saturated
+        parts = [r['client_saturation'] for r in shard_results if r.get('client_saturation')]
+        worst = max(parts, key=lambda part: part['loop_cpu_percent'])
+        bound = [part for part in parts if part['verdict'] == 'client-bound']
+        merged['client_saturation'] = dict(worst, client_bound_workers=len(bound),
+                                           verdict='client-bound' if bound else 'ok',
+                                           reasons=sorted({reason for part in bound for reason in part['reasons']}))
+    if 'steps' in merged:
+        # Pair steps by payload size (None is the distribution step): a shard that
+        # skipped a size must not shift the others onto the wrong step
+        by_size = {}
+        for r in shard_results:
+            for step in r['steps']:
+                by_size.setdefault(step['size'], []).append(step)
+        steps = []
+        for parts in by_size.values():
+            step = merge_shard_results(parts)
+            step.pop('per_worker', None)
+            steps.append(step)
+        merged['steps'] = classify_sweep(steps)
+    if 'window_ops' in merged:
+        merged['churn_ops_rate'] = merged['window_ops'] / merged['duration'] if merged['duration'] > 0 else 0
+        merged['achieved_connect_rate'] = merged['window_connects'] / merged['duration'] if merged['duration'] > 0 else 0
+    if 'messages_received' in merged:
+        sent = merged.get('messages_sent', merged.get('total_messages', 0))
+        merged['delivered_rate'] = merged['messages_received'] / merged['receive_window'] if merged['receive_window'] > 0 else 0
+        merged['fanout_ratio'] = merged['messages_received'] / sent if sent else 0
+    
+    merged['workers'] = len(shard_results)
+    merged['per_worker'] = shard_results
+    merged['timestamp'] = datetime.now(timezone.utc).isoformat()
+    return merged
+
+
+def startup_summary(trials):
+    """min/p50/p90/max/mean of each readiness time over the ready trials"""
+    summary = {'trials': len(trials), 'ready_trials': sum(1 for trial in trials if trial['ready'])}
+    for key in ('time_to_listen', 'time_to_first_upgrade', 'time_to_healthy'):
+        values = sorted(trial[key] for trial in trials if trial['ready'] and trial[key] is not None)
+        if values:
+            summary[key] = {
+                'min': values[0],
+                'p50': values[len(values) // 2],
+                'p90': values[min(len(values) - 1, int(len(values) * 0.9))],
+                'max': values[-1],
+                'mean': sum(values) / len(values),
+            }
+    return summary
+
+
+# Cold-start targets (paths relative to go-chat/); override with config "cold_start.servers".
+# The Rust server is a bare tokio-tungstenite listener with no HTTP routes, so it has no health stage.
+COLD_START_SERVERS = [
+    {'name': 'go-chat', 'command': ['./go-chat'], 'cwd': '.', 'port': 8080,
+     'health_path': '/health', 'ws_path': '/ws'},
+    {'name': 'elixir-raw', 'command': ['mix', 'run', '--no-halt'], 'cwd': '../elixir-raw-websocket',
+     'env': {'MIX_ENV': 'prod'}, 'port': 8081, 'health_path': '/health', 'ws_path': '/ws'},
+    {'name': 'rust-chat', 'command': ['./target/release/chaos-chat-rust'], 'cwd': '../rust-chat', 'port': 8080,
+     'health_path': None, 'ws_path': '/'},
+]
+
+
+def run_shard_worker(config_file, shard_index, shard_count, control, barrier, profile_dir=None):
+    """Process entry point for one load-generator shard"""
+    asyncio.run(_shard_worker_loop(config_file, shard_index, shard_count, control, barrier, profile_dir))
+
+
+async def _shard_worker_loop(config_file, shard_index, shard_count, control, barrier, profile_dir=None):
+    suite = UniversalBenchmarkSuite(config_file, shard_index=shard_index, shard_count=shard_count,
+                                    profile=profile_dir is not None, profile_dir=profile_dir)
+    phases = {
+        'connection': suite.run_connection_test,
+        'message': suite.run_message_test,
+        'endurance': suite.run_endurance_test,
+        'payload_sweep': suite.run_payload_sweep,
+        'churn': suite.run_churn_test,
+    }
+    loop = asyncio.get_running_loop()
+    if suite.client_monitor:
+        suite.client_monitor.start()
+    
+    try:
+        while True:
+            command = await loop.run_in_executor(None, control.recv)
+            if command == 'stop':
+                break
+            
+            # Every shard starts the phase at the same moment
+            await loop.run_in_executor(None, barrier.wait)
+            try:
+                result = await suite.run_phase(command, phases[command])
+            except Exception as e:
+                print(f"❌ Worker {shard_index} {command} phase failed: {e}")
+                result = None
+            control.send(result)
+    finally:
+        await suite.close_connections()
+        if suite.client_monitor:
+            await suite.client_monitor.stop()
+        if suite.profiler:
+            suite.profiler.close()
+        control.close()
+
+
 class UniversalBenchmarkSuite:
-    def __init__(self, config_file):
+    def __init__(self, config_file, workers=1, shard_index=0, shard_count=1, profile=False, profile_dir=None):
         # Load configuration
         with open(config_file, 'r') as f:
             self.config = json.load(f)
         
+        self.config_file = config_file
         self.server_process = None
         self.base_url = "http://localhost:8080"
         self.ws_url = "ws://localhost:8080/ws"
         self.connections = []
         
+        # Worker-pool mode: the coordinator owns `workers` processes, each
+        # shard owns every shard_count-th user_id starting at shard_index
+        self.workers = workers
+        self.shard_index = shard_index
+        self.shard_count = shard_count
+        self.worker_processes = []
+        self.worker_controls = []
+        
+        # Reader tasks (drain and/or latency probes) and per-phase receive state
+        self.receiver_tasks = []
+        self.latency_probes = set()
+        self.e2e_latency = LatencyHistogram()
+        self.received = {'frames': 0, 'messages': 0, 'bytes': 0}
+        self.received_before = 0
+        self.receive_phase_start = time.time()
+        
+        # Background /stats time series; send engines are kept for the running client counts
+        self.send_engines = []
+        scrape_config = self.config.get('stats_scraper', {})
+        self.stats_scraper = StatsScraper(
+            scrape_config.get('url', f"{self.base_url}/stats"),
+            None if workers > 1 else self.client_counts,
+            scrape_config.get('interval', 1.0)
+        ) if scrape_config.get('enabled', True) else None
+        
+        # Event-loop lag, loop-thread CPU, tasks and GC pauses of this process, per phase
+        client_config = self.config.get('client_monitor', {})
+        self.client_monitor = ClientSaturationMonitor(
+            client_config.get('interval', 0.1),
+            client_config.get('cpu_threshold', 90),
+            client_config.get('lag_threshold_ms', 50),
+            client_config.get('slow_callback_ms'),
+            client_config.get('top_callbacks', 10)
+        ) if client_config.get('enabled', True) else None
+        
+        # Host TCP counters per phase; the coordinator takes them once for all shards
+        kernel_config = self.config.get('kernel_counters', {})
+        self.kernel_counters = KernelTcpCounters(
+            kernel_config.get('interval', 0)
+        ) if kernel_config.get('enabled', True) and not self.is_shard and KernelTcpCounters.available() else None
+        
+        # Optional source-address fan-out; shards start at different addresses
+        source_addresses = self.config.get('source_addresses')
+        self.source_pool = SourceAddressPool(source_addresses, shard_index) if source_addresses else None
+        
+        # permessage-deflate offer, bytes on the wire and CPU per phase
+        self.compression = self.config.get('compression')
+        self.wire = WireCounter()
+        self.client_process = psutil.Process()
+        
+        # Optional write-buffer high-water mark; sends drain above it
+        backpressure_config = self.config.get('backpressure', {})
+        self.backpressure = BackpressureMonitor(
+            backpressure_config.get('high_water', 16384), backpressure_config.get('low_water')
+        ) if backpressure_config.get('enabled', False) else None
+        
+        # Frame format for sends; go-chat only broadcasts what parses as JSON
+        self.payload_encoding = self.config.get('payload', {}).get('encoding', 'json')
+        if self.payload_encoding not in PAYLOAD_ENCODINGS:
+            raise ValueError(f"Unknown payload encoding: {self.payload_encoding} "
+                             f"(expected one of {', '.join(PAYLOAD_ENCODINGS)})")
+        
         # Create session directory
         config_name = Path(config_file).stem
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         self.session_id = f"{timestamp}_{config_name}_{self.config['test_name']}"
         self.results_dir = Path(f"chaos-results/sessions/{self.session_id}")
-        self.results_dir.mkdir(parents=True, exist_ok=True)
+        if self.is_shard:
+            self.session_id = f"{self.session_id}_shard{shard_index}"
+        else:
+            self.results_dir.mkdir(parents=True, exist_ok=True)
+        
+        # --profile: cProfile + tracemalloc per phase, dumped into the (coordinator's) session directory
+        self.profiler = PhaseProfiler(
+            profile_dir or self.results_dir, __file__, f"_shard{shard_index}" if self.is_shard else "",
+            ignore=[self.client_monitor and self.client_monitor.callback_timer]
+        ) if profile else None
         
         # Initialize results storage
         self.session_data = {
             'session_id': self.session_id,
             'config_used': self.config,
+            'payload_encoding': self.payload_encoding,
+            'compression': compression_label(self.compression),
             'timestamp': datetime.now(timezone.utc).isoformat(),
             'system_info': self.get_system_info(),
             'test_results': [],
             'performance_timeline': [],
             'summary': {}
         }
+        if profile:
+            self.session_data['profiled'] = True
+        self.instruments = PhaseInstruments(
+            self.session_data, [self.stats_scraper and self.stats_scraper.set_phase],
+            self.client_monitor, self.kernel_counters, self.profiler, report=not self.is_shard
+        )
         
-        print(f"🔧 Loaded config: {self.config['test_name']}")
-        print(f"📝 Description: {self.config['description']}")
+        if not self.is_shard:
+            print(f"🔧 Loaded config: {self.config['test_name']}")
+            print(f"📝 Description: {self.config['description']}")
+            if self.payload_encoding != 'json':
+                print(f"📦 Payload encoding: {self.payload_encoding} (go-chat drops non-JSON frames "
+                      f"after reading them, so nothing is broadcast or delivered)")
+    
+    @property
+    def is_shard(self):
+        """True when running as one worker of a sharded load generator"""
+        return self.shard_count > 1
+    
+    def shard_batch_size(self, batch_size):
+        """Split a configured batch size across shards so total concurrency is unchanged"""
+        return max(1, -(-batch_size // self.shard_count))
         
     def get_system_info(self):
         """Get system information"""
@@ -67,7 +376,7 @@ class UniversalBenchmarkSuite:
     async def start_server(self):
         """Start the Go server"""
         print("🚀 Starting Go server...")
-        start_time = time.time()
+        started = time.perf_counter()
         
         self.server_process = subprocess.Popen(
             ['./go-chat'],
@@ -76,16 +385,15 @@ class UniversalBenchmarkSuite:
         )
         
         # Wait for server with configurable timeout
-        timeout = self.config.get('server_startup_timeout', 10)
-        for i in range(timeout):
-            try:
-                response = requests.get(f"{self.base_url}/health", timeout=2)
-                if response.status_code == 200:
-                    startup_time = time.time() - start_time
-                    print(f"✅ Server ready in {startup_time:.2f}s")
-                    return True
-            except:
-                await asyncio.sleep(1)
+        readiness = await probe_readiness(
+            'localhost', 8080, self.ws_url, '/health', started,
+            self.config.get('server_startup_timeout', 10), process=self.server_process
+        )
+        self.session_data['server_startup'] = readiness
+        if readiness['ready']:
+            print(f"✅ Server ready in {readiness['time_to_healthy']:.3f}s "
+                  f"(listening {readiness['time_to_listen'] * 1000:.1f}ms, first upgrade {readiness['time_to_first_upgrade'] * 1000:.1f}ms)")
+            return True
                 
         print("❌ Server failed to start")
         return False
@@ -97,20 +405,137 @@ class UniversalBenchmarkSuite:
             self.server_process.wait()
             self.server_process = None
     
+    async def cold_start_trial(self, server, timeout):
+        """Spawn one server, probe it to readiness, then stop it and wait for its port to free up"""
+        env = {**os.environ, **server.get('env', {})}
+        host = server.get('host', 'localhost')
+        ws_url = f"ws://{host}:{server['port']}{server.get('ws_path', '/ws')}"
+        
+        started = time.perf_counter()
+        try:
+            process = subprocess.Popen(server['command'], cwd=server.get('cwd', '.'), env=env,
+                                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        except OSError as e:
+            return {'ready': False, 'error': str(e)}
+        try:
+            return await probe_readiness(host, server['port'], ws_url, server.get('health_path', '/health'),
+                                         started, timeout, process=process)
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+            # The next trial must not find the old listener still bound
+            released = time.perf_counter() + 10
+            while time.perf_counter() < released:
+                try:
+                    _, writer = await asyncio.open_connection(host, server['port'])
+                    writer.close()
+                except OSError:
+                    break
+                await asyncio.sleep(0.01)
+    
+    async def run_cold_start_benchmark(self):
+        """Repeated cold starts of each server: time to listen, first upgrade and healthy"""
+        cold_config = self.config.get('cold_start', {})
+        trials = cold_config.get('trials', 5)
+        timeout = cold_config.get('timeout', self.config.get('server_startup_timeout', 10))
+        servers = cold_config.get('servers', COLD_START_SERVERS)
+        
+        print(f"\n🧊 COLD START BENCHMARK: {len(servers)} servers x {trials} trials")
+        results = {}
+        for server in servers:
+            print(f"\n   🚀 {server['name']}: {' '.join(server['command'])}")
+            runs = []
+            for trial in range(trials):
+                result = await self.cold_start_trial(server, timeout)
+                runs.append(result)
+                if result['ready']:
+                    healthy = f", healthy {result['time_to_healthy'] * 1000:.1f}ms" if result['time_to_healthy'] is not None else ""
+                    print(f"      Trial {trial + 1}: listening {result['time_to_listen'] * 1000:.1f}ms, "
+                          f"first upgrade {result['time_to_first_upgrade'] * 1000:.1f}ms{healthy}")
+                else:
+                    reason = result.get('error') or (f"exit code {result['exit_code']}" if 'exit_code' in result else "timed out")
+                    print(f"      Trial {trial + 1}: ❌ not ready ({reason})")
+                    if 'error' in result:
+                        break
+                await asyncio.sleep(0.5)
+            results[server['name']] = {'server': server, 'trials': runs, 'summary': startup_summary(runs)}
+        
+        self.session_data['cold_start'] = results
+        return results
+    
     async def create_single_connection(self, user_id):
         """Create a single WebSocket connection"""
         connection_config = self.config['tests']['connection_test']
         timeout = connection_config.get('connection_timeout', 2.0)
         
+        connect_kwargs = compression_kwargs(self.compression)
+        if self.source_pool:
+            source = self.source_pool.next_address()
+            connect_kwargs['local_addr'] = (source, 0)
+        
         try:
             ws = await asyncio.wait_for(
-                websockets.connect(f"{self.ws_url}?id={user_id}"),
+                websockets.connect(f"{self.ws_url}?id={user_id}", **connect_kwargs),
                 timeout=timeout
             )
+            self.wire.attach(ws)
+            if self.backpressure:
+                self.backpressure.attach(ws)
             return ws
         except Exception:
+            if self.source_pool:
+                self.source_pool.record_failure(source)
             return None
     
+    async def timed_connection(self, user_id):
+        """Open one connection, returning (ws or None, handshake seconds)"""
+        started = time.perf_counter()
+        ws = await self.create_single_connection(user_id)
+        return ws, time.perf_counter() - started
+    
+    async def ramp_connections(self, user_indices, ramp):
+        """Open connections in AIMD-sized rounds until the target or a stuck server"""
+        successful = 0
+        failed = 0
+        handshakes = LatencyHistogram()
+        position = 0
+        
+        while position < len(user_indices):
+            window = ramp.window
+            round_indices = user_indices[position:position + window]
+            position += len(round_indices)
+            round_start = time.perf_counter()
+            
+            results = await asyncio.gather(*[self.timed_connection(f"user_{i}") for i in round_indices])
+            
+            latencies = []
+            for ws, handshake in results:
+                if ws:
+                    self.connections.append(ws)
+                    if self.drain_enabled:
+                        self.start_receiver(ws)
+                    latencies.append(handshake)
+                    handshakes.record(handshake * 1_000_000)
+                else:
+                    failed += 1
+            successful += len(latencies)
+            
+            healthy = ramp.record_round(latencies, len(round_indices) - len(latencies), time.perf_counter() - round_start)
+            last = ramp.rounds[-1]
+            p95 = f"{last['p95_ms']:.0f}ms" if last['p95_ms'] is not None else "n/a"
+            print(f"📊 Ramp: {successful:,}/{position:,} connections, window {window} "
+                  f"({last['rate']:.0f} conn/sec, p95 {p95}) {'✅' if healthy else '⚠️ backing off'}")
+            
+            if ramp.exhausted:
+                print(f"⚠️ Server degraded for {ramp.unhealthy_streak} rounds, stopping at {successful:,} connections")
+                break
+        
+        return successful, failed, handshakes
+    
     async def run_connection_test(self):
         """Configurable connection test"""
         if not self.config['tests']['connection_test']['enabled']:
@@ -119,54 +544,69 @@ class UniversalBenchmarkSuite:
             
         conn_config = self.config['tests']['connection_test']
         target = conn_config['target_connections']
-        batch_size = conn_config['batch_size']
+        batch_size = self.shard_batch_size(conn_config['batch_size'])
         failure_threshold = conn_config['failure_threshold']
         
+        # This shard's slice of the user_id space
+        user_indices = range(self.shard_index, target, self.shard_count)
+        target = len(user_indices)
+        
         print(f"\n🌊 CONNECTION TEST")
         print("=" * 50)
         print(f"🎯 Target: {target:,} connections")
         print(f"📦 Batch size: {batch_size}")
         
+        ramp = None
+        if conn_config.get('ramp', {}).get('mode') == 'adaptive':
+            ramp = RampController.from_config(conn_config['ramp'], self.shard_count)
+            print(f"📈 Adaptive ramp: window {ramp.window}, p95 target {ramp.latency_target_ms}ms, "
+                  f"max error rate {ramp.max_error_rate:.0%}")
+        
         successful = 0
         failed = 0
         start_time = time.time()
         
         progress_interval = self.config['reporting']['progress_interval']
         
-        for batch_start in range(0, target, batch_size):
-            batch_end = min(batch_start + batch_size, target)
-            
-            # Create batch
-            tasks = []
-            for i in range(batch_start, batch_end):
-                tasks.append(self.create_single_connection(f"user_{i}"))
+        if ramp:
+            successful, failed, handshakes = await self.ramp_connections(user_indices, ramp)
+        else:
+            for batch_start in range(0, target, batch_size):
+                batch_end = min(batch_start + batch_size, target)
                 
-            try:
-                batch_results = await asyncio.gather(*tasks, return_exceptions=True)
+                # Create batch
+                tasks = []
+                for i in user_indices[batch_start:batch_end]:
+                    tasks.append(self.create_single_connection(f"user_{i}"))
+                    
+                try:
+                    batch_results = await asyncio.gather(*tasks, return_exceptions=True)
+                    
+                    for result in batch_results:
+                        if result and not isinstance(result, Exception):
+                            self.connections.append(result)
+                            if self.drain_enabled:
+                                self.start_receiver(result)
+                            successful += 1
+                        else:
+                            failed += 1
+                            
+                except Exception as e:
+                    print(f"❌ Batch {batch_start}-{batch_end} failed: {e}")
+                    failed += (batch_end - batch_start)
+                    break
                 
-                for result in batch_results:
-                    if result and not isinstance(result, Exception):
-                        self.connections.append(result)
-                        successful += 1
-                    else:
-                        failed += 1
-                        
-            except Exception as e:
-                print(f"❌ Batch {batch_start}-{batch_end} failed: {e}")
-                failed += (batch_end - batch_start)
-                break
-            
-            # Progress reporting
-            if batch_start % progress_interval == 0 or successful >= target * 0.8:
-                current_rate = successful / (time.time() - start_time)
-                print(f"📊 Progress: {successful:,}/{batch_end:,} connections ({current_rate:.1f} conn/sec)")
-            
-            # Failure threshold check
-            if batch_end > 1000 and successful < batch_end * failure_threshold:
-                print(f"⚠️ High failure rate, stopping at {successful:,} connections")
-                break
+                # Progress reporting
+                if batch_start % progress_interval == 0 or successful >= target * 0.8:
+                    current_rate = successful / (time.time() - start_time)
+                    print(f"📊 Progress: {successful:,}/{batch_end:,} connections ({current_rate:.1f} conn/sec)")
                 
-            await asyncio.sleep(0.05)
+                # Failure threshold check
+                if batch_end > 1000 and successful < batch_end * failure_threshold:
+                    print(f"⚠️ High failure rate, stopping at {successful:,} connections")
+                    break
+                    
+                await asyncio.sleep(0.05)
         
         total_time = time.time() - start_time
         success_rate = (successful / target) * 100
@@ -182,15 +622,265 @@ class UniversalBenchmarkSuite:
             'connection_rate': successful / total_time if total_time > 0 else 0,
             'timestamp': datetime.now(timezone.utc).isoformat()
         }
+        if ramp:
+            result['ramp'] = ramp.summary()
+            result['handshake_ceiling'] = ramp.ceiling['rate']
+            result['handshake_latency'] = handshakes.summary()
+            result['handshake_latency_histogram'] = handshakes.to_dict()
+        if self.source_pool:
+            result['source_ports'] = self.source_pool.usage(self.connections)
+        result['compression'] = compression_label(self.compression)
+        result['compression_negotiated'] = sum(1 for ws in self.connections if deflate_negotiated(ws))
         
         print(f"📊 CONNECTION RESULTS:")
         print(f"   ✅ Achieved: {successful:,}/{target:,} ({success_rate:.1f}%)")
         print(f"   ⚡ Rate: {result['connection_rate']:.1f} conn/sec")
         print(f"   ⏱️ Time: {total_time:.2f}s")
+        print(f"   🗜️ Compression: {result['compression']} (negotiated on {result['compression_negotiated']:,} connections)")
+        if ramp:
+            print(f"   📈 Handshake ceiling: {ramp.ceiling['rate']:.0f} conn/sec at window {ramp.ceiling['window']} "
+                  f"({ramp.summary()['unhealthy_rounds']} back-offs in {len(ramp.rounds)} rounds)")
+        self.print_phase_metrics(result)
         
         self.session_data['test_results'].append(result)
         return result
     
+    def probe_tag(self, slot, scheduled=None):
+        """Latency probe for a message sent from connection `slot`.
+        
+        Open-loop sends pass their scheduled monotonic time so end-to-end
+        latency includes any time spent waiting behind a stalled server.
+        """
+        if not self.latency_probes:
+            return ""
+        timestamp_ns = int(scheduled * 1e9) if scheduled is not None else time.monotonic_ns()
+        return latency_tag(slot * self.shard_count + self.shard_index, timestamp_ns)
+    
+    @property
+    def drain_enabled(self):
+        return self.config.get('drain', {}).get('enabled', False)
+    
+    def start_receiver(self, ws):
+        """Start the single reader task allowed on a connection"""
+        self.receiver_tasks.append(asyncio.create_task(self.receive_frames(ws)))
+    
+    def begin_receive_phase(self):
+        """Reset per-phase receive counters and the latency histogram"""
+        latency_config = self.config.get('latency', {})
+        if latency_config.get('enabled', False) and self.connections and not self.latency_probes:
+            receivers = self.connections[:self.shard_batch_size(latency_config.get('receivers', 4))]
+            self.latency_probes.update(receivers)
+            if not self.drain_enabled:
+                # Without drain only the probe receivers get a reader
+                for ws in receivers:
+                    self.start_receiver(ws)
+            print(f"⏱️ Latency receivers: {len(receivers)}")
+        
+        self.e2e_latency = LatencyHistogram()
+        self.received_before += self.received['messages']
+        self.received = {'frames': 0, 'messages': 0, 'bytes': 0}
+        self.receive_phase_start = time.time()
+    
+    def create_send_engine(self, render):
+        engine = SendEngine(self.connections, render)
+        self.send_engines.append(engine)
+        return engine
+    
+    def client_counts(self):
+        """Messages sent and received since start, for the stats time series"""
+        return {
+            'client_sent': sum(engine.sent for engine in self.send_engines),
+            'client_received': self.received_before + self.received['messages'],
+        }
+    
+    async def run_phase(self, name, phase):
+        """Run one test phase, labelling the stats samples taken meanwhile and judging client saturation"""
+        return await self.instruments.run(name, phase)
+    
+    async def stop_stats_scraper(self):
+        """Stop the /stats sampler and record its time series and per-phase summary"""
+        if not (self.stats_scraper and self.stats_scraper.task):
+            return
+        summary = await self.stats_scraper.stop()
+        self.session_data['server_timeline'] = {'summary': summary, 'samples': self.stats_scraper.samples}
+        
+        print(f"\n📡 Server stats: {summary['samples']:,} samples every {summary['interval']}s "
+              f"({summary['failures']:,} failed, scrape p50 {summary['scrape_ms_p50'] or 0:.1f}ms)")
+        for name, phase in summary['phases'].items():
+            client = f"client sent {phase['client_send_rate']:,.0f} msg/sec, " if 'client_send_rate' in phase else ""
+            print(f"   {name}: {client}server {phase.get('server_msg_rate', 0):,.0f} msg/sec, "
+                  f"peak {phase['peak'].get('connections', 0):,} connections")
+    
+    async def end_receive_phase(self, result):
+        """Wait for in-flight deliveries, then attach receive counters and latency"""
+        if not self.receiver_tasks:
+            return
+        
+        grace_period = max(
+            self.config.get('latency', {}).get('grace_period', 1.0) if self.latency_probes else 0,
+            self.config.get('drain', {}).get('grace_period', 1.0) if self.drain_enabled else 0
+        )
+        await asyncio.sleep(grace_period)
+        
+        if self.latency_probes:
+            result['e2e_latency'] = self.e2e_latency.summary()
+            result['e2e_latency_histogram'] = self.e2e_latency.to_dict()
+        
+        if self.drain_enabled:
+            receive_window = time.time() - self.receive_phase_start
+            sent = result.get('messages_sent', result.get('total_messages', 0))
+            result['frames_received'] = self.received['frames']
+            result['messages_received'] = self.received['messages']
+            result['bytes_received'] = self.received['bytes']
+            result['receive_window'] = receive_window
+            result['delivered_rate'] = self.received['messages'] / receive_window if receive_window > 0 else 0
+            result['fanout_ratio'] = self.received['messages'] / sent if sent else 0
+    
+    async def receive_frames(self, ws):
+        """Drain one connection, counting frames without JSON-decoding them.
+        
+        go-chat's write pump joins queued messages with newlines, so a frame
+        can carry several messages. Probe receivers also record latency.
+        """
+        try:
+            async for frame in ws:
+                received_ns = time.monotonic_ns()
+                received = self.received
+                received['frames'] += 1
+                if isinstance(frame, bytes):
+                    # A binary frame is always exactly one message
+                    received['messages'] += 1
+                    received['bytes'] += len(frame)
+                    frame = frame_text(frame)
+                else:
+                    received['messages'] += frame.count('\n') + 1
+                    received['bytes'] += len(frame.encode('utf-8'))
+                
+                if ws in self.latency_probes:
+                    for match in LATENCY_MARKER.finditer(frame):
+                        self.e2e_latency.record((received_ns - int(match.group(2))) / 1000)
+        except (websockets.ConnectionClosed, asyncio.CancelledError):
+            pass
+    
+    def begin_cost_window(self):
+        """Snapshot wire bytes and client/server CPU at the start of a send window"""
+        if self.backpressure:
+            self.backpressure.peak_buffered = 0
+        return {
+            'time': time.time(),
+            'backpressure': (self.backpressure.pauses, self.backpressure.blocked_time()) if self.backpressure else None,
+            'wire': (self.wire.sent, self.wire.received),
+            'client_cpu': cpu_seconds(self.client_process),
+            'server_cpu': cpu_seconds(psutil.Process(self.server_process.pid)) if self.server_process else None
+        }
+    
+    async def end_cost_window(self, window, result):
+        """Attach wire bytes and CPU used since begin_cost_window to a result.
+        
+        With backpressure enabled, also waits for the client buffers to flush:
+        enqueued_rate counts messages handed to the transports, accepted_rate
+        only those the server side has taken off the client's hands.
+        """
+        elapsed = time.time() - window['time']
+        result['wire_bytes_sent'] = self.wire.sent - window['wire'][0]
+        result['wire_bytes_received'] = self.wire.received - window['wire'][1]
+        if result.get('bytes_sent'):
+            result['wire_ratio'] = result['wire_bytes_sent'] / result['bytes_sent']
+        client_cpu = cpu_seconds(self.client_process)
+        if client_cpu is not None and window['client_cpu'] is not None:
+            result['client_cpu_seconds'] = client_cpu - window['client_cpu']
+            result['client_cpu_percent'] = result['client_cpu_seconds'] / elapsed * 100 if elapsed > 0 else 0
+        if window['server_cpu'] is not None:
+            server_cpu = cpu_seconds(psutil.Process(self.server_process.pid))
+            if server_cpu is not None:
+                result['server_cpu_seconds'] = server_cpu - window['server_cpu']
+                result['server_cpu_percent'] = result['server_cpu_seconds'] / elapsed * 100 if elapsed > 0 else 0
+        if self.backpressure:
+            monitor = self.backpressure
+            buffered, largest = monitor.buffered(self.connections)
+            blocked = monitor.blocked_time() - window['backpressure'][1]
+            flush_seconds = await monitor.wait_flushed(self.connections)
+            sent = result.get('messages_sent', result.get('total_messages', 0))
+            result.update({
+                'backpressure_high_water': monitor.high_water,
+                'backpressure_pauses': monitor.pauses - window['backpressure'][0],
+                'blocked_seconds': blocked,
+                'peak_buffered_bytes': max(monitor.peak_buffered, largest),
+                'buffered_at_end_bytes': buffered,
+                'flush_seconds': flush_seconds,
+                'enqueued_rate': sent / elapsed if elapsed > 0 else 0,
+                'accepted_rate': sent / (elapsed + flush_seconds) if elapsed + flush_seconds > 0 else 0
+            })
+    
+    def print_phase_metrics(self, result):
+        """Print delivery, send and end-to-end latency lines for a phase result"""
+        for address, usage in result.get('source_ports', {}).items():
+            print(f"   🔌 {address}: {usage['ports_in_use']:,} ports in use ({usage['port_utilization']:.1f}% of ephemeral range), {usage['failed']:,} failed")
+        if 'messages_received' in result:
+            print(f"   📥 Delivered: {result['messages_received']:,} msgs in {result['frames_received']:,} frames "
+                  f"({result['delivered_rate']:,.0f} msg/sec, {result['bytes_received'] / 1024 / 1024:.1f}MB, "
+                  f"fan-out {result['fanout_ratio']:.1f}x)")
+        if 'wire_bytes_sent' in result:
+            server_cpu = f", server {result['server_cpu_percent']:.0f}%" if 'server_cpu_percent' in result else ""
+            print(f"   🗜️ Wire: {result['wire_bytes_sent'] / 1024 / 1024:.1f}MB sent, "
+                  f"{result['wire_bytes_received'] / 1024 / 1024:.1f}MB received; CPU client "
+                  f"{result.get('client_cpu_percent', 0):.0f}%{server_cpu}")
+        if 'blocked_seconds' in result:
+            print(f"   🚧 Backpressure: blocked {result['blocked_seconds']:.2f}s over {result['backpressure_pauses']:,} pauses, "
+                  f"peak {result['peak_buffered_bytes'] / 1024:.0f}KB buffered; enqueued {result['enqueued_rate']:,.0f} msg/sec, "
+                  f"accepted {result['accepted_rate']:,.0f} msg/sec ({result['flush_seconds']:.2f}s flush)")
+        for key, label in (('handshake_latency', 'Handshake latency'), ('close_latency', 'Close latency'),
+                           ('send_latency', 'Send latency'), ('e2e_latency', 'E2E latency')):
+            latency = result.get(key)
+            if latency:
+                print(f"   ⏲️ {label}: p50 {latency['p50_ms']:.2f}ms, p99 {latency['p99_ms']:.2f}ms, "
+                      f"p99.9 {latency['p99_9_ms']:.2f}ms, max {latency['max_ms']:.2f}ms ({latency['count']:,} samples)")
+    
+    async def send_open_loop(self, engine, rate, total, error_threshold,
+                             progress_interval, max_in_flight=10000):
+        """Send `total` messages at a constant arrival rate (open loop).
+        
+        Messages are scheduled at start + k/rate regardless of how fast the
+        server accepts them, and latency is measured from the scheduled time,
+        so server stalls show up as latency instead of lowering the load.
+        Message k goes to connection k % N through the engine's writers.
+        """
+        loop = asyncio.get_running_loop()
+        interval = 1.0 / rate
+        connection_count = len(engine.connections)
+        start = loop.time()
+        next_progress = start + progress_interval
+        issued = 0
+        
+        while issued < total and engine.errors <= error_threshold:
+            due = min(total, int((loop.time() - start) * rate) + 1)
+            while issued < due and engine.outstanding < max_in_flight:
+                engine.submit(issued % connection_count, issued, start + issued * interval)
+                issued += 1
+            
+            now = loop.time()
+            if now >= next_progress:
+                elapsed = now - start
+                print(f"📊 Open loop [{elapsed:.0f}s]: {engine.sent:,}/{total:,} sent ({engine.sent / elapsed:.0f}/sec, offered {rate:,.0f}/sec)")
+                next_progress += progress_interval
+            
+            if engine.outstanding >= max_in_flight:
+                # Sender is saturated; the backlog keeps accruing latency from its schedule
+                await engine.wait_for_space(max_in_flight)
+            else:
+                await asyncio.sleep(max(0, start + issued * interval - loop.time()))
+        
+        if engine.errors > error_threshold:
+            print(f"⚠️ Too many errors ({engine.errors}), stopping test")
+        await engine.wait_idle()
+        
+        return {
+            'sent': engine.sent,
+            'errors': engine.errors,
+            'elapsed': loop.time() - start,
+            'latency': engine.latency,
+        }
+    
     async def run_message_test(self):
         """Configurable message test"""
         if not self.config['tests']['message_test']['enabled']:
@@ -204,6 +894,7 @@ class UniversalBenchmarkSuite:
         msg_config = self.config['tests']['message_test']
         multiplier = msg_config['target_multiplier']
         batch_size = msg_config['batch_size']
+        batch_size = self.shard_batch_size(batch_size)
         size_multiplier = msg_config['message_size_multiplier']
         error_threshold = msg_config['error_threshold']
         
@@ -215,56 +906,63 @@ class UniversalBenchmarkSuite:
         print(f"📦 Batch size: {batch_size}")
         print(f"💪 Using: {len(self.connections):,} connections")
         
-        start_time = time.time()
-        messages_sent = 0
-        errors = 0
+        arrival_rate = msg_config.get('arrival_rate')
+        send_latency = None
+        payloads = build_payload_pool(lambda k: {
+            "type": "configurable_test",
+            "content": PayloadTemplate.PROBE + f"MSG_{k}_📊" * size_multiplier,
+            "sequence": PayloadTemplate.SEQUENCE
+        }, self.config.get('payload', {}).get('pool_size', 64), self.payload_encoding)
+        self.begin_receive_phase()
+        costs = self.begin_cost_window()
         
-        progress_interval = self.config['reporting']['progress_interval']
+        def render(slot, j, scheduled):
+            return payloads[j % len(payloads)].render(
+                probe=self.probe_tag(slot, scheduled),
+                sequence=j * self.shard_count + self.shard_index
+            )
         
-        for i in range(0, target_messages, batch_size):
-            batch_end = min(i + batch_size, target_messages)
-            batch_tasks = []
-            
-            for j in range(i, batch_end):
-                ws = self.connections[j % len(self.connections)]
-                message = {
-                    "type": "configurable_test",
-                    "content": f"MSG_{j}_📊" * size_multiplier,
-                    "sequence": j
-                }
-                
-                async def send_message(ws, msg):
-                    try:
-                        await ws.send(json.dumps(msg))
-                        return True
-                    except:
-                        return False
-                
-                batch_tasks.append(send_message(ws, message))
+        engine = self.create_send_engine(render)
+        
+        if arrival_rate:
+            # Open loop: this shard offers its share of the configured rate
+            print(f"⏲️ Open loop: {arrival_rate:,} msg/sec offered")
             
-            try:
-                batch_results = await asyncio.gather(*batch_tasks, return_exceptions=True)
-                batch_sent = sum(1 for r in batch_results if r is True)
-                batch_errors = len(batch_results) - batch_sent
-                
-                messages_sent += batch_sent
-                errors += batch_errors
+            start_time = time.time()
+            outcome = await self.send_open_loop(
+                engine, arrival_rate / self.shard_count, target_messages,
+                error_threshold, self.config['reporting'].get('open_loop_progress_seconds', 5),
+                msg_config.get('max_in_flight', 10000)
+            )
+            messages_sent = outcome['sent']
+            errors = outcome['errors']
+            send_latency = outcome['latency']
+        else:
+            # Closed loop: keep at most batch_size messages queued across the writers
+            start_time = time.time()
+            progress_interval = self.config['reporting']['progress_interval']
+            connection_count = len(self.connections)
+            
+            for j in range(target_messages):
+                if engine.outstanding >= batch_size:
+                    await engine.wait_for_space(batch_size)
+                    
+                    # Error threshold check
+                    if engine.errors > error_threshold:
+                        print(f"⚠️ Too many errors ({engine.errors}), stopping test")
+                        break
+                engine.submit(j % connection_count, j)
                 
                 # Progress reporting
-                if i % progress_interval == 0 and i > 0:
-                    current_rate = messages_sent / (time.time() - start_time)
-                    print(f"📊 Progress: {messages_sent:,}/{target_messages:,} ({current_rate:.0f} msg/sec)")
-                
-                # Error threshold check
-                if errors > error_threshold:
-                    print(f"⚠️ Too many errors ({errors}), stopping test")
-                    break
-                    
-            except Exception as e:
-                print(f"❌ Batch failed: {e}")
-                errors += (batch_end - i)
-                break
-        
+                if j % progress_interval == 0 and j > 0:
+                    current_rate = engine.sent / (time.time() - start_time)
+                    print(f"📊 Progress: {engine.sent:,}/{target_messages:,} ({current_rate:.0f} msg/sec)")
+            
+            await engine.wait_idle()
+            messages_sent = engine.sent
+            errors = engine.errors
+        await engine.close()
+            
         total_time = time.time() - start_time
         success_rate = (messages_sent / target_messages) * 100
         message_rate = messages_sent / total_time if total_time > 0 else 0
@@ -272,6 +970,8 @@ class UniversalBenchmarkSuite:
         result = {
             'test': 'configurable_message_test',
             'config': msg_config,
+            'mode': 'open_loop' if arrival_rate else 'closed_loop',
+            'encoding': self.payload_encoding,
             'target_messages': target_messages,
             'messages_sent': messages_sent,
             'errors': errors,
@@ -280,12 +980,19 @@ class UniversalBenchmarkSuite:
             'test_time': total_time,
             'timestamp': datetime.now(timezone.utc).isoformat()
         }
+        if arrival_rate:
+            result['arrival_rate'] = arrival_rate / self.shard_count
+            result['send_latency'] = send_latency.summary()
+            result['send_latency_histogram'] = send_latency.to_dict()
+        await self.end_cost_window(costs, result)
+        await self.end_receive_phase(result)
         
         print(f"📊 MESSAGE RESULTS:")
         print(f"   ✅ Sent: {messages_sent:,}/{target_messages:,} ({success_rate:.1f}%)")
         print(f"   ⚡ Rate: {message_rate:,.0f} msg/sec")
         print(f"   ❌ Errors: {errors}")
         print(f"   ⏱️ Time: {total_time:.2f}s")
+        self.print_phase_metrics(result)
         
         self.session_data['test_results'].append(result)
         return result
@@ -303,54 +1010,78 @@ class UniversalBenchmarkSuite:
         endurance_config = self.config['tests']['endurance_test']
         duration = endurance_config['duration']
         checkpoint_interval = endurance_config['checkpoint_interval']
-        messages_per_batch = endurance_config['messages_per_batch']
+        messages_per_batch = self.shard_batch_size(endurance_config['messages_per_batch'])
         
         print(f"\n💪 ENDURANCE TEST")
         print("=" * 50)
         print(f"🎯 Duration: {duration} seconds")
         print(f"📊 Checkpoint interval: {checkpoint_interval}s")
         
-        start_time = time.time()
-        total_messages = 0
+        arrival_rate = endurance_config.get('arrival_rate')
+        send_latency = None
+        payloads = build_payload_pool(lambda k: {
+            "type": "endurance_test",
+            "content": PayloadTemplate.PROBE + f"ENDURANCE_{k}",
+            "timestamp": PayloadTemplate.TIMESTAMP
+        }, self.config.get('payload', {}).get('pool_size', 64), self.payload_encoding)
+        self.begin_receive_phase()
+        costs = self.begin_cost_window()
         
-        while time.time() - start_time < duration:
-            checkpoint_start = time.time()
-            checkpoint_messages = 0
+        def render(slot, i, scheduled):
+            return payloads[i % len(payloads)].render(
+                probe=self.probe_tag(slot, scheduled),
+                timestamp=time.time()
+            )
+        
+        engine = self.create_send_engine(render)
+        connections_lost = False
+        
+        if arrival_rate:
+            print(f"⏲️ Open loop: {arrival_rate:,} msg/sec offered")
+            shard_rate = arrival_rate / self.shard_count
             
-            while time.time() - checkpoint_start < checkpoint_interval:
-                tasks = []
+            start_time = time.time()
+            outcome = await self.send_open_loop(
+                engine, shard_rate, int(duration * shard_rate),
+                endurance_config.get('error_threshold', float('inf')), checkpoint_interval,
+                endurance_config.get('max_in_flight', 10000)
+            )
+            total_messages = outcome['sent']
+            send_latency = outcome['latency']
+        else:
+            start_time = time.time()
+            submitted = 0
+            scheduler = RoundRobinScheduler(self.connections)
+            
+            while not connections_lost and time.time() - start_time < duration:
+                checkpoint_start = time.time()
+                checkpoint_base = engine.sent
                 
-                for i in range(messages_per_batch):
-                    ws = self.connections[i % len(self.connections)]
-                    message = {
-                        "type": "endurance_test",
-                        "content": f"ENDURANCE_{total_messages + i}",
-                        "timestamp": time.time()
-                    }
-                    
-                    async def quick_send(ws, msg):
-                        try:
-                            await ws.send(json.dumps(msg))
-                            return True
-                        except:
-                            return False
-                    
-                    tasks.append(quick_send(ws, message))
+                while time.time() - checkpoint_start < checkpoint_interval:
+                    for i in range(messages_per_batch):
+                        slot = scheduler.next_slot()
+                        if slot is None:
+                            # Nothing left to send on; wait_idle() would return at once and spin
+                            connections_lost = True
+                            break
+                        engine.submit(slot, submitted)
+                        submitted += 1
+                    await engine.wait_idle()
+                    if connections_lost:
+                        break
                 
-                try:
-                    results = await asyncio.gather(*tasks, return_exceptions=True)
-                    sent = sum(1 for r in results if r is True)
-                    checkpoint_messages += sent
-                    total_messages += sent
-                except:
-                    pass
+                checkpoint_messages = engine.sent - checkpoint_base
+                elapsed = time.time() - start_time
+                current_rate = checkpoint_messages / checkpoint_interval
+                avg_rate = engine.sent / elapsed
+                
+                print(f"💪 ENDURANCE [{elapsed:.0f}s]: {checkpoint_messages:,} msgs ({current_rate:.0f}/sec, avg: {avg_rate:.0f}/sec)")
             
-            elapsed = time.time() - start_time
-            current_rate = checkpoint_messages / checkpoint_interval
-            avg_rate = total_messages / elapsed
+            if connections_lost:
+                print("❌ Every connection closed, ending the endurance test early")
+            total_messages = engine.sent
+        await engine.close()
             
-            print(f"💪 ENDURANCE [{elapsed:.0f}s]: {checkpoint_messages:,} msgs ({current_rate:.0f}/sec, avg: {avg_rate:.0f}/sec)")
-        
         total_time = time.time() - start_time
         final_rate = total_messages / total_time
         
@@ -361,13 +1092,299 @@ class UniversalBenchmarkSuite:
             'total_messages': total_messages,
             'average_rate': final_rate,
             'connections_used': len(self.connections),
+            'fairness': fairness_summary(engine.sent_per_slot),
+            'mode': 'open_loop' if arrival_rate else 'closed_loop',
+            'encoding': self.payload_encoding,
             'timestamp': datetime.now(timezone.utc).isoformat()
         }
+        if connections_lost:
+            result['error'] = 'all_connections_closed'
+        if arrival_rate:
+            result['arrival_rate'] = shard_rate
+            result['send_latency'] = send_latency.summary()
+            result['send_latency_histogram'] = send_latency.to_dict()
+        await self.end_cost_window(costs, result)
+        await self.end_receive_phase(result)
         
         print(f"💪 ENDURANCE RESULTS:")
         print(f"   ⏱️ Duration: {total_time:.1f}s")
         print(f"   📊 Messages: {total_messages:,}")
         print(f"   🚀 Avg Rate: {final_rate:.0f} msg/sec")
+        fairness = result['fairness']
+        print(f"   ⚖️ Fairness: Jain {fairness['jain_index']:.3f}, {fairness['active_connections']:,}/{fairness['connections']:,} "
+              f"connections sent ({fairness['min_sent']:,}-{fairness['max_sent']:,} msgs each)")
+        self.print_phase_metrics(result)
+        
+        self.session_data['test_results'].append(result)
+        return result
+    
+    async def run_payload_step(self, size, sizes, sweep_config, read_limit):
+        """Send one sweep step whose payload pool has the given content sizes"""
+        payloads = build_payload_pool(lambda k: {
+            "type": "payload_sweep",
+            "content": PayloadTemplate.PROBE + chr(ord('a') + k % 26) * sizes[k],
+            "sequence": PayloadTemplate.SEQUENCE
+        }, len(sizes), self.payload_encoding)
+        probe_bytes = len(latency_tag(0, time.monotonic_ns())) if self.config.get('latency', {}).get('enabled') else 0
+        largest = max(len(p.render(probe='', sequence=0)) for p in payloads) + probe_bytes + 10
+        label = f"{size:,}B" if size is not None else f"distribution (mean {sum(sizes) / len(sizes):,.0f}B)"
+        if largest > read_limit:
+            print(f"⏭️ {label}: {largest:,}-byte frames exceed the server read limit ({read_limit:,}), skipping")
+            return None
+        
+        target_messages = sweep_config.get('messages_per_step', len(self.connections) * 5)
+        window = self.shard_batch_size(sweep_config.get('batch_size', 1000))
+        counters = {'bytes': 0}
+        loop = asyncio.get_running_loop()
+        
+        def render(slot, j, scheduled):
+            payload = payloads[j % len(payloads)].render(
+                probe=self.probe_tag(slot, scheduled),
+                sequence=j * self.shard_count + self.shard_index
+            )
+            counters['bytes'] += len(payload)
+            return payload
+        
+        self.begin_receive_phase()
+        costs = self.begin_cost_window()
+        engine = self.create_send_engine(render)
+        start_time = time.time()
+        
+        # Closed loop; latency runs from dispatch to the write completing
+        for j in range(target_messages):
+            if engine.outstanding >= window:
+                await engine.wait_for_space(window)
+            engine.submit(j % len(self.connections), j, loop.time())
+        await engine.close()
+        
+        test_time = time.time() - start_time
+        step = {
+            'size': size,
+            'target_messages': target_messages,
+            'messages_sent': engine.sent,
+            'errors': engine.errors,
+            'bytes_sent': counters['bytes'],
+            'test_time': test_time,
+            'message_rate': engine.sent / test_time if test_time > 0 else 0,
+            'mb_per_sec': counters['bytes'] / 1024 / 1024 / test_time if test_time > 0 else 0,
+            'avg_frame_bytes': counters['bytes'] / engine.sent if engine.sent else 0,
+            'send_latency': engine.latency.summary(),
+            'send_latency_histogram': engine.latency.to_dict()
+        }
+        await self.end_cost_window(costs, step)
+        await self.end_receive_phase(step)
+        
+        latency = step['send_latency']
+        print(f"📏 {label}: {step['message_rate']:,.0f} msg/sec, {step['mb_per_sec']:,.2f} MB/sec "
+              f"(wire {step.get('wire_ratio', 0):.2f}x, client CPU {step.get('client_cpu_percent', 0):.0f}%), "
+              f"p50 {latency.get('p50_ms', 0):.2f}ms, p99 {latency.get('p99_ms', 0):.2f}ms ({engine.errors} errors)")
+        return step
+    
+    async def run_payload_sweep(self):
+        """Throughput and latency across payload sizes"""
+        sweep_config = self.config['tests'].get('payload_sweep', {})
+        if not sweep_config.get('enabled', False):
+            print("⏭️ Payload sweep disabled")
+            return None
+        
+        if not self.connections:
+            print("❌ No connections available for payload sweep")
+            return None
+        
+        # go-chat closes any connection that sends a frame over its 2048-byte read limit
+        read_limit = sweep_config.get('read_limit', 2048)
+        pool_size = self.config.get('payload', {}).get('pool_size', 64)
+        
+        print(f"\n📏 PAYLOAD SWEEP")
+        print("=" * 50)
+        
+        steps = []
+        for size in sweep_config.get('sizes', []):
+            step = await self.run_payload_step(size, [size] * pool_size, sweep_config, read_limit)
+            if step:
+                steps.append(step)
+            await asyncio.sleep(sweep_config.get('pause_seconds', 1))
+        
+        distribution = sweep_config.get('distribution')
+        if distribution:
+            # Keep the tail under the read limit unless the config bounds it
+            draw = make_size_sampler({'max': read_limit - 256, **distribution})
+            sizes = [draw() for _ in range(distribution.get('pool_size', 256))]
+            step = await self.run_payload_step(None, sizes, sweep_config, read_limit)
+            if step:
+                step['distribution'] = distribution
+                steps.append(step)
+        
+        result = {
+            'test': 'payload_sweep',
+            'config': sweep_config,
+            'encoding': self.payload_encoding,
+            'steps': classify_sweep(steps),
+            'timestamp': datetime.now(timezone.utc).isoformat()
+        }
+        
+        print(f"📏 SWEEP RESULTS:")
+        for step in steps:
+            label = f"{step['size']:,}B" if step['size'] is not None else "distribution"
+            print(f"   {label:>14}: {step['message_rate']:>10,.0f} msg/sec {step['mb_per_sec']:>8,.2f} MB/sec"
+                  f"  {step.get('regime', '')}")
+        
+        self.session_data['test_results'].append(result)
+        return result
+    
+    def sample_server(self):
+        """One server resource sample: RSS from the process, goroutines and heap from /stats"""
+        sample = {'timestamp': time.time()}
+        if self.server_process:
+            try:
+                sample['rss_mb'] = psutil.Process(self.server_process.pid).memory_info().rss / 1024 / 1024
+            except psutil.Error:
+                pass
+        try:
+            stats = requests.get(f"{self.base_url}/stats", timeout=2).json()
+            sample['goroutines'] = stats.get('goroutines')
+            sample['heap_mb'] = stats.get('memory_mb')
+            sample['server_connections'] = stats.get('connections')
+        except Exception:
+            pass
+        return sample
+    
+    def start_server_sampler(self, interval):
+        """Sample the server every `interval` seconds in the background"""
+        samples = []
+        
+        async def sample_loop():
+            loop = asyncio.get_running_loop()
+            while True:
+                samples.append(await loop.run_in_executor(None, self.sample_server))
+                await asyncio.sleep(interval)
+        
+        return asyncio.create_task(sample_loop()), samples
+    
+    async def stop_server_sampler(self, sampler, result, settle_seconds):
+        """Let the server settle, take a last sample and attach the drift series to `result`"""
+        task, samples = sampler
+        await asyncio.sleep(settle_seconds)
+        task.cancel()
+        samples.append(await asyncio.get_running_loop().run_in_executor(None, self.sample_server))
+        
+        result['server_samples'] = samples
+        result['server_drift'] = {
+            key: drift_summary(samples, key)
+            for key in ('rss_mb', 'goroutines', 'heap_mb', 'server_connections')
+            if drift_summary(samples, key)
+        }
+        for key, label in (('rss_mb', 'RSS'), ('goroutines', 'Goroutines')):
+            drift = result['server_drift'].get(key)
+            if drift:
+                print(f"   📈 Server {label}: {drift['start']:,.1f} → {drift['end']:,.1f} "
+                      f"(peak {drift['peak']:,.1f}, {drift['per_minute']:+,.2f}/min)")
+    
+    async def run_churn_test(self):
+        """Connect/disconnect churn at a target connect rate"""
+        churn_config = self.config['tests'].get('churn_test', {})
+        if not churn_config.get('enabled', False):
+            print("⏭️ Churn test disabled")
+            return None
+        
+        connect_rate = churn_config['connect_rate'] / self.shard_count
+        duration = churn_config['duration']
+        hold_time = make_hold_sampler(churn_config.get('hold_time', {}))
+        max_open = self.shard_batch_size(churn_config.get('max_open', 10000))
+        progress_interval = churn_config.get('progress_interval', 5)
+        
+        print(f"\n🔁 CHURN TEST")
+        print("=" * 50)
+        print(f"🎯 Connect rate: {churn_config['connect_rate']:,} conn/sec for {duration}s")
+        print(f"⏳ Hold time: {churn_config.get('hold_time', {'distribution': 'exponential', 'mean': 2.0})}")
+        
+        handshakes = LatencyHistogram()
+        closes = LatencyHistogram()
+        counters = {'connects': 0, 'connect_failures': 0, 'disconnects': 0, 'close_errors': 0}
+        sessions = set()
+        sampler = None if self.is_shard else self.start_server_sampler(churn_config.get('sample_interval', 1.0))
+        
+        async def session(user_id):
+            started = time.perf_counter()
+            ws = await self.create_single_connection(user_id)
+            if not ws:
+                counters['connect_failures'] += 1
+                return
+            handshakes.record((time.perf_counter() - started) * 1_000_000)
+            counters['connects'] += 1
+            
+            await asyncio.sleep(hold_time())
+            
+            closing = time.perf_counter()
+            try:
+                await ws.close()
+                closes.record((time.perf_counter() - closing) * 1_000_000)
+                counters['disconnects'] += 1
+            except Exception:
+                counters['close_errors'] += 1
+        
+        # Open loop: session k starts at start + k/rate, capped at max_open live sessions
+        loop = asyncio.get_running_loop()
+        interval = 1.0 / connect_rate
+        start = loop.time()
+        next_progress = start + progress_interval
+        issued = 0
+        
+        while loop.time() - start < duration:
+            due = int((loop.time() - start) * connect_rate) + 1
+            while issued < due and len(sessions) < max_open:
+                task = asyncio.create_task(session(f"churn_{issued * self.shard_count + self.shard_index}"))
+                sessions.add(task)
+                task.add_done_callback(sessions.discard)
+                issued += 1
+            
+            now = loop.time()
+            if now >= next_progress:
+                elapsed = now - start
+                print(f"🔁 Churn [{elapsed:.0f}s]: {counters['connects']:,} connects, {counters['disconnects']:,} disconnects, "
+                      f"{len(sessions):,} open ({(counters['connects'] + counters['disconnects']) / elapsed:,.0f} ops/sec)")
+                next_progress += progress_interval
+            
+            if len(sessions) >= max_open:
+                await asyncio.sleep(0.01)
+            else:
+                await asyncio.sleep(max(0, start + issued * interval - loop.time()))
+        
+        window = loop.time() - start
+        window_connects = counters['connects']
+        window_ops = counters['connects'] + counters['disconnects']
+        
+        # Let the sessions still holding finish so every connect is paired with a close
+        if sessions:
+            await asyncio.wait(list(sessions))
+        total_time = loop.time() - start
+        
+        result = {
+            'test': 'churn_test',
+            'config': churn_config,
+            'connect_rate': connect_rate,
+            'sessions_started': issued,
+            'window_connects': window_connects,
+            'window_ops': window_ops,
+            'churn_ops_rate': window_ops / window if window > 0 else 0,
+            'achieved_connect_rate': window_connects / window if window > 0 else 0,
+            'duration': window,
+            'test_time': total_time,
+            'handshake_latency': handshakes.summary(),
+            'handshake_latency_histogram': handshakes.to_dict(),
+            'close_latency': closes.summary(),
+            'close_latency_histogram': closes.to_dict(),
+            'timestamp': datetime.now(timezone.utc).isoformat()
+        }
+        result.update(counters)
+        
+        print(f"🔁 CHURN RESULTS:")
+        print(f"   ✅ Connects: {counters['connects']:,}/{issued:,} ({counters['connect_failures']:,} failed)")
+        print(f"   🔌 Disconnects: {counters['disconnects']:,} ({counters['close_errors']:,} close errors)")
+        print(f"   ⚡ Churn: {result['churn_ops_rate']:,.0f} ops/sec ({result['achieved_connect_rate']:,.0f} connects/sec sustained)")
+        self.print_phase_metrics(result)
+        if sampler:
+            await self.stop_server_sampler(sampler, result, churn_config.get('settle_seconds', 2))
         
         self.session_data['test_results'].append(result)
         return result
@@ -392,9 +1409,20 @@ class UniversalBenchmarkSuite:
             'max_connections': max_connections,
             'peak_message_rate': max_message_rate,
             'total_messages': total_messages,
+            'load_workers': self.workers,
             'test_config': self.config['test_name']
         }
         
+        # A result produced while the load generator was saturated measures the harness
+        judged = [result for result in self.session_data['test_results'] if result.get('client_saturation')]
+        if judged:
+            bound = [result['test'] for result in judged if result['client_saturation']['verdict'] == 'client-bound']
+            self.session_data['summary']['client_verdict'] = 'client-bound' if bound else 'ok'
+            self.session_data['summary']['client_bound_tests'] = bound
+            if bound:
+                print(f"⚠️ Client-bound: the load generator saturated during {', '.join(bound)}; "
+                      f"those rates measure the harness, not the server")
+        
         # Save JSON
         json_file = self.results_dir / f"results_{self.session_id}.json"
         with open(json_file, 'w') as f:
@@ -414,13 +1442,22 @@ class UniversalBenchmarkSuite:
 ## Test Configuration: {self.config['test_name']}
 **Description:** {self.config['description']}
 **Session:** {self.session_id}
+**Payload Encoding:** {self.payload_encoding}
+**Compression:** {compression_label(self.compression)}
 **Date:** {datetime.now().strftime("%B %d, %Y at %H:%M:%S")}
 
 ## 🏆 Summary Results
 - **Max Connections:** {summary['max_connections']:,}
 - **Peak Message Rate:** {summary['peak_message_rate']:,.0f} msg/sec  
 - **Total Messages:** {summary['total_messages']:,}
-
+"""
+        if summary.get('client_verdict') == 'client-bound':
+            report += (f"- **Client Verdict:** ⚠️ CLIENT-BOUND during {', '.join(summary['client_bound_tests'])}\n\n"
+                       f"> The load generator saturated (event loop CPU or lag over threshold), so these rates are a "
+                       f"measurement of the harness, not the server. Do not publish them as server comparisons.\n")
+        elif summary.get('client_verdict'):
+            report += "- **Client Verdict:** ✅ not client-bound\n"
+        report += """
 ## 📊 Detailed Results
 
 """
@@ -434,8 +1471,16 @@ class UniversalBenchmarkSuite:
 - **Achieved:** {result.get('successful_connections', 0):,}
 - **Success Rate:** {result.get('success_rate', 0):.1f}%
 - **Rate:** {result.get('connection_rate', 0):.1f} conn/sec
-
 """
+                for address, usage in result.get('source_ports', {}).items():
+                    report += f"- **Source {address}:** {usage['ports_in_use']:,} ports in use ({usage['port_utilization']:.1f}% of ephemeral range), {usage['failed']:,} failed\n"
+                if 'handshake_ceiling' in result:
+                    report += f"- **Handshake Ceiling:** {result['handshake_ceiling']:,.0f} conn/sec (adaptive ramp, {result['ramp']['rounds']} rounds)\n"
+                if 'kernel_tcp' in result:
+                    report += f"- **Kernel TCP:** {kernel_tcp_line(result['kernel_tcp'])}\n"
+                    for finding in result['kernel_tcp']['findings']:
+                        report += f"  - ⚠️ {finding}\n"
+                report += "\n"
             elif 'message' in result['test']:
                 report += f"""- **Target:** {result.get('target_messages', 0):,}
 - **Sent:** {result.get('messages_sent', 0):,}
@@ -450,6 +1495,131 @@ class UniversalBenchmarkSuite:
 - **Average Rate:** {result.get('average_rate', 0):,.0f} msg/sec
 
 """
+            elif 'sweep' in result['test']:
+                report += "| Payload | Frame | msg/sec | MB/sec | Wire ratio | Client CPU | Server CPU | Send p50 | Send p99 | E2E p99 | Regime |\n"
+                report += "|---|---|---|---|---|---|---|---|---|---|---|\n"
+                for step in result.get('steps', []):
+                    label = f"{step['size']:,}B" if step['size'] is not None else "distribution"
+                    send = step.get('send_latency', {})
+                    e2e = step.get('e2e_latency', {})
+                    e2e_p99 = f"{e2e['p99_ms']:.2f}ms" if e2e else "-"
+                    server_cpu = f"{step['server_cpu_percent']:.0f}%" if 'server_cpu_percent' in step else "-"
+                    report += (f"| {label} | {step['avg_frame_bytes']:,.0f}B | {step['message_rate']:,.0f} | {step['mb_per_sec']:,.2f} | "
+                               f"{step.get('wire_ratio', 0):.2f} | {step.get('client_cpu_percent', 0):.0f}% | {server_cpu} | "
+                               f"{send.get('p50_ms', 0):.2f}ms | {send.get('p99_ms', 0):.2f}ms | {e2e_p99} | {step.get('regime', '-')} |\n")
+                report += "\n"
+            elif 'churn' in result['test']:
+                report += f"""- **Offered Connect Rate:** {result.get('connect_rate', 0):,.0f} conn/sec for {result.get('duration', 0):.1f}s
+- **Connects:** {result.get('connects', 0):,} ({result.get('connect_failures', 0):,} failed)
+- **Disconnects:** {result.get('disconnects', 0):,} ({result.get('close_errors', 0):,} close errors)
+- **Sustained Churn:** {result.get('churn_ops_rate', 0):,.0f} ops/sec ({result.get('achieved_connect_rate', 0):,.0f} connects/sec)
+"""
+                for key, label in (('rss_mb', 'Server RSS (MB)'), ('goroutines', 'Goroutines'), ('heap_mb', 'Server Heap (MB)')):
+                    drift = result.get('server_drift', {}).get(key)
+                    if drift:
+                        report += f"- **{label}:** {drift['start']:,.1f} → {drift['end']:,.1f} (peak {drift['peak']:,.1f}, drift {drift['per_minute']:+,.2f}/min)\n"
+                report += "\n"
+            
+            if 'fairness' in result:
+                fairness = result['fairness']
+                report += (f"- **Fairness:** Jain index {fairness['jain_index']:.3f}; {fairness['active_connections']:,} of "
+                           f"{fairness['connections']:,} connections sent, {fairness['min_sent']:,}-{fairness['max_sent']:,} messages each\n")
+            
+            if 'messages_received' in result:
+                report += f"""- **Delivered:** {result['messages_received']:,} messages in {result['frames_received']:,} frames ({result['bytes_received'] / 1024 / 1024:.1f}MB)
+- **Delivered Rate:** {result['delivered_rate']:,.0f} msg/sec (fan-out {result['fanout_ratio']:.1f}x per sent message)
+"""
+            
+            if 'wire_bytes_sent' in result:
+                server_cpu = f", server {result['server_cpu_percent']:.0f}%" if 'server_cpu_percent' in result else ""
+                report += (f"- **Wire:** {result['wire_bytes_sent'] / 1024 / 1024:.1f}MB sent, {result['wire_bytes_received'] / 1024 / 1024:.1f}MB received "
+                           f"(CPU: client {result.get('client_cpu_percent', 0):.0f}%{server_cpu})\n")
+            if 'blocked_seconds' in result:
+                report += (f"- **Backpressure:** blocked {result['blocked_seconds']:.2f}s over {result['backpressure_pauses']:,} pauses "
+                           f"(high-water {result['backpressure_high_water']:,}B, peak {result['peak_buffered_bytes']:,}B buffered)\n"
+                           f"- **Enqueued vs Accepted:** {result['enqueued_rate']:,.0f} msg/sec handed to transports, "
+                           f"{result['accepted_rate']:,.0f} msg/sec accepted ({result['buffered_at_end_bytes']:,}B flushed in {result['flush_seconds']:.2f}s)\n")
+            if 'compression_negotiated' in result:
+                report += f"- **Compression:** {result['compression']}, negotiated on {result['compression_negotiated']:,} connections\n"
+            
+            if result.get('send_latency'):
+                report += f"- **Mode:** open loop at {result.get('arrival_rate', 0):,.0f} msg/sec offered\n"
+            
+            for key, label in (('handshake_latency', 'Handshake Latency'), ('close_latency', 'Close Latency'), ('send_latency', 'Send Latency (from schedule)'), ('e2e_latency', 'End-to-End Latency')):
+                latency = result.get(key)
+                if latency:
+                    report += f"- **{label}:** p50 {latency['p50_ms']:.2f}ms, p90 {latency['p90_ms']:.2f}ms, p99 {latency['p99_ms']:.2f}ms, p99.9 {latency['p99_9_ms']:.2f}ms, max {latency['max_ms']:.2f}ms ({latency['count']:,} samples)\n"
+            
+            saturation = result.get('client_saturation')
+            if saturation:
+                workers = f" (worst of {result['workers']} workers, {saturation['client_bound_workers']} saturated)" if 'client_bound_workers' in saturation else ""
+                report += f"- **Client:** {saturation_line(saturation)}{workers}\n"
+            
+            if (result.get('handshake_latency') or result.get('close_latency') or result.get('send_latency') or result.get('e2e_latency')
+                    or 'messages_received' in result or saturation):
+                report += "\n"
+        
+        timeline = self.session_data.get('server_timeline')
+        if timeline:
+            summary = timeline['summary']
+            report += (f"## 📡 Server Stats Timeline\n\n{summary['samples']:,} samples of `{summary['url']}` every {summary['interval']}s "
+                       f"({summary['failures']:,} failed, scrape p50 {summary['scrape_ms_p50'] or 0:.1f}ms). "
+                       f"Rates are per phase, from counter deltas between samples.\n\n")
+            report += "| Phase | Seconds | Client sent msg/sec | Client received msg/sec | Server msg/sec | Server/client | Peak connections | Peak goroutines | Peak heap MB | GC cycles |\n"
+            report += "|---|---|---|---|---|---|---|---|---|---|\n"
+            for name, phase in summary['phases'].items():
+                def rate(key):
+                    return f"{phase[key]:,.0f}" if key in phase else "-"
+                ratio = f"{phase['server_to_client_ratio']:.2f}" if 'server_to_client_ratio' in phase else "-"
+                peak = phase['peak']
+                report += (f"| {name} | {phase['seconds']:.1f} | {rate('client_send_rate')} | {rate('client_recv_rate')} | {rate('server_msg_rate')} | {ratio} | "
+                           f"{peak.get('connections', '-')} | {peak.get('goroutines', '-')} | {peak.get('memory_mb', '-')} | {phase.get('gc_cycles', '-')} |\n")
+            report += "\n"
+        
+        # Harness hot spots; sharded runs only have each test's most loaded worker
+        loop_phases = self.session_data.get('client_phases') or {
+            result['test']: result['client_saturation'] for result in self.session_data['test_results'] if result.get('client_saturation')
+        }
+        report += loop_hotspots_markdown(loop_phases)
+        
+        # Profiled runs; sharded runs show worker 0's profile (every worker's dumps are in the session directory)
+        profiles = self.session_data.get('profile') or {
+            result['test']: result['profile'] for result in self.session_data['test_results'] if result.get('profile')
+        }
+        if profiles:
+            report += profile_markdown(profiles)
+        
+        report += kernel_tcp_markdown(self.session_data.get('kernel_tcp'))
+        
+        cold_start = self.session_data.get('cold_start')
+        if cold_start:
+            report += "## 🧊 Cold Start\n\n| Server | Ready | Listen p50 | Listen p90 | First upgrade p50 | First upgrade p90 | Healthy p50 | Healthy p90 |\n"
+            report += "|---|---|---|---|---|---|---|---|\n"
+            for name, server in cold_start.items():
+                summary = server['summary']
+                cells = []
+                for key in ('time_to_listen', 'time_to_first_upgrade', 'time_to_healthy'):
+                    stats = summary.get(key)
+                    cells += [f"{stats['p50'] * 1000:.1f}ms", f"{stats['p90'] * 1000:.1f}ms"] if stats else ["-", "-"]
+                report += f"| {name} | {summary['ready_trials']}/{summary['trials']} | {' | '.join(cells)} |\n"
+            report += "\n"
+        
+        startup = self.session_data.get('server_startup')
+        if startup and startup['ready']:
+            report += (f"**Server Startup:** listening {startup['time_to_listen'] * 1000:.1f}ms, first upgrade "
+                       f"{startup['time_to_first_upgrade'] * 1000:.1f}ms, healthy {startup['time_to_healthy'] * 1000:.1f}ms\n\n")
+        
+        teardown = self.session_data.get('teardown')
+        if teardown:
+            report += f"## 🧹 Teardown\n\n- **Duration:** {teardown['teardown_seconds']:.2f}s\n"
+            if 'graceful' in teardown:
+                report += (f"- **Client Closes:** {teardown['graceful']:,} graceful, {teardown['aborted']:,} aborted "
+                           f"({teardown['close_rate']:,.0f}/sec at concurrency {teardown['concurrency']:,})\n")
+            if 'server_connections_before' in teardown:
+                drain = f"{teardown['server_drain_seconds']:.2f}s" if teardown['server_drain_seconds'] is not None else "not within timeout"
+                report += (f"- **Server-Observed Disconnects:** {teardown['server_connections_before']:,} → {teardown['server_connections_after']:,} "
+                           f"({teardown['server_disconnect_rate']:,.0f}/sec)\n- **Server Drain to Zero:** {drain}\n")
+            report += "\n"
         
         report_file = self.results_dir / f"report_{self.session_id}.md"
         with open(report_file, 'w') as f:
@@ -457,38 +1627,185 @@ class UniversalBenchmarkSuite:
         
         print(f"📝 Report saved: {report_file}")
     
+    def start_workers(self):
+        """Spawn the load-generator shard processes"""
+        print(f"🧵 Starting {self.workers} load-generator workers...")
+        barrier = multiprocessing.Barrier(self.workers)
+        
+        for shard_index in range(self.workers):
+            parent_conn, child_conn = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=run_shard_worker,
+                args=(self.config_file, shard_index, self.workers, child_conn, barrier,
+                      str(self.results_dir) if self.profiler else None),
+                daemon=True
+            )
+            process.start()
+            self.worker_processes.append(process)
+            self.worker_controls.append(parent_conn)
+    
+    def stop_workers(self):
+        """Tell every shard to close its connections and exit"""
+        for control in self.worker_controls:
+            try:
+                control.send('stop')
+            except (BrokenPipeError, OSError):
+                pass
+        
+        for process in self.worker_processes:
+            process.join(timeout=30)
+            if process.is_alive():
+                process.terminate()
+        
+        self.worker_processes = []
+        self.worker_controls = []
+    
+    async def run_sharded_phase(self, phase):
+        """Run one phase on every shard in lockstep and merge the counters"""
+        loop = asyncio.get_running_loop()
+        self.instruments.start(phase, profile=False)
+        for control in self.worker_controls:
+            control.send(phase)
+        
+        shard_results = await asyncio.gather(*[
+            loop.run_in_executor(None, control.recv) for control in self.worker_controls
+        ])
+        _, kernel = self.instruments.stop()
+        
+        result = merge_shard_results(shard_results)
+        if result:
+            print(f"🧵 Merged {result['workers']} worker results for {result['test']}")
+            self.session_data['test_results'].append(result)
+        self.instruments.record(phase, result, kernel=kernel)
+        return result
+    
+    async def close_connections(self):
+        """Close every open WebSocket connection (bounded parallel, abort on timeout)"""
+        teardown_config = self.config.get('teardown', {})
+        result = await teardown_connections(
+            self.connections,
+            self.shard_batch_size(teardown_config.get('concurrency', 1000)),
+            teardown_config.get('close_timeout', 2.0)
+        )
+        self.connections = []
+        return result
+    
+    def server_connection_count(self):
+        try:
+            return requests.get(f"{self.base_url}/stats", timeout=2).json().get('connections')
+        except Exception:
+            return None
+    
+    async def teardown(self):
+        """Tear down every connection (or every shard) while watching the server drain"""
+        teardown_config = self.config.get('teardown', {})
+        loop = asyncio.get_running_loop()
+        stop = asyncio.Event()
+        before = await loop.run_in_executor(None, self.server_connection_count)
+        started = time.perf_counter()
+        watcher = asyncio.create_task(watch_server_drain(
+            self.server_connection_count, stop, teardown_config.get('drain_timeout', 30.0)
+        ))
+        
+        if self.workers > 1:
+            print(f"\n🧹 Stopping {len(self.worker_processes)} workers...")
+            await loop.run_in_executor(None, self.stop_workers)
+            result = {'teardown_seconds': time.perf_counter() - started, 'workers': self.workers}
+        else:
+            print(f"\n🧹 Cleaning up {len(self.connections):,} connections...")
+            result = await self.close_connections()
+        stop.set()
+        result.update(drain_summary(before, await watcher, started))
+        
+        self.session_data['teardown'] = result
+        if 'graceful' in result:
+            print(f"   🧹 Closed {result['graceful']:,} gracefully, aborted {result['aborted']:,} "
+                  f"in {result['teardown_seconds']:.2f}s ({result['close_rate']:,.0f}/sec)")
+        else:
+            print(f"   🧹 Workers closed their connections in {result['teardown_seconds']:.2f}s")
+        if 'server_connections_before' in result:
+            drain = f"{result['server_drain_seconds']:.2f}s" if result['server_drain_seconds'] is not None else "not within timeout"
+            print(f"   📉 Server: {result['server_connections_before']:,} → {result['server_connections_after']:,} connections "
+                  f"({result['server_disconnect_rate']:,.0f}/sec), drained to zero: {drain}")
+        return result
+    
     async def run_benchmark_suite(self):
         """Run the complete configurable benchmark suite"""
         print(f"🔥 CONFIGURABLE BENCHMARK SUITE")
         print("=" * 60)
         print(f"📋 Config: {self.config['test_name']}")
         print(f"📝 {self.config['description']}")
+        if self.workers > 1:
+            print(f"🧵 Workers: {self.workers}")
         print("=" * 60)
         
         try:
             # Start server
             if not await self.start_server():
                 return
+            if self.stats_scraper:
+                self.stats_scraper.start()
+            if self.client_monitor and self.workers == 1:
+                self.client_monitor.start()
+            
+            if self.workers > 1:
+                self.start_workers()
+                
+                await self.run_sharded_phase('connection')
+                await asyncio.sleep(3)
+                
+                await self.run_sharded_phase('message')
+                await asyncio.sleep(3)
+                
+                await self.run_sharded_phase('endurance')
+                
+                if self.config['tests'].get('payload_sweep', {}).get('enabled', False):
+                    await asyncio.sleep(3)
+                    await self.run_sharded_phase('payload_sweep')
+                
+                churn_config = self.config['tests'].get('churn_test', {})
+                if churn_config.get('enabled', False):
+                    await asyncio.sleep(3)
+                    # Workers only drive load; the coordinator owns the server process
+                    sampler = self.start_server_sampler(churn_config.get('sample_interval', 1.0))
+                    result = await self.run_sharded_phase('churn')
+                    if result:
+                        await self.stop_server_sampler(sampler, result, churn_config.get('settle_seconds', 2))
+                    else:
+                        sampler[0].cancel()
+                return
             
             # Run enabled tests
-            await self.run_connection_test()
+            await self.run_phase('connection', self.run_connection_test)
             await asyncio.sleep(3)
             
-            await self.run_message_test()
+            await self.run_phase('message', self.run_message_test)
             await asyncio.sleep(3)
             
-            await self.run_endurance_test()
+            await self.run_phase('endurance', self.run_endurance_test)
+            
+            if self.config['tests'].get('payload_sweep', {}).get('enabled', False):
+                await asyncio.sleep(3)
+                await self.run_phase('payload_sweep', self.run_payload_sweep)
+            
+            if self.config['tests'].get('churn_test', {}).get('enabled', False):
+                await asyncio.sleep(3)
+                await self.run_phase('churn', self.run_churn_test)
             
         finally:
             # Cleanup
-            print(f"\n🧹 Cleaning up {len(self.connections):,} connections...")
-            for ws in self.connections:
-                try:
-                    await ws.close()
-                except:
-                    pass
+            if self.stats_scraper:
+                self.stats_scraper.set_phase('teardown')
+            if self.client_monitor:
+                self.client_monitor.set_phase('teardown')
+            await self.teardown()
+            await self.stop_stats_scraper()
+            if self.client_monitor:
+                self.session_data['client_phases'] = await self.client_monitor.stop()
             
             self.stop_server()
+            if self.profiler:
+                self.profiler.close()
             self.save_results()
             
             print(f"\n🎉 BENCHMARK COMPLETE!")
@@ -498,6 +1815,12 @@ async def main():
     parser = argparse.ArgumentParser(description='Universal Benchmark Suite')
     parser.add_argument('config', help='Configuration file path')
     parser.add_argument('--list-configs', action='store_true', help='List available configs')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Load-generator processes (default: config "workers" or 1)')
+    parser.add_argument('--cold-start', action='store_true',
+                        help='Benchmark repeated cold starts of go-chat, the Elixir raw server and the Rust server')
+    parser.add_argument('--profile', action='store_true',
+                        help='cProfile + tracemalloc each test phase; dumps go to the session directory')
     
     args = parser.parse_args()
     
@@ -513,7 +1836,14 @@ async def main():
         print(f"❌ Config file not found: {args.config}")
         return
     
-    benchmark = UniversalBenchmarkSuite(args.config)
+    with open(args.config, 'r') as f:
+        workers = args.workers or json.load(f).get('workers', 1)
+    
+    benchmark = UniversalBenchmarkSuite(args.config, workers=workers, profile=args.profile)
+    if args.cold_start:
+        await benchmark.run_cold_start_benchmark()
+        benchmark.save_results()
+        return
     await benchmark.run_benchmark_suite()
 
 if __name__ == "__main__":
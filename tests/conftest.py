@@ -0,0 +1,30 @@
+"""
+Fixtures shared by the harness tests
+The harness scripts have hyphenated file names, so they are loaded by path
+"""
+
+import importlib.util
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # repository root, see bench_common.py
+
+
+@pytest.fixture(scope='session')
+def load_script():
+    """Import a harness script by its path relative to the repository root"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    modules = {}
+
+    def load(relative_path):
+        if relative_path not in modules:
+            name = os.path.splitext(os.path.basename(relative_path))[0].replace('-', '_')
+            spec = importlib.util.spec_from_file_location(name, os.path.join(root, relative_path))
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            modules[relative_path] = module
+        return modules[relative_path]
+
+    return load
@@ -0,0 +1,79 @@
+from bench_common import LatencyHistogram, fairness_summary
+
+
+def histogram_of(values):
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.record(value)
+    return histogram
+
+
+def test_histogram_percentiles_within_bucket_error():
+    histogram = histogram_of(range(1, 10001))
+
+    for percentile in (50, 90, 99, 99.9):
+        exact = percentile / 100 * 10000
+        assert abs(histogram.value_at_percentile(percentile) - exact) <= exact / 2 ** (LatencyHistogram.SUB_BUCKET_BITS - 1)
+    assert histogram.value_at_percentile(100) == 10000
+
+    summary = histogram.summary()
+    assert summary['count'] == 10000
+    assert summary['mean_ms'] == 5.0005
+    assert summary['max_ms'] == 10.0
+
+
+def test_histogram_small_values_are_exact():
+    histogram = histogram_of([3, 3, 7, 200])
+
+    assert histogram.value_at_percentile(50) == 3
+    assert histogram.value_at_percentile(75) == 7
+    assert histogram.value_at_percentile(100) == 200
+
+
+def test_empty_histogram():
+    histogram = LatencyHistogram()
+
+    assert histogram.summary() == {}
+    assert histogram.value_at_percentile(99) == 0
+
+
+def test_histogram_merge_matches_single_histogram():
+    values = [(index * 7919) % 50000 for index in range(5000)]
+    whole = histogram_of(values)
+    first, second = histogram_of(values[:1234]), histogram_of(values[1234:])
+
+    merged = LatencyHistogram().merge(first).merge(second)
+
+    assert merged.summary() == whole.summary()
+    assert merged.counts == whole.counts
+
+
+def test_histogram_round_trips_through_dict():
+    histogram = histogram_of([1, 250, 4000, 123456])
+
+    restored = LatencyHistogram.from_dict(histogram.to_dict())
+
+    assert restored.summary() == histogram.summary()
+    assert restored.counts == histogram.counts
+
+
+def test_fairness_even_counts():
+    fairness = fairness_summary([5, 5, 5, 5])
+
+    assert fairness['jain_index'] == 1.0
+    assert fairness['active_connections'] == 4
+    assert (fairness['min_sent'], fairness['max_sent']) == (5, 5)
+
+
+def test_fairness_one_connection_sending():
+    fairness = fairness_summary([12, 0, 0, 0])
+
+    assert fairness['jain_index'] == 0.25
+    assert fairness['active_connections'] == 1
+    assert fairness['total'] == 12
+    assert fairness['sum_squares'] == 144
+
+
+def test_fairness_without_sends():
+    assert fairness_summary([])['jain_index'] == 0
+    assert fairness_summary([0, 0])['jain_index'] == 0
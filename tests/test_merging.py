@@ -0,0 +1,130 @@
+import pytest
+
+from bench_common import fairness_summary
+
+UNIVERSAL = 'go-chat/universal-benchmark.py'
+MONITORING = 'elixir-raw-websocket/universal_benchmark_with_monitoring.py'
+
+
+def sweep_step(size, messages, seconds=1.0):
+    return {'size': size, 'messages_sent': messages, 'target_messages': messages, 'errors': 0,
+            'test_time': seconds, 'bytes_sent': messages * (size or 100)}
+
+
+def test_shard_sweep_steps_pair_by_size(load_script):
+    merge_shard_results = load_script(UNIVERSAL).merge_shard_results
+    first = {'test': 'payload_sweep', 'steps': [sweep_step(64, 100), sweep_step(1024, 100), sweep_step(None, 50)]}
+    # The second shard skipped the 1024-byte step
+    second = {'test': 'payload_sweep', 'steps': [sweep_step(64, 100), sweep_step(None, 50)]}
+
+    merged = merge_shard_results([first, second])
+
+    assert [(step['size'], step['messages_sent'], step['workers']) for step in merged['steps']] == [
+        (64, 200, 2), (1024, 100, 1), (None, 100, 2)
+    ]
+    assert merged['steps'][0]['message_rate'] == 200
+
+
+def test_shard_rates_are_recomputed_not_summed(load_script):
+    merge_shard_results = load_script(UNIVERSAL).merge_shard_results
+    shards = [
+        {'messages_sent': 30, 'target_messages': 30, 'test_time': 1.0, 'flush_seconds': 0.25,
+         'enqueued_rate': 30, 'accepted_rate': 24},
+        {'messages_sent': 20, 'target_messages': 20, 'test_time': 1.0, 'flush_seconds': 0.25,
+         'enqueued_rate': 20, 'accepted_rate': 16},
+    ]
+
+    merged = merge_shard_results(shards)
+
+    assert merged['messages_sent'] == 50
+    assert merged['enqueued_rate'] == 50
+    assert merged['accepted_rate'] == 40
+
+
+def test_shard_handshake_ceiling_spans_the_slowest_shard(load_script):
+    merge_shard_results = load_script(UNIVERSAL).merge_shard_results
+
+    def ramp_shard(rounds):
+        history = [{'successful': successful, 'rate': rate, 'healthy': healthy} for successful, rate, healthy in rounds]
+        return {'successful_connections': 0, 'target_connections': 0, 'creation_time': 1.0,
+                'handshake_ceiling': 999, 'ramp': {'history': history}}
+
+    # 2s and 1s of healthy ramping; the unhealthy round counts for neither
+    first = ramp_shard([(100, 100, True), (200, 200, True), (400, 800, False)])
+    second = ramp_shard([(300, 300, True)])
+
+    merged = merge_shard_results([first, second])
+
+    assert merged['handshake_ceiling'] == pytest.approx(600 / 2)
+
+
+def test_shard_source_ports_share_one_range(load_script, monkeypatch):
+    universal = load_script(UNIVERSAL)
+    monkeypatch.setattr(universal, 'ephemeral_port_range', lambda: 1000)
+    shards = [{'source_ports': {'10.0.0.1': {'ports_in_use': 150, 'failed': 1, 'port_utilization': 15.0}}},
+              {'source_ports': {'10.0.0.1': {'ports_in_use': 250, 'failed': 0, 'port_utilization': 25.0}}}]
+
+    merged = universal.merge_shard_results(shards)
+
+    assert merged['source_ports'] == {'10.0.0.1': {'ports_in_use': 400, 'failed': 1, 'port_utilization': 40.0}}
+
+
+def test_shard_fairness_combines_raw_sums(load_script):
+    merge_shard_results = load_script(UNIVERSAL).merge_shard_results
+
+    merged = merge_shard_results([{'fairness': fairness_summary([4, 4])}, {'fairness': fairness_summary([0, 8])}])
+
+    assert merged['fairness'] == fairness_summary([4, 4, 0, 8])
+
+
+def test_agent_results_sum_counters_and_recompute_rates(load_script, monkeypatch):
+    monitoring = load_script(MONITORING)
+    monkeypatch.setattr(monitoring, 'ephemeral_port_range', lambda: 1000)
+
+    def agent(successful, duration, ports):
+        return {'target_connections': 100, 'successful_connections': successful,
+                'failed_connections': 100 - successful, 'duration': duration, 'batch_size': 10,
+                'source_ports': {'10.0.0.2': {'ports_in_use': ports, 'failed': 0, 'port_utilization': ports / 10}}}
+
+    merged = monitoring.merge_agent_results([agent(100, 2.0, 100), agent(50, 4.0, 300)])
+
+    assert merged['successful_connections'] == 150
+    assert merged['failed_connections'] == 50
+    assert merged['success_rate'] == 75
+    assert merged['connection_rate'] == 150 / 4.0
+    assert merged['batch_size'] == 20
+    assert merged['source_ports']['10.0.0.2']['port_utilization'] == 40.0
+
+
+def test_split_config_spreads_remainders(load_script):
+    split_config = load_script(MONITORING).split_config
+    config = {'tests': {'connection_test': {'target_connections': 10, 'batch_size': 5}}}
+
+    slices = split_config(config, 3)
+
+    assert [s['tests']['connection_test']['target_connections'] for s in slices] == [4, 3, 3]
+    assert [s['tests']['connection_test']['batch_size'] for s in slices] == [2, 2, 2]
+    assert config['tests']['connection_test']['target_connections'] == 10
+
+
+def test_snapshot_ring_wraps_around(load_script):
+    monitoring = load_script(MONITORING)
+    ring = monitoring.SnapshotRing(3)
+
+    def snapshot(timestamp):
+        values = {field: 0 for field in monitoring.SUMMARY_FIELDS}
+        return monitoring.SystemSnapshot(timestamp=timestamp, connections_count=0, **values)
+
+    for timestamp in range(1, 6):
+        ring.append(snapshot(float(timestamp)))
+
+    assert len(ring) == 3
+    assert [s.timestamp for s in ring] == [3.0, 4.0, 5.0]
+    assert ring[-1].timestamp == 5.0
+
+    ring.update(-1, 'connections_count', 42)
+    assert ring[2].connections_count == 42
+    assert ring[0].connections_count == 0
+
+    with pytest.raises(IndexError):
+        ring[3]